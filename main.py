@@ -1,102 +1,231 @@
+import argparse
 import os
 from pathlib import Path
 from src.data_extractor import DataExtractor
-from src.etl_processor import ETLProcessor
-from src.curve_modeler import CurveModeler
+from src.etl_processor import ETLProcessor, iqr_bounds, outlier_lotes_by_bounds
+from src.filter_plan import LazyFilterPlan
+from src.incremental_pipeline import IncrementalPipeline
+from src.partitioned_pipeline import PartitionedPipeline
 from src.plotter import Plotter
 from src.aggregator import Aggregator # Import the Aggregator class
-
-def main():
-    script_dir = os.path.dirname(__file__)
-    project_root = Path(script_dir)
-    
-    # Define paths relative to the project root
-    raw_data_dir = project_root / "data" / "raw"
-    processed_output_file = project_root / "data" / "processed" / "dataset_consumo_processed.csv"
-    aggregated_output_file = project_root / "data" / "processed" / "aggregated_consumption_per_bird.csv" # New aggregated output file
-    plot_output_filename = "curvas_consumo_new.png" 
-
-    print("--- Starting Enhanced ETL Process ---")
-
+from src.utils.diagnostics import DIAGNOSTICS_FILE_ENV, DIAGNOSTICS_LEVEL_ENV, LEVELS, Diagnostics, set_diagnostics
+from src.utils.instrumentation import RUN_REPORT_ENV, RunRecorder, set_recorder
+from src.utils.storage import save_table
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Silo consumption ETL pipeline.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for raw JSON extraction (0 = one per CPU, default: 1).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-parse every raw JSON file instead of reusing the extraction cache.")
+    parser.add_argument("--no-csv-export", action="store_true",
+                        help="Only write the Parquet artifacts, without their CSV copies.")
+    parser.add_argument("--partitions", type=int, default=0,
+                        help="Run out of core: spill the rows to this many lote-hashed on-disk partitions and "
+                             "process them one at a time (or --workers at a time). Default: 0 (in memory).")
+    parser.add_argument("--files-per-chunk", type=int, default=500,
+                        help="Raw JSON files extracted per chunk in partitioned mode (default: 500).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep per-lote state in data/cache/incremental and only recompute the lotes of new, "
+                             "changed or removed raw files (the first run builds the state).")
+    parser.add_argument("--iqr-filter", action="store_true",
+                        help="Drop the lotes whose total consumption per bird is an IQR outlier (1.5 * IQR) across "
+                             "the fleet. With --partitions the quartiles come from a quantile sketch merged across "
+                             "partitions, approximate above 200 lotes.")
+    parser.add_argument("--run-report", type=Path, default=os.environ.get(RUN_REPORT_ENV) or None,
+                        help=f"Write a JSON run report (time, CPU, peak RSS, rows/lotes per phase) to this path "
+                             f"(default: ${RUN_REPORT_ENV}, disabled if unset).")
+    parser.add_argument("--diagnostics", choices=list(LEVELS), default=os.environ.get(DIAGNOSTICS_LEVEL_ENV) or 'info',
+                        help=f"Diagnostics level: 'debug' also computes the per-step summaries (lote value counts, "
+                             f"first confidence levels, ...) as JSON records (default: ${DIAGNOSTICS_LEVEL_ENV} or info).")
+    parser.add_argument("--diagnostics-file", type=Path, default=os.environ.get(DIAGNOSTICS_FILE_ENV) or None,
+                        help=f"Write the debug records as JSON lines to this path instead of the console "
+                             f"(default: ${DIAGNOSTICS_FILE_ENV}).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    recorder = set_recorder(RunRecorder(enabled=args.run_report is not None))
+    set_diagnostics(Diagnostics(args.diagnostics, args.diagnostics_file))
+    try:
+        run_pipeline(args, recorder)
+    finally:
+        if recorder.enabled:
+            report_path = recorder.write(args.run_report)
+            print(f"Run report saved to {report_path}")
+
+def run_in_memory(args, recorder, raw_data_dir, extraction_cache_dir):
+    """Runs phases 1-6 on one in-memory DataFrame; returns (df_final, df_aggregated, df_curves)."""
     # 1. Extract Data from Raw JSON files
     print("\n--- Phase 1: Data Extraction ---")
-    data_extractor = DataExtractor(raw_data_dir)
-    data_extractor.extract_from_json()
-    df_extracted = data_extractor.get_extracted_dataframe()
+    with recorder.phase("extraction") as phase:
+        data_extractor = DataExtractor(raw_data_dir, n_workers=args.workers, cache_dir=extraction_cache_dir)
+        data_extractor.extract_from_json()
+        df_extracted = data_extractor.get_extracted_dataframe()
+        phase.output(df_extracted)
 
     if df_extracted is None or df_extracted.empty:
         print("Data extraction did not produce any data. Exiting.")
-        return
-
-    # 2. Initial ETL Processing (Cleaning and Filtering)
-    print("\n--- Phase 2: Initial ETL Processing (Cleaning and Filtering) ---")
-    etl_processor = ETLProcessor(df_extracted)
-    etl_processor.clean_and_transform_columns() \
-                 .filter_data() # Includes feed_measuredPerBird range and loteComposto count filter
-    
-    df_processed = etl_processor.get_processed_dataframe()
-
-    if df_processed is None or df_processed.empty:
-        print("ETL did not produce any data after initial filtering. Exiting.")
-        return
+        return None, None, None
+
+    # 2-5. Cleaning, filters, curve modeling and R^2 filter as one fused plan:
+    # the per-lote statistics are computed in one pass and the final frame is materialized once
+    print("\n--- Phases 2-5: ETL Filters, Curve Modeling and R^2 Confidence Level Filter (R^2 >= 0.80) ---")
+    with recorder.phase("etl_filter_plan") as phase:
+        phase.input(df_extracted)
+        filter_plan = LazyFilterPlan(df_extracted)
+        filter_plan.clean_and_transform_columns() \
+                   .filter_data() \
+                   .filter_by_start_end_consumption() \
+                   .add_confidence_level() \
+                   .filter_by_confidence_level(min_confidence=0.80)
+        df_final = filter_plan.collect()
+        df_curves = filter_plan.get_curve_table()
+        phase.output(df_final)
 
-    # 3. Apply Start/End Consumption Filter
-    print("\n--- Phase 3: Applying Start/End Consumption Filter ---")
-    etl_processor = ETLProcessor(df_processed) # Re-initialize with df_processed for chaining
-    etl_processor.filter_by_start_end_consumption()
-    
-    df_filtered_start_end = etl_processor.get_processed_dataframe()
+    if df_final is None or df_final.empty:
+        print("ETL did not produce any data after filtering and modeling. Exiting.")
+        return None, None, None
 
-    if df_filtered_start_end is None or df_filtered_start_end.empty:
-        print("ETL did not produce any data after start/end consumption filtering. Exiting.")
-        return
+    # 6. Aggregate Consumption Per Bird
+    print("\n--- Phase 6: Aggregating Consumption Per Bird ---")
+    with recorder.phase("aggregation") as phase:
+        phase.input(df_final)
+        aggregator = Aggregator(df_final)
+        aggregator.aggregate_consumption_per_bird()
+        df_aggregated = aggregator.get_aggregated_dataframe()
+        phase.output(df_aggregated)
+    return df_final, df_aggregated, df_curves
+
+def run_partitioned(args, recorder, raw_data_dir, extraction_cache_dir, partition_dir):
+    """
+    Runs phases 1-6 out of core: raw files are extracted in chunks, spilled to
+    lote-hashed partitions and each partition runs the per-lote pipeline on its own.
+    """
+    print(f"\n--- Phases 1-6 (partitioned): Extraction into {args.partitions} Lote Partitions ---")
+    with recorder.phase("partitioning") as phase:
+        pipeline = PartitionedPipeline(partition_dir, n_partitions=args.partitions, n_workers=args.workers,
+                                       min_confidence=0.80, iqr_filter=args.iqr_filter)
+        data_extractor = DataExtractor(raw_data_dir, n_workers=args.workers, cache_dir=extraction_cache_dir)
+        for df_chunk in data_extractor.iter_extracted_chunks(files_per_chunk=args.files_per_chunk):
+            pipeline.add_frame(df_chunk)
+
+    if pipeline.n_rows == 0:
+        print("Data extraction did not produce any data. Exiting.")
+        pipeline.cleanup()
+        return None, None, None
 
-    # 4. Curve Modeling and Confidence Level Calculation
-    print("\n--- Phase 4: Curve Modeling and Confidence Level Calculation ---")
-    curve_modeler = CurveModeler(df_filtered_start_end) # Pass data after start/end filter
-    curve_modeler.add_confidence_level()
+    print("\n--- Phases 2-6 (partitioned): Per-Lote Filters, Curve Modeling and Aggregation ---")
+    with recorder.phase("partitioned_pipeline") as phase:
+        try:
+            df_final, df_aggregated = pipeline.run()
+        finally:
+            pipeline.cleanup()
+        phase.output(df_final)
+
+    if df_final.empty:
+        print("ETL did not produce any data after filtering and modeling. Exiting.")
+        return None, None, None
+    return df_final, df_aggregated, pipeline.curves
+
+def run_incremental(args, recorder, raw_data_dir, state_dir):
+    """
+    Runs phases 1-6 incrementally: only the changed raw files are extracted and
+    only their lotes are re-filtered, re-modeled and re-aggregated.
+    """
+    print("\n--- Phases 1-6 (incremental): Extracting Changes and Updating the Per-Lote State ---")
+    with recorder.phase("incremental_update") as phase:
+        pipeline = IncrementalPipeline(state_dir, min_confidence=0.80)
+        data_extractor = DataExtractor(raw_data_dir, n_workers=args.workers, cache_dir=pipeline.extraction_cache_dir)
+        changes = data_extractor.extract_changes()
+        if changes is None:
+            return None, None, None
+        pipeline.apply_changes(*changes)
+        df_final, df_aggregated, df_curves = pipeline.final_frames()
+        pipeline.save()
+        phase.output(df_final)
+
+    if df_final.empty:
+        print("ETL did not produce any data after filtering and modeling. Exiting.")
+        return None, None, None
+    return df_final, df_aggregated, df_curves
+
+def run_iqr_filter(recorder, df_final, df_aggregated, df_curves):
+    """
+    Applies the aggregated consumption IQR outlier filter to the outputs of
+    the in-memory and incremental modes, with the exact quartiles of the whole
+    df_aggregated (the partitioned mode applies it per partition, with sketch
+    bounds); returns (df_final, df_aggregated, df_curves) without the outlier lotes.
+    """
+    print("\n--- Phase 6b: Aggregated Consumption IQR Outlier Filter ---")
+    with recorder.phase("iqr_filter") as phase:
+        phase.input(df_final)
+        consumption_column = 'total_consumption_per_lote_per_bird'
+        df_final = ETLProcessor(df_final).filter_by_aggregated_consumption_iqr(df_aggregated) \
+                                         .get_processed_dataframe().reset_index(drop=True)
+        outliers = outlier_lotes_by_bounds(df_aggregated, *iqr_bounds(df_aggregated[consumption_column]),
+                                           consumption_column)
+        df_aggregated = df_aggregated[~df_aggregated['loteComposto'].isin(outliers)].reset_index(drop=True)
+        df_curves = df_curves[~df_curves['loteComposto'].isin(outliers)].reset_index(drop=True)
+        phase.output(df_final)
+    return df_final, df_aggregated, df_curves
+
+def run_pipeline(args, recorder):
+    script_dir = os.path.dirname(__file__)
+    project_root = Path(script_dir)
     
-    df_with_confidence = curve_modeler.get_modeled_dataframe()
-
-    if df_with_confidence is None or df_with_confidence.empty:
-        print("ETL did not produce any data after modeling. Exiting.")
-        return
+    # Define paths relative to the project root
+    raw_data_dir = project_root / "data" / "raw"
+    extraction_cache_dir = None if args.no_cache else project_root / "data" / "cache" / "extraction"
+    # Artifact stems: saved as .parquet, plus a .csv copy unless --no-csv-export
+    processed_output_file = project_root / "data" / "processed" / "dataset_consumo_processed"
+    aggregated_output_file = project_root / "data" / "processed" / "aggregated_consumption_per_bird" # New aggregated output file
+    curves_output_file = project_root / "data" / "processed" / "lote_curves" # Fitted curve of every final lote
+    csv_export = not args.no_csv_export
+    plot_output_filename = "curvas_consumo_new.png" 
 
-    # 5. Apply R^2 Filtering
-    print("\n--- Phase 5: Applying R^2 Confidence Level Filter (R^2 >= 0.80) ---") 
-    etl_processor = ETLProcessor(df_with_confidence) # Re-initialize with df_with_confidence for chaining
-    etl_processor.filter_by_confidence_level(min_confidence=0.80)
-    
-    df_final = etl_processor.get_processed_dataframe()
+    print("--- Starting Enhanced ETL Process ---")
 
+    if args.incremental:
+        df_final, df_aggregated, df_curves = run_incremental(args, recorder, raw_data_dir,
+                                                  project_root / "data" / "cache" / "incremental")
+    elif args.partitions > 0:
+        df_final, df_aggregated, df_curves = run_partitioned(args, recorder, raw_data_dir, extraction_cache_dir,
+                                                  project_root / "data" / "cache" / "partitions")
+    else:
+        df_final, df_aggregated, df_curves = run_in_memory(args, recorder, raw_data_dir, extraction_cache_dir)
+    if args.iqr_filter and (args.incremental or args.partitions <= 0) and df_final is not None and not df_final.empty:
+        df_final, df_aggregated, df_curves = run_iqr_filter(recorder, df_final, df_aggregated, df_curves)
     if df_final is None or df_final.empty:
-        print("ETL did not produce any data after R^2 filtering. Exiting.")
         return
 
-    # 6. Aggregate Consumption Per Bird
-    print("\n--- Phase 6: Aggregating Consumption Per Bird ---")
-    aggregator = Aggregator(df_final)
-    aggregator.aggregate_consumption_per_bird()
-    df_aggregated = aggregator.get_aggregated_dataframe()
-
     # Save aggregated data
-    if df_aggregated is not None and not df_aggregated.empty:
+    with recorder.phase("save_aggregated"):
+        if df_aggregated is not None and not df_aggregated.empty:
+            try:
+                written = save_table(df_aggregated, aggregated_output_file, csv_export=csv_export, csv_sep=';')
+                print(f"Aggregated consumption data saved successfully to {', '.join(str(p) for p in written)}")
+            except Exception as e:
+                print(f"Error saving aggregated consumption data: {e}")
+        else:
+            print("No aggregated data to save.")
+
+    # 7. Save final processed data
+    print("\n--- Phase 7: Saving Final Processed Data ---")
+    with recorder.phase("save_processed") as phase:
+        phase.input(df_final)
+        ETLProcessor(df_final).save_data(processed_output_file, csv_export=csv_export)
         try:
-            df_aggregated.to_csv(aggregated_output_file, sep=';', index=False)
-            print(f"Aggregated consumption data saved successfully to {aggregated_output_file}")
+            written = save_table(df_curves, curves_output_file, csv_export=csv_export, csv_sep=';')
+            print(f"Lote curve table saved successfully to {', '.join(str(p) for p in written)}")
         except Exception as e:
-            print(f"Error saving aggregated consumption data to CSV: {e}")
-    else:
-        print("No aggregated data to save.")
-
-    # 7. Save final processed data (df_final is already set in etl_processor in previous step)
-    print("\n--- Phase 7: Saving Final Processed Data ---")
-    etl_processor.save_data(processed_output_file)
+            print(f"Error saving lote curve table: {e}")
 
     # 8. Generate and save plot
     print("\n--- Phase 8: Generating Consumption Curves Plot ---")
-    plotter = Plotter(df_final)
-    plotter.plot_consumption_curves(output_filename=plot_output_filename)
+    with recorder.phase("plotting"):
+        plotter = Plotter(curves=df_curves)
+        plotter.plot_consumption_curves(output_filename=plot_output_filename)
 
     print("\n--- Enhanced ETL Process Completed Successfully ---")
 
@@ -1,10 +1,164 @@
+import numpy as np
 import pandas as pd
+from src.utils.diagnostics import debug
+from src.utils.schema import to_float64
+
+# Grouping aliases accepted by Aggregator.aggregate (any other column name is used as is)
+GROUPINGS = {
+    'lote': 'loteComposto',
+    'aviary': 'environmentName',
+    'client': 'clientName',
+    'cluster': 'ClassifCluster',
+    'age': 'batchAge',
+}
+
+# Metric operations and the spec keys each one needs (besides 'name' and 'op'; every op accepts 'scale')
+METRIC_OPS = {
+    'sum': ['column'],
+    'mean': ['column'],
+    'count': [],
+    'quantile': ['column', 'q'],
+    'cumulative': ['column', 'age'], # sum over the rows with batchAge <= age
+    'ratio': ['numerator', 'denominator'], # sum(numerator) / sum(denominator), NaN where the denominator sums to 0
+}
+
+# Per-lote summary used by the analysts (see src/scripts/aggregate_metrics.py)
+LOTE_METRICS = [
+    {'name': 'total_consumption_per_lote_per_bird', 'op': 'sum', 'column': 'feed_measuredPerBird'},
+    {'name': 'days', 'op': 'count'},
+    {'name': 'mean_consumption_per_bird', 'op': 'mean', 'column': 'feed_measuredPerBird'},
+    *[{'name': f'cumulative_consumption_per_bird_d{age}', 'op': 'cumulative', 'column': 'feed_measuredPerBird', 'age': age}
+      for age in (7, 14, 21, 28, 35, 42)],
+    {'name': 'feed_measured_total', 'op': 'sum', 'column': 'feed_measured'},
+    {'name': 'feed_delivered_total', 'op': 'sum', 'column': 'feedDelivery_measured'},
+    {'name': 'consumed_per_delivered', 'op': 'ratio', 'numerator': 'feed_measured', 'denominator': 'feedDelivery_measured'},
+    {'name': 'silo_empty_hours', 'op': 'sum', 'column': 'siloEmptyTime', 'scale': 1 / 3600},
+]
+
+# Per-age consumption percentiles, meant for by=['cluster', 'age'] (or any grouping plus 'age')
+AGE_PERCENTILE_METRICS = [
+    {'name': f'p{int(q * 100)}_consumption_per_bird', 'op': 'quantile', 'column': 'feed_measuredPerBird', 'q': q}
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9)
+]
+
 
 class Aggregator:
     def __init__(self, dataframe):
         self.df = dataframe
         self.aggregated_df = None
 
+    @staticmethod
+    def _validate_metrics(metrics):
+        """Raises a ValueError for a malformed metric spec."""
+        names = set()
+        for metric in metrics:
+            op = metric.get('op')
+            if op not in METRIC_OPS:
+                raise ValueError(f"Unknown aggregation op '{op}' in {metric}. Use one of {list(METRIC_OPS)}.")
+            missing = [key for key in ['name'] + METRIC_OPS[op] if key not in metric]
+            if missing:
+                raise ValueError(f"Aggregation {metric} is missing {missing}.")
+            if metric['name'] in names:
+                raise ValueError(f"Duplicate aggregation name '{metric['name']}'.")
+            names.add(metric['name'])
+
+    def aggregate(self, metrics, by='lote'):
+        """
+        Evaluates a declarative list of aggregations in one grouped pass.
+
+        Every metric is a dict with a 'name', an 'op' (see METRIC_OPS) and the
+        op's keys, e.g. {'name': 'delivered', 'op': 'sum', 'column':
+        'feedDelivery_measured'} or {'name': 'consumed_per_delivered', 'op':
+        'ratio', 'numerator': 'feed_measured', 'denominator':
+        'feedDelivery_measured'}. An optional 'scale' multiplies the result.
+
+        The intermediates are shared: each distinct summed column (including
+        the batchAge-masked copies of the cumulative metrics) is summed once,
+        means and ratios are derived from those sums and the non-missing
+        counts, and all quantiles come from one grouped quantile call.
+
+        Args:
+            metrics: The metric specs; output columns follow their order.
+            by: A grouping or a list of groupings: 'lote', 'aviary', 'client',
+                'cluster', 'age' (see GROUPINGS) or column names.
+
+        Returns:
+            self, with the result (one row per group) in aggregated_df.
+        """
+        if self.df is None or self.df.empty:
+            print("No data in DataFrame for aggregation.")
+            return self
+        self._validate_metrics(metrics)
+        keys = [GROUPINGS.get(key, key) for key in ([by] if isinstance(by, str) else by)]
+        columns = [metric.get(key) for metric in metrics for key in ('column', 'numerator', 'denominator')]
+        if any(metric['op'] == 'cumulative' for metric in metrics):
+            columns.append('batchAge')
+        missing = sorted({column for column in keys + columns if column is not None and column not in self.df.columns})
+        if missing:
+            print(f"Error: Columns {missing} not found in DataFrame for aggregation.")
+            return self
+
+        # Intermediate columns, each built once: (column, age limit) -> name in the grouped frame
+        intermediates = {}
+        values = {}
+        def intermediate(column, age=None):
+            if (column, age) not in intermediates:
+                name = f"_v{len(intermediates)}"
+                series = to_float64(self.df[column])
+                if age is not None:
+                    series = np.where(self.df['batchAge'].to_numpy() <= age, series, 0.0)
+                intermediates[(column, age)] = name
+                values[name] = series
+            return intermediates[(column, age)]
+
+        sum_names, count_names, quantile_names, quantiles = set(), set(), set(), set()
+        for metric in metrics:
+            op = metric['op']
+            if op in ('sum', 'mean'):
+                sum_names.add(intermediate(metric['column']))
+                if op == 'mean':
+                    count_names.add(intermediate(metric['column']))
+            elif op == 'cumulative':
+                sum_names.add(intermediate(metric['column'], metric['age']))
+            elif op == 'ratio':
+                sum_names.update([intermediate(metric['numerator']), intermediate(metric['denominator'])])
+            elif op == 'quantile':
+                quantile_names.add(intermediate(metric['column']))
+                quantiles.add(metric['q'])
+
+        frame = pd.DataFrame({key: self.df[key].array for key in keys})
+        frame = frame.assign(**values)
+        grouped = frame.groupby(keys, observed=True, sort=True)
+        sizes = grouped.size()
+        sums = grouped[sorted(sum_names)].sum() if sum_names else None
+        counts = grouped[sorted(count_names)].count() if count_names else None
+        quantile_table = grouped[sorted(quantile_names)].quantile(sorted(quantiles)) if quantile_names else None
+
+        result = pd.DataFrame(index=sizes.index)
+        for metric in metrics:
+            op = metric['op']
+            if op == 'count':
+                value = sizes.astype(np.float64) if 'scale' in metric else sizes
+            elif op == 'sum':
+                value = sums[intermediates[(metric['column'], None)]]
+            elif op == 'mean':
+                name = intermediates[(metric['column'], None)]
+                value = sums[name] / counts[name]
+            elif op == 'cumulative':
+                value = sums[intermediates[(metric['column'], metric['age'])]]
+            elif op == 'ratio':
+                denominator = sums[intermediates[(metric['denominator'], None)]]
+                value = sums[intermediates[(metric['numerator'], None)]] / denominator.where(denominator != 0)
+            else:
+                name = intermediates[(metric['column'], None)]
+                value = quantile_table[name].xs(metric['q'], level=-1)
+            result[metric['name']] = value * metric['scale'] if 'scale' in metric else value
+
+        self.aggregated_df = result.reset_index()
+        print(f"Aggregated DataFrame shape: {self.aggregated_df.shape}")
+        debug("Aggregator.aggregate.head", by=keys, first=lambda: self.aggregated_df.head())
+        return self
+
     def aggregate_consumption_per_bird(self):
         """
         Aggregates the total consumption per bird for each loteComposto across all batchAges.
@@ -14,15 +168,10 @@ class Aggregator:
             return self
 
         print("Aggregating Total Consumption Per Bird per LoteComposto...")
-        
-        # Group only by loteComposto and sum feed_measuredPerBird across all batchAges
-        self.aggregated_df = self.df.groupby(['loteComposto'], as_index=False)['feed_measuredPerBird'].sum()
-        self.aggregated_df.rename(columns={'feed_measuredPerBird': 'total_consumption_per_lote_per_bird'}, inplace=True)
-        
-        print(f"Aggregated DataFrame shape: {self.aggregated_df.shape}")
-        print(f"Aggregated DataFrame head:\n{self.aggregated_df.head()}")
-        
-        return self
+        # Sum feed_measuredPerBird across all batchAges, grouped only by loteComposto
+        # (in float64, see src.utils.schema.to_float64)
+        return self.aggregate([{'name': 'total_consumption_per_lote_per_bird', 'op': 'sum',
+                                'column': 'feed_measuredPerBird'}], by='lote')
 
     def get_aggregated_dataframe(self):
         """Returns the aggregated DataFrame."""
@@ -0,0 +1,204 @@
+import json
+import shutil
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data_model import Ambience
+from src.utils.storage import load_table, save_table
+
+# Per-sample series of AmbienceResultDetail, stored as one flat float32 array each (NaN = missing)
+VALUE_FIELDS = [
+    'minMeasured', 'maxMeasured', 'avgMeasured',
+    'percentageInBetween', 'percentageAboveLimit', 'percentageUnderLimit',
+]
+INDEX_COLUMNS = [
+    'environmentName', 'batchName', 'measure', 'deviceLocation', 'batchDay',
+    'start', 'stop', 'minReference', 'maxReference', 'offset', 'length',
+]
+KEY_COLUMNS = ['environmentName', 'batchName', 'measure', 'deviceLocation', 'batchDay']
+VALUE_DTYPE = np.float32
+TIME_DTYPE = np.int64
+
+
+def _to_float_array(values: List[Optional[float]], length: int) -> np.ndarray:
+    """Converts a list of optional floats to float32, padding/truncating to length (None -> NaN)."""
+    converted = np.array(values, dtype=np.float64)[:length]
+    if len(converted) < length:
+        converted = np.concatenate((converted, np.full(length - len(converted), np.nan)))
+    return converted.astype(VALUE_DTYPE)
+
+
+class AmbienceArrayBuilder:
+    """
+    Converts ambience measures into flat typed arrays.
+
+    Every AmbienceResultDetail (one measure, device location and batch day)
+    becomes an index row plus a contiguous slice [offset, offset + length) of
+    the time array and of one float32 array per VALUE_FIELDS entry. Missing
+    samples are stored as NaN, so the slices can be fed to NumPy directly.
+    """
+
+    def __init__(self):
+        self.index = {column: [] for column in INDEX_COLUMNS}
+        self.time = array('q')
+        self.values = {field: array('f') for field in VALUE_FIELDS}
+
+    def __len__(self):
+        """Returns the number of samples."""
+        return len(self.time)
+
+    def append_ambience(self, environment_name: str, batch_name: str, ambience: Ambience) -> int:
+        """
+        Appends every measure/day of an Ambience object.
+
+        Series shorter than time are padded with NaN; longer ones are truncated.
+
+        Returns:
+            The number of samples appended.
+        """
+        appended = 0
+        for measure_result in ambience.result:
+            for day in measure_result.result:
+                length = len(day.time)
+                offset = len(self.time)
+                for column, value in zip(INDEX_COLUMNS, (
+                        environment_name, batch_name, measure_result.measure, measure_result.deviceLocation,
+                        day.batchDay, day.start, day.stop, day.minReference, day.maxReference, offset, length)):
+                    self.index[column].append(value)
+                self.time.extend(day.time)
+                for field in VALUE_FIELDS:
+                    self.values[field].frombytes(_to_float_array(getattr(day, field), length).tobytes())
+                appended += length
+        return appended
+
+    def extend(self, other: 'AmbienceArrayBuilder'):
+        """Appends all series of another builder, shifting its offsets."""
+        shift = len(self.time)
+        for column, values in other.index.items():
+            if column == 'offset':
+                values = [offset + shift for offset in values]
+            self.index[column].extend(values)
+        self.time.extend(other.time)
+        for field, values in other.values.items():
+            self.values[field].extend(values)
+        return self
+
+    def index_frame(self) -> pd.DataFrame:
+        """Returns the index table (one row per measure/device location/batch day)."""
+        return pd.DataFrame(self.index, columns=INDEX_COLUMNS)
+
+    def write(self, store_dir) -> Path:
+        """
+        Persists the arrays as an AmbienceStore directory, replacing any previous store.
+
+        Returns:
+            The store directory.
+        """
+        store_dir = Path(store_dir)
+        tmp_dir = store_dir.with_name(store_dir.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        save_table(self.index_frame(), tmp_dir / AmbienceStore.INDEX_NAME)
+        np.save(tmp_dir / 'time.npy', np.frombuffer(self.time, dtype=TIME_DTYPE))
+        for field, values in self.values.items():
+            np.save(tmp_dir / f'{field}.npy', np.frombuffer(values, dtype=VALUE_DTYPE))
+        with open(tmp_dir / AmbienceStore.META_NAME, 'w', encoding='utf-8') as f:
+            json.dump({'version': AmbienceStore.STORE_VERSION, 'samples': len(self),
+                       'fields': VALUE_FIELDS}, f, indent=2)
+
+        # Swap in the complete store only once everything is written
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        tmp_dir.rename(store_dir)
+        return store_dir
+
+
+class AmbienceStore:
+    """
+    Read side of the ambience arrays written by AmbienceArrayBuilder.
+
+    The index table is loaded into memory; the sample arrays are opened as
+    read-only memory maps, so selecting a slice of the fleet (e.g. every
+    'temperature' series of one environment) only touches the pages it reads.
+    """
+    INDEX_NAME = 'index'
+    META_NAME = 'meta.json'
+    STORE_VERSION = 1
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        meta_path = self.store_dir / self.META_NAME
+        if not meta_path.is_file():
+            raise FileNotFoundError(f"No ambience store found at '{self.store_dir}'")
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != self.STORE_VERSION:
+            raise ValueError(f"Ambience store version {meta.get('version')} is not supported "
+                             f"(expected {self.STORE_VERSION}). Rebuild it with src/scripts/scan_raw_data.py.")
+        self.fields = meta['fields']
+        self.index = load_table(self.store_dir / self.INDEX_NAME)
+        self.time = np.load(self.store_dir / 'time.npy', mmap_mode='r')
+        self.values = {field: np.load(self.store_dir / f'{field}.npy', mmap_mode='r') for field in self.fields}
+
+    def __len__(self):
+        """Returns the number of samples."""
+        return len(self.time)
+
+    def select_index(self, environment_name=None, batch_name=None, measure=None, device_location=None,
+                     batch_days=None) -> pd.DataFrame:
+        """
+        Returns the index rows matching the filters. Each filter takes a single
+        value or a list of values; None means no filter.
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        for column, value in (('environmentName', environment_name), ('batchName', batch_name),
+                              ('measure', measure), ('deviceLocation', device_location), ('batchDay', batch_days)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, (str, int, np.integer)) else list(value)
+            mask &= self.index[column].isin(values).to_numpy()
+        return self.index[mask]
+
+    def select(self, environment_name=None, batch_name=None, measure=None, device_location=None,
+               batch_days=None, fields: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Returns the samples of the matching series as a long DataFrame: the
+        KEY_COLUMNS, 'time' and the requested value fields (all by default).
+        """
+        fields = list(fields) if fields is not None else self.fields
+        unknown = [field for field in fields if field not in self.values]
+        if unknown:
+            raise ValueError(f"Unknown ambience fields: {unknown}. Available: {self.fields}")
+
+        selected = self.select_index(environment_name, batch_name, measure, device_location, batch_days)
+        positions = self._positions(selected)
+        lengths = selected['length'].to_numpy()
+
+        columns = {column: np.repeat(selected[column].to_numpy(), lengths) for column in KEY_COLUMNS}
+        columns['time'] = self.time[positions]
+        for field in fields:
+            columns[field] = self.values[field][positions]
+        return pd.DataFrame(columns, columns=KEY_COLUMNS + ['time'] + fields)
+
+    def series(self, field: str, **filters) -> np.ndarray:
+        """Returns the concatenated samples of one value field for the matching series."""
+        return np.asarray(self.values[field][self._positions(self.select_index(**filters))])
+
+    @staticmethod
+    def _positions(selected: pd.DataFrame) -> np.ndarray:
+        """Expands the (offset, length) slices of the index rows into sample positions."""
+        offsets = selected['offset'].to_numpy(dtype=np.int64)
+        lengths = selected['length'].to_numpy(dtype=np.int64)
+        if lengths.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        # Start of each slice repeated over its length, plus the position within the slice
+        starts = np.repeat(offsets, lengths)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return starts + within
+
@@ -6,7 +6,7 @@ def analyze_single_silo_file(file_path: Path):
     Loads a single silo data file and prints some key information.
     """
     print(f"Analyzing file: {file_path}")
-    silo_data = load_silo_data(file_path)
+    silo_data = load_silo_data(file_path, fast=True)
 
     if silo_data:
         print(f"  Batch Name: {silo_data.batch.name}")
@@ -6,22 +6,89 @@ from sklearn.preprocessing import LabelEncoder
 import numpy as np
 import sys
 import os
-
-def analyze_silo_data(file_path):
+import tempfile
+import time
+import joblib
+from joblib import Parallel, delayed
+from src.utils.schema import PROCESSED_SCHEMA, to_float64
+from src.utils.storage import load_table
+
+def _resolve_core_budget(n_jobs):
+    """Returns the number of cores to use (None or -1 = every CPU)."""
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(1, n_jobs)
+
+def _fit_fold(fold, X, y, sample_weights, train_index, val_index, n_jobs=1):
+    """Trains the fold's forest on the training rows and returns its training time and validation MAE."""
+    start = time.perf_counter()
+    fold_model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    fold_model.fit(X[train_index], y[train_index], sample_weight=sample_weights[train_index])
+    train_seconds = time.perf_counter() - start
+    mae = mean_absolute_error(y[val_index], fold_model.predict(X[val_index]))
+    return {'fold': fold, 'train_rows': len(train_index), 'val_rows': len(val_index),
+            'train_seconds': round(train_seconds, 2), 'mae': mae}
+
+def cross_validate(X, y, sample_weights, n_splits=5, n_jobs=1):
+    """
+    Runs the KFold cross-validation of the model with a core budget of n_jobs
+    (None or -1 = every CPU). With one core the folds are trained one after the
+    other; otherwise they run concurrently in joblib worker processes, which
+    share one memory-mapped copy of X, y and the weights, and each forest
+    gets an equal share of the budget. The folds, seeds and MAEs are the same
+    for every budget.
+
+    Returns:
+        A DataFrame with one row per fold: train/val rows, training time and MAE.
+    """
+    budget = _resolve_core_budget(n_jobs)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    sample_weights = np.ascontiguousarray(sample_weights, dtype=np.float64)
+    splits = list(KFold(n_splits=n_splits, shuffle=True, random_state=42).split(X, y))
+
+    if budget == 1:
+        results = [_fit_fold(fold, X, y, sample_weights, train_index, val_index)
+                   for fold, (train_index, val_index) in enumerate(splits, start=1)]
+        return pd.DataFrame(results)
+
+    fold_workers = min(n_splits, budget)
+    forest_jobs = max(1, budget // fold_workers)
+    with tempfile.TemporaryDirectory(prefix="silo_cv_") as tmp:
+        data_path = os.path.join(tmp, "cv_data.joblib")
+        joblib.dump((X, y, sample_weights), data_path)
+        X, y, sample_weights = joblib.load(data_path, mmap_mode='r')
+        results = Parallel(n_jobs=fold_workers)(
+            delayed(_fit_fold)(fold, X, y, sample_weights, train_index, val_index, n_jobs=forest_jobs)
+            for fold, (train_index, val_index) in enumerate(splits, start=1))
+    return pd.DataFrame(results)
+
+def analyze_silo_data(file_path, n_jobs=1):
     """
     Analyzes silo data, trains a RandomForestRegressor model, and returns
     the trained model, the list of features used, and the cluster name mapping.
+    n_jobs is the core budget of the training and of the cross-validation
+    (None or -1 = every CPU, see cross_validate).
     """
-    # Load the dataset
+    budget = _resolve_core_budget(n_jobs)
+    # Define features (X) and target (Y)
+    features = ['AreaAlojamento_Encoded', 'batchAge','ClassifCluster', 'PontuacaoMax','IEPMedian']
+    target = 'feed_measuredPerBird'
+    sample_weight_col = 'confidence_level'
+
+    # Load the dataset (only the columns the model uses)
     try:
-        df = pd.read_csv(file_path, sep=',')
+        df = load_table(file_path, columns=features + [target, sample_weight_col], schema=PROCESSED_SCHEMA)
     except FileNotFoundError:
         print(f"Error: The file '{file_path}' was not found.")
         sys.exit(1)
     except Exception as e:
-        print(f"Error loading the CSV file: {e}")
+        print(f"Error loading the dataset: {e}")
         sys.exit(1)
 
+    # The model is trained on the recorded (float64) target values, not their float32 storage
+    df[target] = to_float64(df[target])
+
     # 1. Quality Filtering
     # Filter by confidence_level
     df_filtered = df[df['confidence_level'] >= 0.8].copy()
@@ -29,11 +96,6 @@ def analyze_silo_data(file_path):
     # Remove outliers from IEPMedian (values outside 200-500)
     df_filtered = df_filtered[(df_filtered['IEPMedian'] >= 200) & (df_filtered['IEPMedian'] <= 500)].copy()
 
-    # Define features (X) and target (Y)
-    features = ['AreaAlojamento_Encoded', 'batchAge','ClassifCluster', 'PontuacaoMax','IEPMedian']
-    target = 'feed_measuredPerBird'
-    sample_weight_col = 'confidence_level'
-
     # Drop rows with NaN values in relevant columns before encoding
     df_filtered.dropna(subset=features + [target, sample_weight_col], inplace=True)
 
@@ -66,27 +128,21 @@ def analyze_silo_data(file_path):
     print(f"Target used: {target}")
 
     # 3. Training a Random Forest Regressor
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    start = time.perf_counter()
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=budget)
     model.fit(X, y, sample_weight=sample_weights)
-    print("""
-Random Forest Regressor trained successfully.""")
+    print(f"""
+Random Forest Regressor trained successfully in {time.perf_counter() - start:.2f}s ({budget} cores).""")
 
     # Cross-validation
-    print("\nPerforming Cross-validation (5-Fold) with manual loop...")
-    cv = KFold(n_splits=5, shuffle=True, random_state=42)
-    cv_mae_scores = []
-
-    for train_index, val_index in cv.split(X, y, groups=sample_weights): # groups is ignored by KFold but useful if using GroupKFold
-        X_train, X_val = X.iloc[train_index], X.iloc[val_index]
-        y_train, y_val = y.iloc[train_index], y.iloc[val_index]
-        sample_weights_train, sample_weights_val = sample_weights.iloc[train_index], sample_weights.iloc[val_index]
-
-        fold_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        fold_model.fit(X_train, y_train, sample_weight=sample_weights_train)
-        y_pred_val = fold_model.predict(X_val)
-        mae = mean_absolute_error(y_val, y_pred_val)
-        cv_mae_scores.append(mae)
-    
+    mode = "sequential folds" if budget == 1 else f"concurrent folds, {budget} cores"
+    print(f"\nPerforming Cross-validation (5-Fold, {mode})...")
+    start = time.perf_counter()
+    cv_report = cross_validate(X, y, sample_weights, n_splits=5, n_jobs=budget)
+    print(cv_report.to_markdown(index=False))
+    print(f"Cross-validation wall time: {time.perf_counter() - start:.2f}s")
+    cv_mae_scores = cv_report['mae'].to_numpy()
+
     cv_mae_mean = np.mean(cv_mae_scores)
     cv_mae_std = np.std(cv_mae_scores)
 
@@ -0,0 +1,187 @@
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+from src.utils.schema import CURVE_SCHEMA, apply_schema, to_float64
+
+# Relative cutoff of the singular values in solve_normal_equations; the fits are solved in a
+# centred and scaled basis, where only genuinely singular groups get this close to zero
+RCOND = 1e-10
+
+
+def coefficient_columns(degree):
+    """Names of the coefficients of 1, x, ..., x**degree in the fit tables."""
+    return [f'coef_x{power}' for power in range(degree + 1)]
+
+
+def curve_degree(curves):
+    """Returns the polynomial degree of a curve table (from its coefficient columns)."""
+    return sum(column.startswith('coef_x') for column in curves.columns) - 1
+
+
+def solve_normal_equations(gram, rhs, rcond=RCOND):
+    """
+    Solves a batch of normal equations gram[g] @ beta[g] = rhs[g]. The
+    pseudo-inverse gives the minimum-norm least-squares solution, so groups
+    with fewer distinct x values than coefficients get a fit too.
+    """
+    return np.einsum('gij,gj->gi', np.linalg.pinv(gram, rcond=rcond, hermitian=True), rhs)
+
+
+def fit_polynomials(groups, x, y, degree=2, n_groups=None):
+    """
+    Fits a least-squares polynomial of the given degree to every group at once.
+
+    Per group, x is centred on its mean and scaled by its standard deviation
+    and y is centred, so the normal equations stay well conditioned. Their
+    terms are grouped sums of powers of x and of x-power times y (np.bincount),
+    and all groups are solved in one batched call. The coefficients are then
+    converted back to powers of the original x. R^2 and the residual
+    statistics come from the exact residuals of every row.
+
+    R^2 follows CurveModeler's rules: NaN with fewer rows than coefficients,
+    and 1.0 for a constant y (a constant curve fits it exactly).
+
+    Args:
+        groups: Integer group code (0 .. n_groups - 1) of every row.
+        x, y: The values of every row (no NaN).
+        degree: Degree of the polynomial.
+        n_groups: Number of groups (default: the largest code + 1).
+
+    Returns:
+        A DataFrame indexed by group code with n, x_min, x_max, the
+        coefficient_columns(degree), r2, rss (residual sum of squares), rmse
+        and max_abs_residual. Groups without rows are all NaN (n = 0).
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+    n = np.bincount(groups, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.bincount(groups, x, minlength=n_groups) / n
+        y_mean = np.bincount(groups, y, minlength=n_groups) / n
+        dx = x - x_mean[groups]
+        x_scale = np.sqrt(np.bincount(groups, dx * dx, minlength=n_groups) / n)
+    x_scale = np.where(x_scale > 0, x_scale, 1.0)
+    u = dx / x_scale[groups]
+    yc = y - y_mean[groups]
+
+    # Sums of u^0 .. u^(2 * degree) and of u^0 .. u^degree times the centred y
+    power = np.ones_like(u)
+    u_sums, uy_sums = [], []
+    for k in range(2 * degree + 1):
+        u_sums.append(np.bincount(groups, power, minlength=n_groups))
+        if k <= degree:
+            uy_sums.append(np.bincount(groups, power * yc, minlength=n_groups))
+        power = power * u
+    u_sums = np.stack(u_sums, axis=1)
+    gram = np.stack([u_sums[:, i:i + degree + 1] for i in range(degree + 1)], axis=1)
+    beta = solve_normal_equations(gram, np.stack(uy_sums, axis=1))
+
+    # Exact residuals of every row, with the fit in the scaled basis
+    predicted = np.zeros_like(u)
+    for k in range(degree, -1, -1):
+        predicted = predicted * u + beta[groups, k]
+    residuals = yc - predicted
+    rss = np.bincount(groups, residuals * residuals, minlength=n_groups)
+    tss = np.bincount(groups, yc * yc, minlength=n_groups)
+    max_abs_residual = np.zeros(n_groups)
+    np.maximum.at(max_abs_residual, groups, np.abs(residuals))
+    x_min = np.full(n_groups, np.inf)
+    np.minimum.at(x_min, groups, x)
+    x_max = np.full(n_groups, -np.inf)
+    np.maximum.at(x_max, groups, x)
+
+    # A group is constant when every y equals its first y
+    first_rows = np.full(n_groups, -1, dtype=np.int64)
+    present, first_positions = np.unique(groups, return_index=True)
+    first_rows[present] = first_positions
+    differing = np.bincount(groups, y != y[first_rows[groups]], minlength=n_groups) if len(y) else n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(differing == 0, 1.0, 1.0 - rss / tss)
+    r2 = np.where(n >= degree + 1, r2, np.nan)
+
+    # sum_k beta_k ((x - m) / s)^k = sum_j c_j x^j, with c_j = sum_{k >= j} beta_k C(k, j) (-m)^(k - j) / s^k
+    coefficients = np.zeros((n_groups, degree + 1))
+    for k in range(degree + 1):
+        scaled = beta[:, k] / x_scale ** k
+        for j in range(k + 1):
+            coefficients[:, j] += scaled * comb(k, j) * (-x_mean) ** (k - j)
+    coefficients[:, 0] += y_mean
+
+    table = pd.DataFrame({'n': n, 'x_min': x_min, 'x_max': x_max})
+    for name, values in zip(coefficient_columns(degree), coefficients.T):
+        table[name] = values
+    table['r2'] = r2
+    table['rss'] = rss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['rmse'] = np.sqrt(rss / n)
+    table['max_abs_residual'] = max_abs_residual
+    table.loc[n == 0, table.columns.drop('n')] = np.nan
+    return table
+
+
+def fit_lote_curves(df, degree=2, x_column='batchAge', y_column='feed_measuredPerBird'):
+    """
+    Fits the consumption curve (y_column against x_column) of every
+    loteComposto of a frame with fit_polynomials. y is fitted in float64 (see
+    src.utils.schema.to_float64).
+
+    Returns:
+        The fit_polynomials table of the lotes with rows, indexed by a
+        loteComposto CategoricalIndex, with x_min/x_max named age_min/age_max
+        when x_column is batchAge.
+    """
+    lote = df['loteComposto']
+    if not isinstance(lote.dtype, pd.CategoricalDtype):
+        lote = lote.astype('category')
+    codes = lote.cat.codes.to_numpy(dtype=np.int64)
+    x = df[x_column].to_numpy(dtype=np.float64)
+    y = to_float64(df[y_column])
+    valid = (codes >= 0) & ~np.isnan(x) & ~np.isnan(y)
+    table = fit_polynomials(codes[valid], x[valid], y[valid], degree=degree, n_groups=len(lote.cat.categories))
+    table = table[table['n'] > 0]
+    table.index = pd.CategoricalIndex(pd.Categorical.from_codes(table.index.to_numpy(), dtype=lote.dtype),
+                                      name='loteComposto')
+    if x_column == 'batchAge':
+        table = table.rename(columns={'x_min': 'age_min', 'x_max': 'age_max'})
+    return table
+
+
+def curve_table(fits):
+    """
+    Returns the compact per-lote curve table persisted with the processed data
+    (lote_curves): loteComposto, n, age_min, age_max, the coefficients,
+    confidence_level (R^2) and rmse, from a fit_lote_curves table.
+    """
+    columns = ['loteComposto', 'n', 'age_min', 'age_max', *coefficient_columns(curve_degree(fits)),
+               'confidence_level', 'rmse']
+    table = fits.rename(columns={'r2': 'confidence_level'}).reset_index()
+    table['loteComposto'] = table['loteComposto'].cat.remove_unused_categories()
+    return apply_schema(table[columns], CURVE_SCHEMA)
+
+
+def evaluate_curves(curves, ages):
+    """
+    Evaluates the curves of a curve table at ages: an array of ages shared by
+    every curve, or one row of ages per curve. Returns one row of values per curve.
+    """
+    coefficients = curves[coefficient_columns(curve_degree(curves))].to_numpy(dtype=np.float64)
+    ages = np.asarray(ages, dtype=np.float64)
+    if ages.ndim == 1:
+        ages = np.broadcast_to(ages, (len(curves), len(ages)))
+    values = np.zeros(ages.shape)
+    for power in range(coefficients.shape[1] - 1, -1, -1):
+        values = values * ages + coefficients[:, power][:, None]
+    return values
+
+
+def curve_points(curves, n_points=100):
+    """Returns (ages, values): n_points evenly spaced ages over every curve's age range and the curve there."""
+    age_min = curves['age_min'].to_numpy(dtype=np.float64)[:, None]
+    age_max = curves['age_max'].to_numpy(dtype=np.float64)[:, None]
+    ages = age_min + (age_max - age_min) * np.linspace(0.0, 1.0, n_points)
+    return ages, evaluate_curves(curves, ages)
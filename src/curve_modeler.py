@@ -1,56 +1,78 @@
 import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.metrics import r2_score
+from src.curve_fitting import curve_table, fit_lote_curves
+from src.growth_models import DEFAULT_GROWTH_MODELS, fit_growth_models
+from src.utils.diagnostics import debug
+from src.utils.instrumentation import instrumented
 
 class CurveModeler:
-    def __init__(self, df):
+    def __init__(self, df, degree=2):
         self.df = df
+        self.degree = degree # Quadratic curve
         self.confidence_column_name = 'confidence_level'
+        self.curves = None # curve_table of the fitted lotes, set by add_confidence_level
+        self.growth_models = None # fit_growth_models table, set by fit_growth_models
 
-    def _fit_curve_and_calculate_confidence(self, group):
+    def fit_curves(self):
         """
-        Fits a polynomial regression curve to the feed_measuredPerBird vs batchAge
-        for a given loteComposto group and calculates an R-squared confidence level.
+        Fits the feed_measuredPerBird vs batchAge polynomial of every loteComposto
+        group in one batched pass (see src.curve_fitting.fit_lote_curves).
+        Returns the per-lote table of coefficients, R^2 and residual statistics.
         """
-        if len(group) < 3: # Need at least 3 points for a quadratic fit
-            return pd.Series({self.confidence_column_name: np.nan})
+        return fit_lote_curves(self.df, degree=self.degree)
 
-        X = group[['batchAge']]
-        y = group['feed_measuredPerBird']
-
-        # Using PolynomialFeatures to create polynomial terms for batchAge
-        poly = PolynomialFeatures(degree=2) # Starting with a quadratic curve
-        X_poly = poly.fit_transform(X)
-
-        model = LinearRegression()
-        model.fit(X_poly, y)
-        
-        y_pred = model.predict(X_poly)
-        confidence = r2_score(y, y_pred)
-        
-        return pd.Series({self.confidence_column_name: confidence})
+    def confidence_by_lote(self):
+        """
+        Returns the confidence level (R^2 of the curve, NaN below 3 points) of
+        every loteComposto group as a Series indexed by lote.
+        """
+        return self.fit_curves()['r2'].rename(self.confidence_column_name)
 
+    @instrumented
     def add_confidence_level(self):
         """
         Calculates the confidence level for each loteComposto group based on curve fitting
-        and adds it as a new column to the DataFrame.
+        and adds it as a new column to the DataFrame. The fitted curves are kept
+        in self.curves (see get_curve_table).
         """
         if self.df is None or self.df.empty:
             print("No data to model consumption curve and calculate confidence level.")
             return self
 
         print("Modeling consumption curve and calculating confidence level...")
-        confidence_df = self.df.groupby('loteComposto').apply(self._fit_curve_and_calculate_confidence).reset_index()
+        fits = self.fit_curves()
+        self.curves = curve_table(fits)
+        confidence_df = fits['r2'].rename(self.confidence_column_name).reset_index()
         self.df = pd.merge(self.df, confidence_df, on='loteComposto', how='left')
         
         print(f"DataFrame shape after adding {self.confidence_column_name}: {self.df.shape}")
-        print("Confidence levels (first 5):")
-        print(self.df[['loteComposto', self.confidence_column_name]].drop_duplicates().head())
+        debug("CurveModeler.add_confidence_level.confidence", first=lambda: confidence_df.head())
         
         return self
 
+    def fit_growth_models(self, models=DEFAULT_GROWTH_MODELS, n_workers=1):
+        """
+        Fits every candidate growth model (see src.growth_models: 'poly<degree>',
+        'gompertz', 'logistic', 'piecewise' or any registered model) to every
+        loteComposto, the nonlinear ones across n_workers processes (None for
+        one per CPU), and selects the best model per lote by AIC. The table of
+        per-model goodness of fit and selection is kept in self.growth_models.
+        """
+        if self.df is None or self.df.empty:
+            print("No data to fit growth models.")
+            return self
+        self.growth_models = fit_growth_models(self.df, models=models, n_workers=n_workers)
+        selected = self.growth_models.loc[self.growth_models['selected'], 'model'].value_counts()
+        print(f"Growth models selected by AIC: {selected.to_dict()}")
+        return self
+
+    def get_growth_model_table(self):
+        """Returns the per-lote, per-model goodness-of-fit table of fit_growth_models."""
+        return self.growth_models
+
+    def get_curve_table(self):
+        """Returns the per-lote curve table (coefficients, R^2, n, age range) of the last fit."""
+        return self.curves
+
     def get_modeled_dataframe(self):
         """Returns the DataFrame with confidence levels."""
         return self.df
\ No newline at end of file
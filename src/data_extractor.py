@@ -1,85 +1,240 @@
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from src.extraction_cache import ExtractionCache
+from src.utils.columnar_builder import CONSUMPTION_COLUMNS, ConsumptionColumnBuilder
 from src.utils.data_loader import load_silo_data
-from src.data_model import SiloData, ConsumptionItem, FeedMetrics # Import necessary models
+from src.utils.schema import CONSUMPTION_SCHEMA, apply_schema
+from src.data_model import Consumption, ConsumptionItem, FeedMetrics # Import necessary models
+
+# Column order of the extracted DataFrame (matches the original dataset_consumo.csv)
+EXPECTED_COLUMNS = CONSUMPTION_COLUMNS
+
+
+def _extract_file_block(json_file):
+    """
+    Extracts the consumption rows of a single raw JSON file.
+
+    Runs both in the main process (serial mode) and inside pool workers
+    (parallel mode), so it must stay a picklable module-level function.
+
+    Returns:
+        A tuple (block, error) where block is a ConsumptionColumnBuilder with the
+        file's rows and error is None or a short description of why the file failed.
+    """
+    try:
+        # Validated straight from the bytes (see load_silo_data), the fastest loader that checks the whole file
+        silo_data = load_silo_data(json_file, fast=True)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    if silo_data is None:
+        return None, "could not be loaded or validated"
+
+    block = ConsumptionColumnBuilder()
+    consumption_data = silo_data.consumption
+    # Ensure consumption is a Consumption object, not a string or None
+    if isinstance(consumption_data, Consumption):
+        names = (consumption_data.environmentName, consumption_data.batchName, consumption_data.clientName)
+        # Iterate through result items (main consumption data points)
+        block.append_items(*names, consumption_data.result)
+
+        # Also consider preBatchInfo if it contains relevant data
+        if consumption_data.preBatchInfo:
+            block.append_items(*names, consumption_data.preBatchInfo)
+    return block, None
+
 
 class DataExtractor:
-    def __init__(self, raw_data_dir):
+    def __init__(self, raw_data_dir, n_workers=1, cache_dir=None):
         self.raw_data_dir = Path(raw_data_dir)
+        self.n_workers = n_workers
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
         self.extracted_df = None
+        self.failed_files = []
+        self.cache_removed = 0
+
+    def _resolve_workers(self, n_files):
+        """Returns the number of worker processes to use for n_files files."""
+        n_workers = self.n_workers if self.n_workers is not None else (os.cpu_count() or 1)
+        if n_workers <= 0:
+            n_workers = os.cpu_count() or 1
+        return max(1, min(n_workers, n_files))
+
+    def _parse_files(self, json_files):
+        """Parses json_files serially or across a process pool, preserving their order."""
+        n_workers = self._resolve_workers(len(json_files))
+        if n_workers > 1:
+            print(f"Extracting {len(json_files)} files with {n_workers} worker processes...")
+            chunksize = max(1, len(json_files) // (n_workers * 4))
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                return list(executor.map(_extract_file_block, json_files, chunksize=chunksize))
+        return [_extract_file_block(json_file) for json_file in json_files]
+
+    def _open_cache(self, json_files):
+        """Opens the extraction cache (if configured) and drops the entries of deleted files."""
+        if self.cache_dir is None:
+            return None
+        cache = ExtractionCache(self.cache_dir)
+        self.cache_removed = cache.prune(json_files)
+        return cache
+
+    def _extract_files(self, json_files, cache):
+        """
+        Extracts json_files (from the cache when possible) into one
+        ConsumptionColumnBuilder, in file order. Failures are appended to
+        self.failed_files.
+        """
+        blocks = [None] * len(json_files)
+        if cache is not None:
+            blocks = [cache.get(json_file) for json_file in json_files]
+
+        to_parse = [i for i, block in enumerate(blocks) if block is None]
+        # Fingerprinted before parsing, so a file written meanwhile is not cached as unchanged
+        fingerprints = {i: cache.fingerprint(json_files[i]) for i in to_parse} if cache is not None else {}
+        results = self._parse_files([json_files[i] for i in to_parse])
+
+        failed = []
+        for i, (block, error) in zip(to_parse, results):
+            if error is not None:
+                failed.append((json_files[i], error))
+                continue
+            blocks[i] = block
+        if failed:
+            print(f"Failed to extract {len(failed)} of {len(json_files)} JSON files:")
+            for json_file, error in failed:
+                print(f"  {json_file.name}: {error}")
+        self.failed_files.extend(failed)
+
+        builder = ConsumptionColumnBuilder()
+        for i, block in enumerate(blocks):
+            if block is None:
+                continue
+            if isinstance(block, pd.DataFrame): # Cached shard
+                builder.extend_frame(block)
+                continue
+            builder.extend(block)
+            if cache is not None:
+                cache.put(json_files[i], block.to_dataframe(), fingerprints[i])
+        return builder
+
+    def iter_extracted_chunks(self, files_per_chunk=500):
+        """
+        Yields the extracted rows as one DataFrame per chunk of files_per_chunk
+        files (in sorted file order), so the whole dataset is never held in
+        memory at once. Concatenating the chunks gives the extract_from_json frame.
+        """
+        if not self.raw_data_dir.is_dir():
+            print(f"Error: Raw data directory not found at {self.raw_data_dir}")
+            return
+
+        json_files = sorted(self.raw_data_dir.glob("*.json"))
+        print(f"Found {len(json_files)} JSON files in {self.raw_data_dir}")
+
+        cache = self._open_cache(json_files)
+        self.failed_files = []
+        for start in range(0, len(json_files), files_per_chunk):
+            builder = self._extract_files(json_files[start:start + files_per_chunk], cache)
+            if len(builder):
+                yield apply_schema(builder.to_dataframe(), CONSUMPTION_SCHEMA)
+        if cache is not None:
+            print(f"Extraction cache: {cache.hits} unchanged, {cache.misses} new or changed, {self.cache_removed} removed files.")
+            cache.save()
+
+    def extract_changes(self):
+        """
+        Extracts only what changed in the raw directory since the extraction
+        cache was last saved, for incremental runs. Needs a cache_dir.
+
+        A changed file whose previously extracted rows are a prefix of its new
+        rows (days were appended) only contributes the new rows; any other
+        new or changed file contributes all of its rows.
+
+        Returns:
+            A tuple (appended, replaced, removed) of DataFrames with the
+            CONSUMPTION_SCHEMA dtypes: the appended rows, the full rows of the
+            new or rewritten files, and the previous rows of deleted or
+            rewritten files.
+        """
+        if self.cache_dir is None:
+            raise ValueError("extract_changes needs a cache_dir to detect the changed files.")
+        if not self.raw_data_dir.is_dir():
+            print(f"Error: Raw data directory not found at {self.raw_data_dir}")
+            return None
+
+        json_files = sorted(self.raw_data_dir.glob("*.json"))
+        print(f"Found {len(json_files)} JSON files in {self.raw_data_dir}")
+
+        cache = ExtractionCache(self.cache_dir)
+        removed = ConsumptionColumnBuilder()
+        for name in cache.stale_names(json_files):
+            previous = cache.load(name)
+            if previous is not None:
+                removed.extend_frame(previous)
+        self.cache_removed = cache.prune(json_files)
+
+        changed = [json_file for json_file in json_files if not cache.is_fresh(json_file)]
+        fingerprints = [cache.fingerprint(json_file) for json_file in changed]
+        results = self._parse_files(changed)
+        self.failed_files = []
+        appended, replaced = ConsumptionColumnBuilder(), ConsumptionColumnBuilder()
+        for json_file, fingerprint, (block, error) in zip(changed, fingerprints, results):
+            if error is not None:
+                self.failed_files.append((json_file, error))
+                continue
+            rows = block.to_dataframe()
+            previous = cache.load(json_file.name)
+            if previous is not None and len(previous) <= len(rows) \
+                    and previous.equals(rows.iloc[:len(previous)].reset_index(drop=True)):
+                appended.extend_frame(rows.iloc[len(previous):])
+            else:
+                replaced.extend(block)
+                if previous is not None: # Its lotes are rebuilt, including the ones the file no longer has
+                    removed.extend_frame(previous)
+            cache.put(json_file, rows, fingerprint)
+        if self.failed_files:
+            print(f"Failed to extract {len(self.failed_files)} of {len(changed)} changed JSON files:")
+            for json_file, error in self.failed_files:
+                print(f"  {json_file.name}: {error}")
+        print(f"Extraction cache: {cache.hits} unchanged, {cache.misses} new or changed, {self.cache_removed} removed files.")
+        cache.save()
+
+        changes = tuple(apply_schema(builder.to_dataframe(), CONSUMPTION_SCHEMA)
+                        for builder in (appended, replaced, removed))
+        print(f"Extracted changes: {len(changes[0])} appended, {len(changes[1])} replaced, {len(changes[2])} removed rows.")
+        return changes
 
     def extract_from_json(self):
         """
         Extracts relevant data from raw JSON files in the specified directory
         and consolidates it into a pandas DataFrame.
+
+        Files are parsed serially when n_workers is 1, and across a process pool
+        otherwise (None or 0 means one worker per CPU). Both modes produce the
+        same DataFrame: files are processed in sorted order and their columnar
+        row blocks are appended to one ConsumptionColumnBuilder in that order.
+
+        With a cache_dir, the rows of every successfully parsed file are kept in
+        an ExtractionCache and only new or changed files are parsed again.
+
+        The DataFrame uses the compact dtypes of src.utils.schema.CONSUMPTION_SCHEMA.
         """
-        all_records = []
-        
         if not self.raw_data_dir.is_dir():
             print(f"Error: Raw data directory not found at {self.raw_data_dir}")
             return None
 
-        json_files = list(self.raw_data_dir.glob("*.json"))
+        json_files = sorted(self.raw_data_dir.glob("*.json"))
         print(f"Found {len(json_files)} JSON files in {self.raw_data_dir}")
 
-        for json_file in json_files:
-            silo_data = load_silo_data(json_file)
-            if silo_data and silo_data.consumption:
-                # Ensure consumption is a Consumption object, not a string or None
-                if isinstance(silo_data.consumption, SiloData.model_fields['consumption'].annotation.__args__[0]): # This is a bit verbose to get Consumption type
-                    consumption_data = silo_data.consumption
-                    # Iterate through result items (main consumption data points)
-                    for item in consumption_data.result:
-                        record = {
-                            'environmentName': consumption_data.environmentName,
-                            'batchName': consumption_data.batchName,
-                            'clientName': consumption_data.clientName,
-                            'batchAge': item.batchAge,
-                            'preBatch_feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0,
-                            'feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0, # Assuming this is the same as preBatch_feedDelivery_measured if only one value is present
-                            'feed_measured': item.feed.measured if item.feed and item.feed.measured is not None else 0.0,
-                            'feed_manual_measured': item.feed.manual if item.feed and item.feed.manual is not None else 0.0,
-                            'feed_measuredPerBird': item.feed.measuredPerBird if item.feed and item.feed.measuredPerBird is not None else 0.0,
-                            'siloEmptyTime': item.siloEmptyTime if item.siloEmptyTime is not None else 0,
-                            'siloNoConsumptionTime': item.siloNoConsumptionTime if item.siloNoConsumptionTime is not None else 0,
-                            # Add other fields if necessary, ensuring to handle Optional types
-                        }
-                        all_records.append(record)
-                    
-                    # Also consider preBatchInfo if it contains relevant data
-                    if consumption_data.preBatchInfo:
-                        for item in consumption_data.preBatchInfo:
-                            record = {
-                                'environmentName': consumption_data.environmentName,
-                                'batchName': consumption_data.batchName,
-                                'clientName': consumption_data.clientName,
-                                'batchAge': item.batchAge,
-                                'preBatch_feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0,
-                                'feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0,
-                                'feed_measured': item.feed.measured if item.feed and item.feed.measured is not None else 0.0,
-                                'feed_manual_measured': item.feed.manual if item.feed and item.feed.manual is not None else 0.0,
-                                'feed_measuredPerBird': item.feed.measuredPerBird if item.feed and item.feed.measuredPerBird is not None else 0.0,
-                                'siloEmptyTime': item.siloEmptyTime if item.siloEmptyTime is not None else 0,
-                                'siloNoConsumptionTime': item.siloNoConsumptionTime if item.siloNoConsumptionTime is not None else 0,
-                            }
-                            all_records.append(record)
-
-        if all_records:
-            self.extracted_df = pd.DataFrame(all_records)
-            # Reorder columns to match the original dataset_consumo.csv if possible for consistency
-            # This is an example, adjust if your raw JSON structure implies a different order
-            expected_columns = [
-                'environmentName', 'batchName', 'clientName', 'batchAge',
-                'preBatch_feedDelivery_measured', 'feedDelivery_measured', 'feed_measured',
-                'feed_manual_measured', 'feed_measuredPerBird', 'siloEmptyTime', 'siloNoConsumptionTime'
-            ]
-            # Ensure all expected columns are present, fill missing with NaN if necessary
-            for col in expected_columns:
-                if col not in self.extracted_df.columns:
-                    self.extracted_df[col] = np.nan
-            self.extracted_df = self.extracted_df[expected_columns]
+        cache = self._open_cache(json_files)
+        self.failed_files = []
+        builder = self._extract_files(json_files, cache)
+        if cache is not None:
+            print(f"Extraction cache: {cache.hits} unchanged, {cache.misses} new or changed, {self.cache_removed} removed files.")
+            cache.save()
 
+        if len(builder):
+            self.extracted_df = apply_schema(builder.to_dataframe(), CONSUMPTION_SCHEMA)
             print(f"Extracted DataFrame shape: {self.extracted_df.shape}")
             print(f"Extracted DataFrame columns: {self.extracted_df.columns.tolist()}")
         else:
@@ -1,5 +1,5 @@
 from typing import List, Dict, Any, Optional, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 class ReferenceParam(BaseModel):
     avg: List[Optional[float]]
@@ -169,8 +169,20 @@ class Consumption(BaseModel):
     preBatchInfo: Optional[List[ConsumptionItem]] = Field(None, alias=", ")
     result: List[ConsumptionItem]
 
+def no_collectors_to_none(value: Any) -> Any:
+    """Maps the "no collectors" error string sent instead of an object to None."""
+    if isinstance(value, str) and "no collectors" in value:
+        return None
+    return value
+
 # Update SiloData model to include this new top-level "consumption"
 class SiloData(BaseModel):
     batch: Batch
     ambience: Union[Ambience, str, None]
-    consumption: Union[Consumption, str, None] = None # Allow Consumption object, string, or None
\ No newline at end of file
+    consumption: Union[Consumption, str, None] = None # Allow Consumption object, string, or None
+
+    @field_validator('ambience', 'consumption', mode='before')
+    @classmethod
+    def _handle_no_collectors(cls, value: Any) -> Any:
+        # Runs on the raw input, so it also applies to SiloData.model_validate_json
+        return no_collectors_to_none(value)
\ No newline at end of file
@@ -1,35 +1,104 @@
 import pandas as pd
 import os
 import numpy as np
+from src.utils.diagnostics import debug
+from src.utils.instrumentation import instrumented
+from src.utils.lote_key import lote_composto_categorical, lote_key_in_range
+from src.utils.schema import PROCESSED_SCHEMA, apply_schema
+from src.utils.storage import save_table
+
+def first_last_by_group(df, group_column, order_column, value_column):
+    """
+    Returns, for every group, value_column at the row with the minimum
+    ('first') and the maximum ('last') order_column.
+
+    Ties resolve like Series.idxmin/idxmax on each group: the earliest row in
+    frame order wins, for both the minimum and the maximum. The grouped
+    idxmin/idxmax run on positional labels, so the frame's own index (which
+    may have gaps after earlier filters) is never looked up.
+
+    Returns:
+        A DataFrame indexed by group with the 'first' and 'last' columns.
+    """
+    positional = pd.DataFrame({
+        'group': df[group_column].array, # keeps a categorical key categorical
+        'order': df[order_column].to_numpy(),
+    })
+    grouped = positional.groupby('group', sort=True, observed=True)['order']
+    first_positions = grouped.idxmin()
+    last_positions = grouped.idxmax()
+    values = df[value_column].to_numpy()
+    return pd.DataFrame({
+        'first': values[first_positions.to_numpy()],
+        'last': values[last_positions.to_numpy()],
+    }, index=first_positions.index)
+
+# Prefixes stripped from environmentName and batchName to get their numbers
+ENVIRONMENT_PREFIX = 'AVIARIO '
+BATCH_PREFIX = 'Lote '
+
+def prefixed_names_to_int(series, prefix):
+    """
+    Strips prefix from a name column and converts it to Int64, with NaN where
+    the rest is not a number. A categorical column is converted once per
+    category instead of once per row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str).str.replace(prefix, '', regex=False)
+        numbers = pd.to_numeric(pd.Series(categories), errors='coerce').astype('Int64').array
+        return pd.Series(numbers.take(series.cat.codes.to_numpy(), allow_fill=True), index=series.index)
+    names = series.astype(str).str.replace(prefix, '', regex=False)
+    return pd.to_numeric(names, errors='coerce').astype('Int64')
+
+def outlier_lotes_by_bounds(aggregated_df, lower_bound, upper_bound, consumption_column='total_consumption_per_lote_per_bird'):
+    """Returns the loteComposto labels whose aggregated consumption is outside [lower_bound, upper_bound]."""
+    values = aggregated_df[consumption_column]
+    return aggregated_df.loc[(values < lower_bound) | (values > upper_bound), 'loteComposto'].unique()
+
+def iqr_bounds(values, lower_q=0.25, upper_q=0.75, multiplier=1.5):
+    """
+    Returns the exact outlier bounds (Q_lower - m * IQR, Q_upper + m * IQR) of
+    a Series; src.utils.quantile_sketch.KLLSketch.iqr_bounds is the streaming version.
+    """
+    lower, upper = values.quantile(lower_q), values.quantile(upper_q)
+    spread = upper - lower
+    return lower - multiplier * spread, upper + multiplier * spread
 
 class ETLProcessor:
     def __init__(self, dataframe):
         self.df = dataframe
 
+    @instrumented
     def clean_and_transform_columns(self):
         """
         Cleans 'environmentName' and 'batchName' columns, converts them to integers,
-        and creates the 'loteComposto' column.
+        and creates the 'loteComposto' column. The result uses the compact dtypes
+        of src.utils.schema.PROCESSED_SCHEMA.
         """
         if self.df is None or self.df.empty:
             print("No data in DataFrame for cleaning and transformation.")
             return self
 
-        # Clean 'environmentName' and 'batchName'
-        self.df['environmentName'] = self.df['environmentName'].astype(str).str.replace('AVIARIO ', '', regex=False)
-        self.df['batchName'] = self.df['batchName'].astype(str).str.replace('Lote ', '', regex=False)
-        
-        # Convert to numeric, coercing errors to NaN and then to Int64 (to allow NaN)
-        self.df['environmentName'] = pd.to_numeric(self.df['environmentName'], errors='coerce').astype('Int64')
-        self.df['batchName'] = pd.to_numeric(self.df['batchName'], errors='coerce').astype('Int64')
+        # Clean 'environmentName' and 'batchName' and convert them to numeric,
+        # coercing errors to NaN (Int64 allows NaN)
+        self.df['environmentName'] = prefixed_names_to_int(self.df['environmentName'], ENVIRONMENT_PREFIX)
+        self.df['batchName'] = prefixed_names_to_int(self.df['batchName'], BATCH_PREFIX)
 
         # Drop rows where conversion resulted in NaN
         self.df.dropna(subset=['environmentName', 'batchName'], inplace=True)
 
+        # Drop rows whose numbers cannot be packed into the lote key (negative or too large)
+        in_range = lote_key_in_range(self.df['environmentName'], self.df['batchName'])
+        if not in_range.all():
+            print(f"Warning: Dropped {int((~in_range).sum())} rows whose environmentName or batchName number "
+                  "is negative or too large for the lote key.")
+            self.df = self.df[in_range]
+
         print(f"DataFrame shape after cleaning environmentName and batchName: {self.df.shape}")
 
-        # Create 'loteComposto' column and position it as the third column
-        self.df['loteComposto'] = self.df['environmentName'].astype(str) + '-' + self.df['batchName'].astype(str)
+        # Create 'loteComposto' column and position it as the third column.
+        # It is categorical: rows hold integer codes and each 'environment-batch' label is built once per lote
+        self.df['loteComposto'] = lote_composto_categorical(self.df['environmentName'], self.df['batchName'])
         
         cols = self.df.columns.tolist()
         # Ensure 'loteComposto' is not already in cols if it was added in a prior run
@@ -38,10 +107,11 @@ class ETLProcessor:
         
         # Insert 'loteComposto' at the third position (index 2), assuming first two cols are environmentName, batchName
         # If the order is not guaranteed, more robust insertion logic might be needed
-        self.df = self.df[cols[:2] + ['loteComposto'] + cols[2:]]
+        self.df = apply_schema(self.df[cols[:2] + ['loteComposto'] + cols[2:]], PROCESSED_SCHEMA)
         print(f"DataFrame shape after creating loteComposto: {self.df.shape}")
         return self
 
+    @instrumented
     def filter_data(self, feed_per_bird_min=15, feed_per_bird_max=250, lote_composto_min_count=15):
         """
         Filters data based on 'feed_measuredPerBird' range and 'loteComposto' group count.
@@ -59,11 +129,9 @@ class ETLProcessor:
         print(f"DataFrame shape after filtering feed_measuredPerBird (between {feed_per_bird_min} and {feed_per_bird_max}): {self.df.shape}")
         
         if not self.df.empty:
-            print("loteComposto value counts after feed_measuredPerBird filter:")
-            print(self.df['loteComposto'].value_counts().head(10))
-
             # Count unique 'loteComposto' values and drop groups with less than lote_composto_min_count rows
             lote_counts = self.df['loteComposto'].value_counts()
+            debug("ETLProcessor.filter_data.lote_counts", top=lambda: lote_counts.head(10))
             to_keep = lote_counts[lote_counts >= lote_composto_min_count].index
             self.df = self.df[self.df['loteComposto'].isin(to_keep)]
             print(f"DataFrame shape after filtering loteComposto counts: {self.df.shape}")
@@ -71,6 +139,7 @@ class ETLProcessor:
             print("DataFrame is empty before filtering loteComposto counts.")
         return self
 
+    @instrumented
     def filter_by_start_end_consumption(self, initial_min=0, initial_max=50, final_min=150, final_max=250):
         """
         Filters loteComposto groups based on feed_measuredPerBird values at their
@@ -82,31 +151,25 @@ class ETLProcessor:
 
         print(f"Applying start/end consumption filter (Initial: {initial_min}-{initial_max}, Final: {final_min}-{final_max})...")
 
-        lotes_to_keep = []
-        for lote_name, group in self.df.groupby('loteComposto'):
-            # Find feed_measuredPerBird at min batchAge
-            min_batch_age_row = group.loc[group['batchAge'].idxmin()]
-            initial_consumption = min_batch_age_row['feed_measuredPerBird']
-
-            # Find feed_measuredPerBird at max batchAge
-            max_batch_age_row = group.loc[group['batchAge'].idxmax()]
-            final_consumption = max_batch_age_row['feed_measuredPerBird']
+        # feed_measuredPerBird at the min and max batchAge of every lote, in one grouped pass
+        start_end = first_last_by_group(self.df, 'loteComposto', 'batchAge', 'feed_measuredPerBird')
+        initial_consumption = start_end['first']
+        final_consumption = start_end['last']
 
-            # Check conditions
-            initial_ok = (initial_consumption >= initial_min) and (initial_consumption <= initial_max)
-            final_ok = (final_consumption >= final_min) and (final_consumption <= final_max)
-
-            if initial_ok and final_ok:
-                lotes_to_keep.append(lote_name)
+        # Check conditions
+        initial_ok = (initial_consumption >= initial_min) & (initial_consumption <= initial_max)
+        final_ok = (final_consumption >= final_min) & (final_consumption <= final_max)
+        lotes_to_keep = start_end.index[initial_ok & final_ok]
         
-        initial_lotes_count = self.df['loteComposto'].nunique()
         self.df = self.df[self.df['loteComposto'].isin(lotes_to_keep)].copy()
         
-        print(f"Number of loteComposto groups removed by start/end consumption filter: {initial_lotes_count - self.df['loteComposto'].nunique()}")
+        # start_end has one row per lote present before the filter
+        print(f"Number of loteComposto groups removed by start/end consumption filter: {len(start_end) - len(lotes_to_keep)}")
         print(f"DataFrame shape after start/end consumption filtering: {self.df.shape}")
         
         return self
 
+    @instrumented
     def filter_by_confidence_level(self, min_confidence=0.95):
         """
         Filters loteComposto groups based on their 'confidence_level' (R^2).
@@ -128,18 +191,25 @@ class ETLProcessor:
         to_keep_lotes = lote_confidence[lote_confidence['confidence_level'] >= min_confidence]['loteComposto'].unique()
 
         # Filter the main DataFrame
-        initial_lotes_count = self.df['loteComposto'].nunique()
         self.df = self.df[self.df['loteComposto'].isin(to_keep_lotes)].copy()
 
-        print(f"Number of loteComposto groups removed by confidence level filter: {initial_lotes_count - self.df['loteComposto'].nunique()}")
+        print(f"Number of loteComposto groups removed by confidence level filter: {len(lote_confidence) - len(to_keep_lotes)}")
         print(f"DataFrame shape after confidence level filtering: {self.df.shape}")
         
         return self
 
-    def filter_by_aggregated_consumption_iqr(self, aggregated_df, consumption_column='total_consumption_per_lote_per_bird'):
+    @instrumented
+    def filter_by_aggregated_consumption_iqr(self, aggregated_df, consumption_column='total_consumption_per_lote_per_bird',
+                                             sketch=None, lower_q=0.25, upper_q=0.75, multiplier=1.5):
         """
         Filters the main DataFrame to remove loteComposto groups that are outliers
         based on the IQR of their aggregated consumption per bird.
+
+        With a sketch (a src.utils.quantile_sketch.KLLSketch of the aggregated
+        consumption of the whole fleet, e.g. merged from the partitions), the
+        bounds come from it and aggregated_df may hold only some of the lotes;
+        they are approximate once the sketch holds more than k lotes. Without
+        one, the exact quartiles of aggregated_df are used.
         """
         if self.df is None or self.df.empty:
             print("No data in main DataFrame for aggregated consumption IQR filtering.")
@@ -153,25 +223,23 @@ class ETLProcessor:
 
         print("Applying aggregated consumption IQR outlier filter...")
 
-        # Calculate Q1, Q3, and IQR for the aggregated consumption
-        Q1 = aggregated_df[consumption_column].quantile(0.25)
-        Q3 = aggregated_df[consumption_column].quantile(0.75)
-        IQR = Q3 - Q1
-        
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
+        if sketch is not None:
+            lower_bound, upper_bound = sketch.iqr_bounds(lower_q, upper_q, multiplier)
+        else:
+            # Q1, Q3 and the IQR of the aggregated consumption
+            lower_bound, upper_bound = iqr_bounds(aggregated_df[consumption_column], lower_q, upper_q, multiplier)
 
         # Identify outlier loteComposto groups from the aggregated data
-        outlier_lotes = aggregated_df[
-            (aggregated_df[consumption_column] < lower_bound) |
-            (aggregated_df[consumption_column] > upper_bound)
-        ]['loteComposto'].unique()
+        outlier_lotes = outlier_lotes_by_bounds(aggregated_df, lower_bound, upper_bound, consumption_column)
 
         # Filter the main DataFrame based on these outliers
-        initial_lotes_count = self.df['loteComposto'].nunique()
-        self.df = self.df[~self.df['loteComposto'].isin(outlier_lotes)].copy()
+        is_outlier = self.df['loteComposto'].isin(outlier_lotes)
+        removed_lotes = self.df.loc[is_outlier, 'loteComposto'].nunique()
+        self.df = self.df[~is_outlier].copy()
+        debug("ETLProcessor.filter_by_aggregated_consumption_iqr.bounds",
+              lower_bound=lower_bound, upper_bound=upper_bound, outlier_lotes=lambda: outlier_lotes)
         
-        print(f"Number of loteComposto groups removed by aggregated consumption IQR filter: {initial_lotes_count - self.df['loteComposto'].nunique()}")
+        print(f"Number of loteComposto groups removed by aggregated consumption IQR filter: {removed_lotes}")
         print(f"DataFrame shape after aggregated consumption IQR filtering: {self.df.shape}")
 
         return self
@@ -181,14 +249,17 @@ class ETLProcessor:
         """Returns the processed DataFrame."""
         return self.df
 
-    def save_data(self, output_filepath):
-        """Saves the processed DataFrame to the output file."""
+    def save_data(self, output_filepath, csv_export=False, csv_sep=';'):
+        """
+        Saves the processed DataFrame as a columnar artifact (Parquet by default,
+        see src.utils.storage.save_table), optionally with a CSV copy.
+        """
         if self.df is None or self.df.empty:
             print(f"No data to save after processing. Final DataFrame is empty.")
             return
 
         try:
-            self.df.to_csv(output_filepath, sep=';', index=False)
-            print(f"Processed data saved successfully to {output_filepath}")
+            written = save_table(self.df, output_filepath, csv_export=csv_export, csv_sep=csv_sep)
+            print(f"Processed data saved successfully to {', '.join(str(p) for p in written)}")
         except Exception as e:
-            print(f"Error saving processed data to CSV: {e}")
\ No newline at end of file
+            print(f"Error saving processed data: {e}")
\ No newline at end of file
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from src.utils.storage import load_table, save_table
+
+
+class ExtractionCache:
+    """
+    Remembers the rows extracted from each raw JSON file between runs.
+
+    Every cached file has a manifest entry with its size, mtime and SHA-256
+    content hash and the (environmentName, batchName) pairs of its rows, plus
+    a per-file columnar shard holding its extracted rows.
+    A file is a hit when its size and mtime are unchanged, or when they changed
+    but the content hash did not (e.g. the file was copied again). Entries of
+    files that no longer exist are dropped by prune(). Shards are Parquet
+    files (src.utils.storage), so they keep their dtypes and do not depend on
+    the pandas version that wrote them.
+    """
+    MANIFEST_NAME = "manifest.json"
+    # Bump whenever the extracted columns or their semantics change, so stale shards are discarded
+    CACHE_VERSION = 4
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.shard_dir = self.cache_dir / "shards"
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / self.MANIFEST_NAME
+        self.entries = self._load_manifest()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_manifest(self):
+        """Loads the manifest entries, discarding them if the cache version changed."""
+        if not self.manifest_path.is_file():
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read extraction cache manifest {self.manifest_path}: {e}")
+            return {}
+        if manifest.get('version') != self.CACHE_VERSION:
+            print("Extraction cache version changed; discarding cached shards.")
+            for entry in manifest.get('files', {}).values():
+                (self.shard_dir / entry['shard']).unlink(missing_ok=True)
+            return {}
+        return manifest.get('files', {})
+
+    @staticmethod
+    def _content_hash(json_file):
+        """Returns the SHA-256 hex digest of the file contents."""
+        digest = hashlib.sha256()
+        with open(json_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def fingerprint(self, json_file):
+        """Returns the (size, mtime_ns, sha256) fingerprint of a raw file."""
+        stat = json_file.stat()
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': self._content_hash(json_file)}
+
+    def is_fresh(self, json_file):
+        """Returns True (a hit) if json_file has a shard and is unchanged since it was stored."""
+        entry = self.entries.get(json_file.name)
+        if entry is None or not (self.shard_dir / entry['shard']).is_file():
+            self.misses += 1
+            return False
+
+        stat = json_file.stat()
+        if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']:
+            # Only hash when the cheap stat check fails
+            if stat.st_size != entry['size'] or self._content_hash(json_file) != entry['sha256']:
+                self.misses += 1
+                return False
+            entry['mtime_ns'] = stat.st_mtime_ns
+
+        self.hits += 1
+        return True
+
+    def load(self, name):
+        """Returns the stored rows of the raw file called name (fresh or not), or None."""
+        entry = self.entries.get(name)
+        shard_path = self.shard_dir / entry['shard'] if entry else None
+        if shard_path is None or not shard_path.is_file():
+            return None
+        return load_table(shard_path)
+
+    def get(self, json_file):
+        """
+        Returns the cached rows of json_file as a DataFrame, or None if the file
+        is new, changed, or its shard is missing.
+        """
+        if not self.is_fresh(json_file):
+            return None
+        return self.load(json_file.name)
+
+    def put(self, json_file, rows_df, fingerprint):
+        """
+        Stores the extracted rows of json_file as its shard. fingerprint must be
+        taken before the file was parsed, so a write in between makes the next
+        run see the file as changed instead of keeping the old rows.
+        """
+        shard_name = f"{json_file.stem}.parquet"
+        save_table(rows_df, self.shard_dir / shard_name)
+        entry = dict(fingerprint)
+        entry['shard'] = shard_name
+        entry['lotes'] = rows_df[['environmentName', 'batchName']].drop_duplicates().astype(str).values.tolist()
+        self.entries[json_file.name] = entry
+
+    def file_lotes(self):
+        """Returns the (environmentName, batchName) pairs of every cached file, by file name."""
+        return {name: entry.get('lotes', []) for name, entry in self.entries.items()}
+
+    def stale_names(self, json_files):
+        """Returns the names of the cached files that are not in json_files anymore."""
+        current = {json_file.name for json_file in json_files}
+        return [name for name in self.entries if name not in current]
+
+    def prune(self, json_files):
+        """Drops the entries (and shards) of files that are not in json_files anymore."""
+        removed = self.stale_names(json_files)
+        for name in removed:
+            (self.shard_dir / self.entries.pop(name)['shard']).unlink(missing_ok=True)
+        return len(removed)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.CACHE_VERSION, 'files': self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
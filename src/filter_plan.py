@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from src.curve_fitting import curve_table, fit_polynomials
+from src.etl_processor import ETLProcessor
+from src.utils.diagnostics import debug
+from src.utils.instrumentation import get_recorder, instrumented
+from src.utils.schema import to_float64
+
+
+class LazyFilterPlan:
+    """
+    Lazy, fused version of the ETLProcessor filter chain.
+
+    The filters are only recorded: row-level predicates (a boolean mask over
+    the rows) and lote-level predicates (a boolean mask over the loteComposto
+    groups). collect() evaluates every row predicate on the source frame,
+    computes the per-lote statistics (row count, consumption at the first and
+    last batchAge, confidence level) for the surviving rows in one grouped
+    pass, and materializes the result with a single take. The eager chain
+    instead copies the whole frame after every filter.
+
+    The result has the same rows, columns and values as the eager chain
+    (clean_and_transform_columns -> filter_data ->
+    filter_by_start_end_consumption -> CurveModeler.add_confidence_level ->
+    filter_by_confidence_level). Its index keeps the source row labels, while
+    the eager chain renumbers the rows in CurveModeler's merge; the saved
+    artifacts do not store the index.
+
+    Row predicates must be recorded before lote predicates, as in the eager
+    chain: a lote filter removes whole lotes, so it never changes the rows a
+    later lote filter sees, but a row filter would.
+
+    With an active run recorder (see src.utils.instrumentation), collect()
+    records every fused predicate as a method entry named after the step that
+    recorded it (e.g. LazyFilterPlan.filter_data), with the rows and lotes
+    still alive before and after it.
+    """
+
+    def __init__(self, dataframe):
+        self.df = dataframe
+        self.row_predicates = [] # (step, description, function(df) -> row mask)
+        self.lote_predicates = [] # (step, description, function(stats) -> lote mask)
+        self.needs_confidence = False
+        self.confidence_column_name = 'confidence_level'
+        self.fits = None # fit_polynomials table by lote code, set by collect()
+        self.curves = None # curve_table of the lotes in the result, set by collect()
+
+    def clean_and_transform_columns(self):
+        """Runs ETLProcessor.clean_and_transform_columns eagerly; it creates columns rather than filtering."""
+        self.df = ETLProcessor(self.df).clean_and_transform_columns().get_processed_dataframe()
+        return self
+
+    def _add_row_predicate(self, step, description, predicate):
+        if self.lote_predicates:
+            raise ValueError(f"Row filter '{description}' must be recorded before the lote filters.")
+        self.row_predicates.append((step, description, predicate))
+
+    def filter_data(self, feed_per_bird_min=15, feed_per_bird_max=250, lote_composto_min_count=15):
+        """Records ETLProcessor.filter_data: a feed_measuredPerBird range (rows) and a minimum row count (lotes)."""
+        if self.df is not None and not self.df.empty and not pd.api.types.is_numeric_dtype(self.df['feed_measuredPerBird']):
+            # filter_data converts the column too; do it once here so the result keeps the numeric dtype
+            self.df = self.df.assign(feed_measuredPerBird=pd.to_numeric(self.df['feed_measuredPerBird'], errors='coerce'))
+
+        def feed_range(df):
+            feed = to_float64(df['feed_measuredPerBird'])
+            # NaN fails both comparisons, like the eager dropna
+            return (feed >= feed_per_bird_min) & (feed <= feed_per_bird_max)
+
+        self._add_row_predicate('filter_data', f"feed_measuredPerBird between {feed_per_bird_min} and {feed_per_bird_max}",
+                                feed_range)
+        self.lote_predicates.append(('filter_data', f"loteComposto count >= {lote_composto_min_count}",
+                                     lambda stats: stats['count'] >= lote_composto_min_count))
+        return self
+
+    def filter_by_start_end_consumption(self, initial_min=0, initial_max=50, final_min=150, final_max=250):
+        """Records ETLProcessor.filter_by_start_end_consumption as a lote predicate."""
+        def start_end(stats):
+            initial_ok = (stats['first'] >= initial_min) & (stats['first'] <= initial_max)
+            final_ok = (stats['last'] >= final_min) & (stats['last'] <= final_max)
+            return initial_ok & final_ok
+
+        self.lote_predicates.append(('filter_by_start_end_consumption', f"start/end consumption (Initial: {initial_min}-{initial_max}, "
+                                     f"Final: {final_min}-{final_max})", start_end))
+        return self
+
+    def add_confidence_level(self):
+        """Records CurveModeler.add_confidence_level; the fits only run for the lotes still alive at this step."""
+        self.needs_confidence = True
+        self.lote_predicates.append(('add_confidence_level', 'confidence level', None))
+        return self
+
+    def filter_by_confidence_level(self, min_confidence=0.95):
+        """Records ETLProcessor.filter_by_confidence_level as a lote predicate."""
+        if not self.needs_confidence:
+            raise ValueError("filter_by_confidence_level needs add_confidence_level() earlier in the plan.")
+        self.lote_predicates.append(('filter_by_confidence_level', f"confidence level >= {min_confidence}",
+                                     lambda stats: stats[self.confidence_column_name] >= min_confidence))
+        return self
+
+    @staticmethod
+    def _lote_codes(lotes):
+        """Returns (codes, categories) of the loteComposto column, factorizing it if it is not categorical."""
+        if isinstance(lotes.dtype, pd.CategoricalDtype):
+            return lotes.cat.codes.to_numpy(dtype=np.int64), lotes.cat.categories
+        codes, categories = pd.factorize(lotes, sort=True)
+        return codes.astype(np.int64), categories
+
+    @staticmethod
+    def _count_lotes(codes, row_mask, n_lotes):
+        """Returns the number of distinct lotes among the rows in row_mask."""
+        lote_codes = codes[row_mask]
+        return int(np.count_nonzero(np.bincount(lote_codes[lote_codes >= 0], minlength=n_lotes)))
+
+    def _lote_stats(self, codes, n_lotes, positions):
+        """
+        Computes the row count and the consumption at the first and last batchAge
+        of every lote over the given row positions, in one grouped pass.
+        Ties resolve like ETLProcessor.filter_by_start_end_consumption.
+        """
+        stats = pd.DataFrame({'count': np.zeros(n_lotes, dtype=np.int64),
+                              'first': np.full(n_lotes, np.nan), 'last': np.full(n_lotes, np.nan)})
+        if len(positions) == 0:
+            return stats
+
+        grouped = pd.DataFrame({
+            'lote': codes[positions],
+            'batchAge': self.df['batchAge'].to_numpy()[positions],
+        }).groupby('lote', sort=True)['batchAge']
+        feed = to_float64(self.df['feed_measuredPerBird'])[positions]
+        counts = grouped.size()
+        lotes = counts.index.to_numpy()
+        stats.loc[lotes, 'count'] = counts.to_numpy()
+        stats.loc[lotes, 'first'] = feed[grouped.idxmin().to_numpy()]
+        stats.loc[lotes, 'last'] = feed[grouped.idxmax().to_numpy()]
+        return stats
+
+    def _confidence(self, codes, categories, positions, stats):
+        """Fits the CurveModeler curves for the rows at positions and returns the confidence per lote code."""
+        # Same batched fit as CurveModeler, on the lote codes directly; the fits are kept for the curve table
+        self.fits = fit_polynomials(codes[positions], self.df['batchAge'].to_numpy(dtype=np.float64)[positions],
+                                    to_float64(self.df['feed_measuredPerBird'])[positions], degree=2, n_groups=len(stats))
+        return self.fits['r2'].to_numpy()
+
+    @instrumented
+    def collect(self):
+        """Evaluates the plan, materializes the filtered frame once and returns it."""
+        if self.df is None or self.df.empty:
+            print("No data in DataFrame for the ETL filter plan.")
+            return self.df
+
+        recorder = get_recorder()
+        n_rows = len(self.df)
+        codes, categories = self._lote_codes(self.df['loteComposto'])
+        row_mask = np.ones(n_rows, dtype=bool)
+        for step, description, predicate in self.row_predicates:
+            with recorder.phase(f"LazyFilterPlan.{step}", kind='method', filter=description) as record:
+                if recorder.enabled:
+                    record.input_counts(int(row_mask.sum()), self._count_lotes(codes, row_mask, len(categories)))
+                row_mask &= predicate(self.df)
+                if recorder.enabled:
+                    record.output_counts(int(row_mask.sum()), self._count_lotes(codes, row_mask, len(categories)))
+            print(f"Rows after filter '{description}': {int(row_mask.sum())} of {n_rows}")
+
+        stats = self._lote_stats(codes, len(categories), np.flatnonzero(row_mask))
+        counts = stats['count'].to_numpy()
+        alive = counts > 0
+        for step, description, predicate in self.lote_predicates:
+            with recorder.phase(f"LazyFilterPlan.{step}", kind='method', filter=description) as record:
+                record.input_counts(int(counts[alive].sum()), int(alive.sum()))
+                before = alive.copy()
+                if predicate is None:
+                    # Confidence step: fit only the lotes that survived the earlier filters
+                    positions = np.flatnonzero(row_mask & alive[codes])
+                    print(f"Modeling consumption curve and calculating confidence level for {int(alive.sum())} lotes...")
+                    stats[self.confidence_column_name] = self._confidence(codes, categories, positions, stats)
+                else:
+                    alive &= np.asarray(predicate(stats), dtype=bool)
+                record.output_counts(int(counts[alive].sum()), int(alive.sum()))
+            if predicate is None:
+                continue
+            print(f"Number of loteComposto groups removed by filter '{description}': {int(before.sum()) - int(alive.sum())}")
+            # First removed lotes with their statistics
+            debug("LazyFilterPlan.collect.lote_filter", filter=description,
+                  removed=lambda: stats[before & ~alive].head(10).set_axis(categories[before & ~alive][:10]).reset_index(names='loteComposto'))
+
+        positions = np.flatnonzero(row_mask & alive[codes])
+        result = self.df.take(positions)
+        if self.needs_confidence:
+            result[self.confidence_column_name] = stats[self.confidence_column_name].to_numpy()[codes[positions]]
+            kept = np.flatnonzero(alive)
+            fits = self.fits.iloc[kept].rename(columns={'x_min': 'age_min', 'x_max': 'age_max'})
+            fits.index = pd.CategoricalIndex(pd.Categorical.from_codes(kept, categories=categories), name='loteComposto')
+            self.curves = curve_table(fits)
+        print(f"DataFrame shape after the ETL filter plan: {result.shape}")
+        self.df = result
+        return result
+
+    def get_curve_table(self):
+        """Returns the curve table (see src.curve_fitting.curve_table) of the lotes in the result."""
+        return self.curves
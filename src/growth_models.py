@@ -0,0 +1,286 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import least_squares
+
+from src.curve_fitting import coefficient_columns, fit_polynomials, solve_normal_equations
+from src.utils.schema import to_float64
+
+# Candidate models of CurveModeler.fit_growth_models (see growth_model for the names)
+DEFAULT_GROWTH_MODELS = ('poly2', 'poly3', 'gompertz', 'logistic', 'piecewise')
+# Lotes per process-pool task of the nonlinear fits
+LOTES_PER_TASK = 256
+
+
+class GrowthModel:
+    """
+    A growth curve y = f(t; params) of feed_measuredPerBird (y) against
+    batchAge (t). Subclasses implement predict and fit; fit gets every lote
+    at once and returns one row of parameters per lote (NaN if it failed).
+    """
+    name = None
+    param_names = ()
+
+    @property
+    def n_params(self):
+        return len(self.param_names)
+
+    def predict(self, params, t):
+        """Evaluates the curve; params broadcasts against t with the parameters on its last axis."""
+        raise NotImplementedError
+
+    def fit(self, groups, t, y, n_groups, n_workers=1):
+        """Returns the (n_groups, n_params) parameters of every lote."""
+        raise NotImplementedError
+
+
+class PolynomialModel(GrowthModel):
+    """Polynomial of any degree, fitted in closed form for all lotes at once (src.curve_fitting)."""
+
+    def __init__(self, degree):
+        self.degree = degree
+        self.name = f"poly{degree}"
+        self.param_names = tuple(coefficient_columns(degree))
+
+    def predict(self, params, t):
+        values = np.zeros(np.broadcast_shapes(params.shape[:-1], np.shape(t)))
+        for power in range(self.degree, -1, -1):
+            values = values * t + params[..., power]
+        return values
+
+    def fit(self, groups, t, y, n_groups, n_workers=1):
+        fits = fit_polynomials(groups, t, y, degree=self.degree, n_groups=n_groups)
+        return fits[list(self.param_names)].to_numpy()
+
+
+class PiecewiseLinearModel(GrowthModel):
+    """
+    Continuous two-segment line y = b0 + b1 t + b2 max(t - tb, 0). For every
+    candidate breakpoint tb (the ages between the 10th and 90th percentile of
+    the fleet) the segments of all lotes are a batched linear fit; every lote
+    keeps the breakpoint with the smallest residual sum of squares.
+    """
+    name = 'piecewise'
+    param_names = ('intercept', 'slope', 'slope_change', 'breakpoint')
+
+    def __init__(self, max_breakpoints=40):
+        self.max_breakpoints = max_breakpoints
+
+    def predict(self, params, t):
+        return params[..., 0] + params[..., 1] * t + params[..., 2] * np.maximum(t - params[..., 3], 0.0)
+
+    def fit(self, groups, t, y, n_groups, n_workers=1):
+        candidates = np.unique(np.round(t[(t >= np.quantile(t, 0.1)) & (t <= np.quantile(t, 0.9))]))
+        if len(candidates) > self.max_breakpoints:
+            candidates = candidates[np.linspace(0, len(candidates) - 1, self.max_breakpoints).round().astype(int)]
+        best_rss = np.full(n_groups, np.inf)
+        best = np.full((n_groups, self.n_params), np.nan)
+        for breakpoint in candidates:
+            features = np.stack([np.ones_like(t), t, np.maximum(t - breakpoint, 0.0)], axis=1)
+            gram = np.stack([np.stack([np.bincount(groups, features[:, i] * features[:, j], minlength=n_groups)
+                                       for j in range(3)], axis=-1) for i in range(3)], axis=1)
+            rhs = np.stack([np.bincount(groups, features[:, i] * y, minlength=n_groups) for i in range(3)], axis=1)
+            beta = solve_normal_equations(gram, rhs, rcond=1e-12)
+            residuals = y - np.einsum('ri,ri->r', features, beta[groups])
+            rss = np.bincount(groups, residuals * residuals, minlength=n_groups)
+            better = rss < best_rss
+            best_rss[better] = rss[better]
+            best[better] = np.column_stack([beta[better], np.full(int(better.sum()), breakpoint)])
+        return best
+
+
+class NonlinearModel(GrowthModel):
+    """
+    Sigmoid growth model fitted per lote with scipy.optimize.least_squares,
+    across a process pool. Every lote starts from the fit of the fleet-median
+    curve (the median consumption at every batchAge), with the asymptote
+    scaled to the lote's own maximum consumption.
+    """
+    lower_bounds = ()
+    upper_bounds = ()
+
+    def initial_guess(self, t, y):
+        """A rough starting point for the fleet-median fit."""
+        raise NotImplementedError
+
+    def _fit_one(self, t, y, x0):
+        """Least-squares fit of one curve; NaN parameters if it fails."""
+        x0 = np.clip(x0, np.asarray(self.lower_bounds) + 1e-9, np.asarray(self.upper_bounds) - 1e-9)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                result = least_squares(lambda params: self.predict(params, t) - y, x0,
+                                       bounds=(self.lower_bounds, self.upper_bounds), method='trf')
+        except (ValueError, np.linalg.LinAlgError):
+            return np.full(self.n_params, np.nan)
+        return result.x if result.success else np.full(self.n_params, np.nan)
+
+    def warm_start(self, groups, t, y, n_groups):
+        """Returns the starting parameters of every lote, from the fleet-median curve."""
+        ages, positions = np.unique(np.round(t), return_inverse=True)
+        median_curve = pd.Series(y).groupby(positions).median().to_numpy()
+        fleet = self._fit_one(ages, median_curve, self.initial_guess(ages, median_curve))
+        if np.isnan(fleet).any():
+            fleet = self.initial_guess(ages, median_curve)
+        lote_max = np.full(n_groups, -np.inf)
+        np.maximum.at(lote_max, groups, y)
+        starts = np.tile(fleet, (n_groups, 1))
+        if median_curve.max() > 0:
+            starts[:, 0] = fleet[0] * np.where(lote_max > 0, lote_max, median_curve.max()) / median_curve.max()
+        return starts
+
+    def fit(self, groups, t, y, n_groups, n_workers=1):
+        starts = self.warm_start(groups, t, y, n_groups)
+        order = np.argsort(groups, kind='stable')
+        bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+        lotes = [(t[order[bounds[g]:bounds[g + 1]]], y[order[bounds[g]:bounds[g + 1]]], starts[g])
+                 for g in range(n_groups)]
+        tasks = [lotes[start:start + LOTES_PER_TASK] for start in range(0, n_groups, LOTES_PER_TASK)]
+        n_workers = _resolve_workers(n_workers, len(tasks))
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = list(executor.map(_fit_nonlinear_task, [self] * len(tasks), tasks))
+        else:
+            results = [_fit_nonlinear_task(self, task) for task in tasks]
+        params = np.concatenate(results) if results else np.empty((0, self.n_params))
+        # Lotes with fewer rows than parameters are not identifiable
+        counts = np.bincount(groups, minlength=n_groups)
+        params[counts < self.n_params] = np.nan
+        return params
+
+
+class GompertzModel(NonlinearModel):
+    """Gompertz curve y = asymptote * exp(-displacement * exp(-rate * t))."""
+    name = 'gompertz'
+    param_names = ('asymptote', 'displacement', 'rate')
+    lower_bounds = (0.0, 0.0, 0.0)
+    upper_bounds = (np.inf, np.inf, 5.0)
+
+    def predict(self, params, t):
+        return params[..., 0] * np.exp(-params[..., 1] * np.exp(-params[..., 2] * t))
+
+    def initial_guess(self, t, y):
+        asymptote = max(float(np.max(y)) * 1.2, 1.0)
+        first = max(float(y[np.argmin(t)]), asymptote * 0.01)
+        return np.array([asymptote, np.log(asymptote / first), 0.05])
+
+
+class LogisticModel(NonlinearModel):
+    """Logistic curve y = asymptote / (1 + exp(-rate * (t - midpoint)))."""
+    name = 'logistic'
+    param_names = ('asymptote', 'rate', 'midpoint')
+    lower_bounds = (0.0, 0.0, -np.inf)
+    upper_bounds = (np.inf, 5.0, np.inf)
+
+    def predict(self, params, t):
+        return params[..., 0] / (1.0 + np.exp(-params[..., 1] * (t - params[..., 2])))
+
+    def initial_guess(self, t, y):
+        return np.array([max(float(np.max(y)) * 1.2, 1.0), 0.1, float(np.median(t))])
+
+
+# Registered models by name; polynomials are created on demand as poly<degree>
+GROWTH_MODELS = {model.name: model for model in (GompertzModel(), LogisticModel(), PiecewiseLinearModel())}
+
+
+def register_growth_model(model):
+    """
+    Adds a GrowthModel instance to the candidates available by name. The
+    nonlinear fits pickle the instance to the pool workers, so its class must
+    be importable (defined at module level).
+    """
+    GROWTH_MODELS[model.name] = model
+    return model
+
+
+def growth_model(name):
+    """Returns the registered model called name, or a PolynomialModel for 'poly<degree>'."""
+    if name in GROWTH_MODELS:
+        return GROWTH_MODELS[name]
+    if name.startswith('poly') and name[4:].isdigit():
+        return PolynomialModel(int(name[4:]))
+    raise ValueError(f"Unknown growth model '{name}'. Use 'poly<degree>' or one of {list(GROWTH_MODELS)}.")
+
+
+def _fit_nonlinear_task(model, lotes):
+    """
+    Fits a chunk of (t, y, x0) lotes with a NonlinearModel; module-level so it
+    can run in pool workers. The model instance itself is sent to the workers,
+    so models added with register_growth_model work with any start method.
+    """
+    if not lotes:
+        return np.empty((0, model.n_params))
+    return np.array([model._fit_one(t, y, x0) for t, y, x0 in lotes]).reshape(len(lotes), model.n_params)
+
+
+def _resolve_workers(n_workers, n_tasks):
+    """Returns the number of worker processes to use for n_tasks tasks (None or 0 = one per CPU)."""
+    if n_workers is None or n_workers <= 0:
+        n_workers = os.cpu_count() or 1
+    return max(1, min(n_workers, n_tasks))
+
+
+def fit_growth_models(df, models=DEFAULT_GROWTH_MODELS, n_workers=1):
+    """
+    Fits every candidate growth model to the consumption curve
+    (feed_measuredPerBird against batchAge) of every loteComposto and selects
+    the best model per lote by AIC.
+
+    Returns:
+        A long DataFrame with one row per lote and model: loteComposto, model,
+        n, n_params, rss, r2, aic, bic, selected (the lowest AIC of the lote)
+        and the parameters param_0.. (named by GROWTH_MODELS[model].param_names).
+        Models that failed or have too few rows for a lote have NaN statistics.
+    """
+    lote = df['loteComposto']
+    if not isinstance(lote.dtype, pd.CategoricalDtype):
+        lote = lote.astype('category')
+    lote = lote.cat.remove_unused_categories()
+    codes = lote.cat.codes.to_numpy(dtype=np.int64)
+    t = df['batchAge'].to_numpy(dtype=np.float64)
+    y = to_float64(df['feed_measuredPerBird'])
+    valid = (codes >= 0) & ~np.isnan(t) & ~np.isnan(y)
+    codes, t, y = codes[valid], t[valid], y[valid]
+    n_groups = len(lote.cat.categories)
+    n = np.bincount(codes, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y_mean = np.bincount(codes, y, minlength=n_groups) / n
+    tss = np.bincount(codes, (y - y_mean[codes]) ** 2, minlength=n_groups)
+
+    candidates = [growth_model(name) for name in models]
+    max_params = max(model.n_params for model in candidates)
+    tables = []
+    for model in candidates:
+        params = model.fit(codes, t, y, n_groups, n_workers=n_workers)
+        with np.errstate(over='ignore', invalid='ignore'):
+            residuals = y - model.predict(params[codes], t)
+        rss = np.bincount(codes, residuals * residuals, minlength=n_groups)
+        k = model.n_params
+        usable = (n > k) & ~np.isnan(params).any(axis=1) & np.isfinite(rss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(tss > 0, 1.0 - rss / tss, np.where(rss == 0, 1.0, 0.0))
+            log_likelihood_term = n * np.log(np.maximum(rss, np.finfo(float).tiny) / n)
+        table = pd.DataFrame({
+            'loteComposto': lote.cat.categories, 'model': model.name, 'n': n, 'n_params': k,
+            'rss': np.where(usable, rss, np.nan), 'r2': np.where(usable, r2, np.nan),
+            'aic': np.where(usable, log_likelihood_term + 2 * k, np.nan),
+            'bic': np.where(usable, log_likelihood_term + k * np.log(np.maximum(n, 1)), np.nan),
+        })
+        padded = np.full((n_groups, max_params), np.nan)
+        padded[:, :k] = params
+        for i in range(max_params):
+            table[f'param_{i}'] = padded[:, i]
+        tables.append(table)
+        print(f"Growth model '{model.name}': fitted {int(usable.sum())} of {n_groups} lotes.")
+
+    fits = pd.concat(tables, ignore_index=True)
+    best = fits.dropna(subset=['aic']).groupby('loteComposto', observed=True)['aic'].idxmin()
+    fits['selected'] = False
+    fits.loc[best.to_numpy(), 'selected'] = True
+    fits['loteComposto'] = pd.Categorical(fits['loteComposto'], categories=lote.cat.categories)
+    fits = fits.sort_values(['loteComposto', 'model'], kind='stable').reset_index(drop=True)
+    return fits[['loteComposto', 'model', 'n', 'n_params', 'rss', 'r2', 'aic', 'bic', 'selected']
+                + [f'param_{i}' for i in range(max_params)]]
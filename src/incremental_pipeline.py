@@ -0,0 +1,212 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl_processor import BATCH_PREFIX, ENVIRONMENT_PREFIX, ETLProcessor, prefixed_names_to_int
+from src.extraction_cache import ExtractionCache
+from src.lote_state import LoteStateTable
+from src.partitioned_pipeline import partition_ids
+from src.utils.lote_key import lote_composto_categorical, lote_key_in_range, lote_keys, pack_lote_key
+from src.utils.schema import PROCESSED_SCHEMA, apply_schema, to_float64
+from src.utils.storage import load_table, save_table
+
+
+class IncrementalPipeline:
+    """
+    Daily refresh of the per-lote pipeline that only recomputes the lotes with
+    new rows.
+
+    The state directory holds:
+      - lote_state.parquet: the LoteStateTable (moments, first/last
+        consumption, confidence level and filter decision of every lote);
+      - rows/part-NNNN.parquet: the cleaned rows that passed the
+        feed_measuredPerBird range, hash-partitioned by lote like the
+        PartitionedPipeline, so an update only rewrites the partitions of the
+        changed lotes;
+      - extraction/: the ExtractionCache used to detect the changed raw files;
+      - meta.json: the filter settings. It is removed while an update runs
+        and written back by save(), so a state left by an interrupted run or
+        built with other settings is discarded and rebuilt from scratch.
+
+    The outputs have the rows and values of the full pipeline (the confidence
+    level and the totals up to float rounding), sorted by loteComposto. The
+    few lotes with feed_measuredPerBird values of more than 2 decimals, which
+    the integer state cannot hold exactly, are evaluated from their stored
+    rows (see LoteStateTable).
+    """
+    STATE_VERSION = 3
+    META_NAME = 'meta.json'
+    STATE_NAME = 'lote_state.parquet'
+
+    def __init__(self, state_dir, n_partitions=16, feed_per_bird_min=15, feed_per_bird_max=250, min_confidence=0.80):
+        self.state_dir = Path(state_dir)
+        self.rows_dir = self.state_dir / 'rows'
+        self.extraction_cache_dir = self.state_dir / 'extraction'
+        self.n_partitions = n_partitions
+        self.feed_per_bird_min = feed_per_bird_min
+        self.feed_per_bird_max = feed_per_bird_max
+        self.table = LoteStateTable(min_confidence=min_confidence)
+        self._load()
+        # Without a cached extraction every current file is new, so the replaced rows are all the rows
+        self.first_build = not (self.extraction_cache_dir / ExtractionCache.MANIFEST_NAME).is_file()
+
+    def _settings(self):
+        return {'version': self.STATE_VERSION, 'n_partitions': self.n_partitions,
+                'feed_per_bird_min': self.feed_per_bird_min, 'feed_per_bird_max': self.feed_per_bird_max,
+                'lote_composto_min_count': self.table.lote_composto_min_count,
+                'initial_min': self.table.initial_min, 'initial_max': self.table.initial_max,
+                'final_min': self.table.final_min, 'final_max': self.table.final_max,
+                'min_confidence': self.table.min_confidence}
+
+    def _load(self):
+        """Loads a saved state with the same settings; anything else is discarded."""
+        meta_path = self.state_dir / self.META_NAME
+        meta = None
+        if meta_path.is_file():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        if meta == self._settings():
+            self.table.load(self.state_dir / self.STATE_NAME)
+            print(f"Loaded incremental state with {len(self.table.state)} lotes from {self.state_dir}")
+        elif self.state_dir.exists():
+            print(f"Incremental state in {self.state_dir} is incomplete or has other settings; rebuilding it.")
+            shutil.rmtree(self.state_dir)
+        self.rows_dir.mkdir(parents=True, exist_ok=True)
+        meta_path.unlink(missing_ok=True) # Written back by save()
+
+    def _rows_path(self, partition):
+        return self.rows_dir / f"part-{partition:04d}.parquet"
+
+    @staticmethod
+    def _load_rows(path):
+        """Loads a row partition with feed_measuredPerBird in float64, so float32 and float64 partitions concatenate exactly."""
+        rows = load_table(path)
+        return rows.assign(feed_measuredPerBird=to_float64(rows['feed_measuredPerBird']))
+
+    def _stored_rows(self, keys):
+        """Returns the stored rows of the given lotes."""
+        frames = []
+        for partition in np.unique(partition_ids(keys, self.n_partitions)):
+            path = self._rows_path(int(partition))
+            if path.is_file():
+                rows = self._load_rows(path)
+                frames.append(rows[np.isin(lote_keys(rows), keys)])
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    @staticmethod
+    def _clean(df):
+        """Runs ETLProcessor.clean_and_transform_columns; loteComposto is rebuilt when the outputs are assembled."""
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = ETLProcessor(df).clean_and_transform_columns().get_processed_dataframe()
+        return df.drop(columns='loteComposto')
+
+    def _in_feed_range(self, df):
+        """The row part of ETLProcessor.filter_data."""
+        if df.empty:
+            return df
+        feed = to_float64(df['feed_measuredPerBird'])
+        return df[(feed >= self.feed_per_bird_min) & (feed <= self.feed_per_bird_max)]
+
+    def _current_rows(self, keys):
+        """
+        Returns the cleaned rows of the given lotes from the extraction cache
+        shards of every current raw file that has rows of them, in file order
+        (the order of the full pipeline).
+        """
+        cache = ExtractionCache(self.extraction_cache_dir)
+        frames = []
+        for name, pairs in sorted(cache.file_lotes().items()):
+            pairs = pd.DataFrame(pairs, columns=['environmentName', 'batchName'])
+            environment = prefixed_names_to_int(pairs['environmentName'], ENVIRONMENT_PREFIX)
+            batch = prefixed_names_to_int(pairs['batchName'], BATCH_PREFIX)
+            named = (environment.notna() & batch.notna()).to_numpy()
+            environment, batch = environment[named].to_numpy(dtype=np.int64), batch[named].to_numpy(dtype=np.int64)
+            packable = lote_key_in_range(environment, batch)
+            if np.isin(pack_lote_key(environment[packable], batch[packable]), keys).any():
+                frames.append(cache.load(name))
+        rows = self._clean(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+        return rows[np.isin(lote_keys(rows), keys)] if not rows.empty else rows
+
+    def apply_changes(self, appended, replaced, removed):
+        """
+        Updates the state with the output of DataExtractor.extract_changes:
+        appended rows are folded into their lotes, and every lote with rows in
+        a new, rewritten or deleted file is rebuilt from the rows all current
+        raw files have for it (or dropped if none has). Only the changed lotes
+        are re-evaluated.
+        """
+        appended, replaced, removed = self._clean(appended), self._clean(replaced), self._clean(removed)
+        reset_keys = np.unique(np.concatenate([lote_keys(df) for df in (replaced, removed) if not df.empty]
+                                              + [np.empty(0, dtype=np.int64)]))
+        # The shards already hold the appended rows of the rebuilt lotes
+        if self.first_build:
+            rebuilt = replaced
+        else:
+            rebuilt = self._current_rows(reset_keys) if len(reset_keys) else pd.DataFrame()
+        self.first_build = False
+        if not appended.empty:
+            appended = appended[~np.isin(lote_keys(appended), reset_keys)]
+        new_rows = [self._in_feed_range(df) for df in (rebuilt, appended) if not df.empty]
+        new_rows = pd.concat(new_rows, ignore_index=True) if new_rows else pd.DataFrame()
+
+        self.table.drop(reset_keys)
+        changed = self.table.add_rows(new_rows).union(pd.Index(reset_keys))
+        self._update_rows(reset_keys, new_rows)
+        rounded = changed.intersection(self.table.rounded_keys())
+        self.table.evaluate(changed, rows=self._stored_rows(rounded.to_numpy()) if len(rounded) else None)
+        print(f"Incremental update: {len(changed)} changed lotes, {len(self.table.state)} lotes in the state, "
+              f"{len(self.table.passed_keys())} passing every filter.")
+        return self
+
+    def _update_rows(self, reset_keys, new_rows):
+        """Rewrites only the row partitions of the changed lotes."""
+        new_parts = partition_ids(lote_keys(new_rows), self.n_partitions) if not new_rows.empty else np.empty(0, dtype=np.int64)
+        partitions = np.union1d(new_parts, partition_ids(reset_keys, self.n_partitions))
+        for partition in partitions:
+            path = self._rows_path(int(partition))
+            frames = []
+            if path.is_file():
+                existing = self._load_rows(path)
+                frames.append(existing[~np.isin(lote_keys(existing), reset_keys)])
+            frames.append(new_rows[new_parts == partition])
+            frames = [frame for frame in frames if not frame.empty]
+            if frames:
+                save_table(apply_schema(pd.concat(frames, ignore_index=True), PROCESSED_SCHEMA), path)
+            else:
+                path.unlink(missing_ok=True)
+
+    def final_frames(self):
+        """
+        Assembles the outputs from the stored rows and the state, without
+        recomputing anything (but the totals and curves of the lotes with
+        rounded values, see LoteStateTable).
+
+        Returns:
+            A tuple (final, aggregated, curves) like the in-memory LazyFilterPlan
+            + Aggregator, with the curve table of LazyFilterPlan.get_curve_table.
+        """
+        passed = self.table.passed_keys()
+        frames = []
+        for path in sorted(self.rows_dir.glob("part-*.parquet")):
+            rows = self._load_rows(path)
+            frames.append(rows[np.isin(lote_keys(rows), passed)])
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+        df = apply_schema(pd.concat(frames, ignore_index=True), PROCESSED_SCHEMA)
+        df.insert(2, 'loteComposto', lote_composto_categorical(df['environmentName'], df['batchName']))
+        df['confidence_level'] = self.table.state['confidence_level'].reindex(lote_keys(df)).to_numpy()
+        df = df.take(np.argsort(df['loteComposto'].cat.codes.to_numpy(), kind='stable')).reset_index(drop=True)
+        return df, self.table.aggregated_frame(rows=df), self.table.curve_table(rows=df)
+
+    def save(self):
+        """Saves the state table and marks the state as complete."""
+        self.table.save(self.state_dir / self.STATE_NAME)
+        with open(self.state_dir / self.META_NAME, 'w', encoding='utf-8') as f:
+            json.dump(self._settings(), f, indent=2)
+        return self
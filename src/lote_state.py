@@ -0,0 +1,317 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.curve_fitting import coefficient_columns, fit_polynomials, solve_normal_equations
+from src.etl_processor import first_last_by_group
+from src.utils.lote_key import lote_composto_categorical, lote_keys, unpack_lote_key
+from src.utils.schema import CURVE_SCHEMA, apply_schema, to_float64
+from src.utils.storage import load_table, save_table
+
+# Integer sufficient statistics of the quadratic fit of y = feed_measuredPerBird (in cents) on x = batchAge.
+# They are exact, so they can be added up in any order and give the same state as a full recomputation.
+MOMENT_COLUMNS = ['n', 'sum_x', 'sum_x2', 'sum_x3', 'sum_x4', 'sum_y', 'sum_xy', 'sum_x2y', 'sum_yy']
+# feed_measuredPerBird (cents) at the minimum and maximum batchAge, as ETLProcessor.filter_by_start_end_consumption sees it
+START_END_COLUMNS = ['min_age', 'first_cents', 'max_age', 'last_cents']
+# Rows whose feed_measuredPerBird has more than 2 decimals; the moments hold them rounded to the cent
+ROUNDED_COLUMN = 'n_rounded'
+STATE_COLUMNS = MOMENT_COLUMNS + [ROUNDED_COLUMN] + START_END_COLUMNS
+DECISION_COLUMNS = ['confidence_level', 'passed']
+
+
+def _empty_state():
+    """Returns a state table without lotes."""
+    columns = {column: pd.Series(dtype=np.int64) for column in STATE_COLUMNS}
+    columns.update({'confidence_level': pd.Series(dtype=np.float64), 'passed': pd.Series(dtype=bool)})
+    return pd.DataFrame(columns, index=pd.Index([], dtype=np.int64, name='lote_key'))
+
+
+def feed_to_cents(feed):
+    """
+    Converts feed_measuredPerBird values to int64 cents. Values with more than
+    2 decimals (which the schema does not expect, see src.utils.schema) are
+    rounded to the nearest cent; rounded_to_cents flags them.
+    """
+    return np.rint(to_float64(feed) * 100).astype(np.int64)
+
+
+def rounded_to_cents(feed):
+    """Returns the mask of the feed_measuredPerBird values that feed_to_cents rounds."""
+    values = to_float64(feed)
+    return np.rint(values * 100) / 100 != values
+
+
+def lote_moments(df):
+    """
+    Computes the state of every lote in a cleaned, row-filtered frame: the
+    moments of the quadratic fit, the number of rounded values and the
+    consumption at the first and last batchAge (the earliest row wins ties,
+    like first_last_by_group).
+
+    Returns:
+        A DataFrame indexed by packed lote key (see src.utils.lote_key) with the STATE_COLUMNS.
+    """
+    if df.empty:
+        return _empty_state()[STATE_COLUMNS]
+    x = df['batchAge'].to_numpy(dtype=np.int64)
+    y = feed_to_cents(df['feed_measuredPerBird'])
+    terms = pd.DataFrame({
+        'lote_key': lote_keys(df), 'n': 1,
+        'sum_x': x, 'sum_x2': x**2, 'sum_x3': x**3, 'sum_x4': x**4,
+        'sum_y': y, 'sum_xy': x * y, 'sum_x2y': x**2 * y, 'sum_yy': y * y,
+        ROUNDED_COLUMN: rounded_to_cents(df['feed_measuredPerBird']).astype(np.int64),
+    })
+    state = terms.groupby('lote_key', sort=True).sum()
+    grouped_ages = terms.groupby('lote_key', sort=True)['sum_x']
+    state['min_age'] = grouped_ages.min()
+    state['max_age'] = grouped_ages.max()
+    start_end = first_last_by_group(pd.DataFrame({'lote_key': terms['lote_key'], 'age': x, 'cents': y}),
+                                    'lote_key', 'age', 'cents')
+    state['first_cents'] = start_end['first']
+    state['last_cents'] = start_end['last']
+    return state[STATE_COLUMNS]
+
+
+def row_statistics(rows, keys):
+    """
+    Computes the statistics of the given lotes from their cleaned, row-filtered
+    rows in float64, as the full pipeline does: the quadratic fit of
+    fit_polynomials, the consumption at the first and last batchAge and the
+    total consumption.
+
+    Returns:
+        The fit_polynomials table with the 'first', 'last' and 'total'
+        columns, indexed by the sorted keys.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    rows = rows[np.isin(lote_keys(rows), keys)]
+    codes = np.searchsorted(keys, lote_keys(rows))
+    ages = rows['batchAge'].to_numpy(dtype=np.int64)
+    feed = to_float64(rows['feed_measuredPerBird'])
+    statistics = fit_polynomials(codes, ages, feed, degree=2, n_groups=len(keys))
+    start_end = first_last_by_group(pd.DataFrame({'lote': codes, 'age': ages, 'feed': feed}), 'lote', 'age', 'feed')
+    statistics['first'] = start_end['first'].reindex(statistics.index).to_numpy()
+    statistics['last'] = start_end['last'].reindex(statistics.index).to_numpy()
+    statistics['total'] = np.bincount(codes, feed, minlength=len(keys))
+    statistics.index = pd.Index(keys, name='lote_key')
+    return statistics
+
+
+def _quadratic_solution(moments):
+    """Returns (beta, b, total, n) of the normal equations of quadratic_confidence."""
+    m = {column: moments[column].to_numpy(dtype=np.int64) for column in MOMENT_COLUMNS}
+    n = m['n']
+    # Normal equations of [1, x, x^2]; y is centred (and everything scaled by n) in exact integers first
+    a = np.stack([
+        np.stack([n, m['sum_x'], m['sum_x2']], axis=-1),
+        np.stack([m['sum_x'], m['sum_x2'], m['sum_x3']], axis=-1),
+        np.stack([m['sum_x2'], m['sum_x3'], m['sum_x4']], axis=-1),
+    ], axis=1).astype(np.float64)
+    b = (np.stack([m['sum_y'], m['sum_xy'], m['sum_x2y']], axis=-1) * n[:, None]
+         - m['sum_y'][:, None] * np.stack([n, m['sum_x'], m['sum_x2']], axis=-1)).astype(np.float64)
+    total = (n * m['sum_yy'] - m['sum_y'] ** 2).astype(np.float64)
+
+    # pinv also covers lotes with fewer than 3 distinct ages; the matrices are not scaled, so only
+    # the default cutoff of np.linalg.pinv is used. b and total carry a factor n, so beta . b is
+    # n^2 times the explained sum of squares
+    beta = solve_normal_equations(a, b, rcond=1e-15)
+    return beta, b, total, n
+
+
+def quadratic_confidence(moments):
+    """
+    Returns the R^2 of the least-squares quadratic fit of every lote, from its
+    moments alone (same value as CurveModeler's fit up to float rounding).
+    NaN below 3 rows, 1.0 when y is constant (the fit is exact).
+    """
+    beta, b, total, n = _quadratic_solution(moments)
+    explained = np.einsum('li,li->l', beta, b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        confidence = np.where(total > 0, explained / (total * n), 1.0)
+    return np.where(n >= 3, confidence, np.nan)
+
+
+def quadratic_curves(moments):
+    """
+    Returns the coefficients of the quadratic fit of every lote in
+    feed_measuredPerBird units, from its moments alone, as an array with the
+    columns coefficient_columns(2) (same curve as CurveModeler's fit up to
+    float rounding).
+    """
+    beta, _, _, n = _quadratic_solution(moments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # beta is n times the fit of the centred y, in cents
+        coefficients = beta / n[:, None]
+        coefficients[:, 0] += moments['sum_y'].to_numpy(dtype=np.int64) / n
+    return coefficients / 100
+
+
+class LoteStateTable:
+    """
+    Per-lote state of the filter chain (filter_data -> filter_by_start_end_consumption ->
+    CurveModeler.add_confidence_level -> filter_by_confidence_level) and of
+    Aggregator.aggregate_consumption_per_bird, for rows that already passed the
+    feed_measuredPerBird range.
+
+    New rows of a lote are folded into its state with add_rows, in O(new rows):
+    the moments are summed and the first/last consumption only changes when
+    the new rows reach a lower or higher batchAge (on ties the earlier rows
+    win, as in the full pipeline). evaluate then recomputes the filter
+    decisions of the changed lotes only.
+
+    The moments hold feed_measuredPerBird in cents, so they are exact for
+    values with up to 2 decimals (those of the schema). A lote with any other
+    value (n_rounded > 0) is evaluated, totalled and fitted from its rows
+    instead (see row_statistics), which evaluate, aggregated_frame and
+    curve_table then need.
+    """
+
+    def __init__(self, lote_composto_min_count=15, initial_min=0, initial_max=50, final_min=150, final_max=250,
+                 min_confidence=0.80):
+        self.lote_composto_min_count = lote_composto_min_count
+        self.initial_min = initial_min
+        self.initial_max = initial_max
+        self.final_min = final_min
+        self.final_max = final_max
+        self.min_confidence = min_confidence
+        self.state = _empty_state()
+
+    def add_rows(self, df):
+        """Folds cleaned, row-filtered rows into the state of their lotes. Returns the changed lote keys."""
+        delta = lote_moments(df)
+        if delta.empty:
+            return delta.index
+        known = delta.index.intersection(self.state.index)
+        if len(known):
+            old = self.state.loc[known, STATE_COLUMNS].astype(np.int64)
+            new = delta.loc[known]
+            merged = old[MOMENT_COLUMNS + [ROUNDED_COLUMN]] + new[MOMENT_COLUMNS + [ROUNDED_COLUMN]]
+            earlier = new['min_age'] < old['min_age']
+            later = new['max_age'] > old['max_age']
+            merged['min_age'] = old['min_age'].where(~earlier, new['min_age'])
+            merged['first_cents'] = old['first_cents'].where(~earlier, new['first_cents'])
+            merged['max_age'] = old['max_age'].where(~later, new['max_age'])
+            merged['last_cents'] = old['last_cents'].where(~later, new['last_cents'])
+            self.state.loc[known, STATE_COLUMNS] = merged[STATE_COLUMNS]
+        added = delta.loc[delta.index.difference(self.state.index)]
+        if len(added):
+            added = added.assign(confidence_level=np.nan, passed=False) # Set by evaluate
+            self.state = pd.concat([self.state, added]).sort_index()
+        return delta.index
+
+    def drop(self, keys):
+        """Removes the state of the given lotes."""
+        self.state = self.state.drop(index=self.state.index.intersection(keys))
+        return self
+
+    def rounded_keys(self):
+        """Returns the keys of the lotes with feed_measuredPerBird values rounded to the cent."""
+        return self.state.index[self.state[ROUNDED_COLUMN].to_numpy(dtype=np.int64) > 0]
+
+    def _row_statistics(self, keys, rows):
+        """row_statistics of the rounded lotes among keys, or None if there are none (or no rows, with a warning)."""
+        rounded = keys.intersection(self.rounded_keys())
+        if len(rounded) == 0:
+            return None
+        if rows is None:
+            warnings.warn(f"{len(rounded)} lotes have feed_measuredPerBird values with more than 2 decimals and no "
+                          "rows were given; they are computed from their moments, rounded to the cent.")
+            return None
+        # In the order of keys, so the callers can assign them to keys.isin(statistics.index)
+        return row_statistics(rows, np.sort(rounded.to_numpy())).reindex(keys[keys.isin(rounded)])
+
+    def evaluate(self, keys=None, rows=None):
+        """
+        Recomputes the filter decisions and the confidence level of the given
+        lotes (all if None). rows must hold every row of the given lotes that
+        have rounded values (see rounded_keys).
+        """
+        keys = self.state.index if keys is None else self.state.index.intersection(keys)
+        if len(keys) == 0:
+            return self
+        state = self.state.loc[keys, STATE_COLUMNS].astype(np.int64)
+        first = state['first_cents'].to_numpy() / 100
+        last = state['last_cents'].to_numpy() / 100
+        from_rows = np.zeros(len(state), dtype=bool)
+        statistics = self._row_statistics(keys, rows)
+        if statistics is not None:
+            from_rows = keys.isin(statistics.index)
+            first[from_rows] = statistics['first'].to_numpy()
+            last[from_rows] = statistics['last'].to_numpy()
+        alive = (state['n'].to_numpy() >= self.lote_composto_min_count) \
+            & (first >= self.initial_min) & (first <= self.initial_max) \
+            & (last >= self.final_min) & (last <= self.final_max)
+        # The curves are only fitted for the lotes that survive the earlier filters, as in the full pipeline
+        confidence = np.full(len(state), np.nan)
+        from_moments = alive & ~from_rows
+        if from_moments.any():
+            confidence[from_moments] = quadratic_confidence(state[from_moments])
+        if from_rows.any():
+            confidence[from_rows] = np.where(alive[from_rows], statistics['r2'].to_numpy(), np.nan)
+        self.state.loc[keys, 'confidence_level'] = confidence
+        self.state.loc[keys, 'passed'] = alive & (confidence >= self.min_confidence)
+        return self
+
+    def passed_keys(self):
+        """Returns the keys of the lotes that pass every filter."""
+        return self.state.index[self.state['passed'].astype(bool)]
+
+    def aggregated_frame(self, rows=None):
+        """
+        Returns the Aggregator.aggregate_consumption_per_bird frame of the
+        passing lotes. rows must hold every row of the passing lotes that have
+        rounded values.
+        """
+        passed = self.state.loc[self.passed_keys()]
+        totals = passed['sum_y'].to_numpy(dtype=np.int64) / 100
+        statistics = self._row_statistics(passed.index, rows)
+        if statistics is not None:
+            totals[passed.index.isin(statistics.index)] = statistics['total'].to_numpy()
+        environment, batch = unpack_lote_key(passed.index.to_numpy())
+        aggregated = pd.DataFrame({
+            'loteComposto': lote_composto_categorical(environment, batch),
+            'total_consumption_per_lote_per_bird': totals,
+        })
+        return aggregated.sort_values('loteComposto', kind='stable').reset_index(drop=True)
+
+    def curve_table(self, rows=None):
+        """
+        Returns the curve table (see src.curve_fitting.curve_table) of the
+        passing lotes, from their moments. rows must hold every row of the
+        passing lotes that have rounded values; those are fitted from them.
+        """
+        passed = self.state.loc[self.passed_keys()]
+        moments = passed[MOMENT_COLUMNS].astype(np.int64)
+        n = moments['n'].to_numpy()
+        total = (n * moments['sum_yy'].to_numpy() - moments['sum_y'].to_numpy() ** 2).astype(np.float64)
+        confidence = passed['confidence_level'].to_numpy(dtype=np.float64)
+        environment, batch = unpack_lote_key(passed.index.to_numpy())
+        curves = pd.DataFrame({
+            'loteComposto': lote_composto_categorical(environment, batch),
+            'n': n,
+            'age_min': passed['min_age'].to_numpy(dtype=np.int64),
+            'age_max': passed['max_age'].to_numpy(dtype=np.int64),
+        })
+        for name, values in zip(coefficient_columns(2), quadratic_curves(moments).T):
+            curves[name] = values
+        curves['confidence_level'] = confidence
+        # The residual sum of squares is (1 - R^2) times the total one, total / n (in cents^2)
+        curves['rmse'] = np.sqrt(np.maximum(total / n * (1 - confidence), 0) / n) / 100
+        statistics = self._row_statistics(passed.index, rows)
+        if statistics is not None:
+            from_rows = passed.index.isin(statistics.index)
+            columns = coefficient_columns(2) + ['rmse']
+            curves.loc[from_rows, columns] = statistics[columns].to_numpy()
+        curves = curves.sort_values('loteComposto', kind='stable').reset_index(drop=True)
+        return apply_schema(curves, CURVE_SCHEMA)
+
+    def save(self, path):
+        """Saves the state table (see src.utils.storage.save_table)."""
+        return save_table(self.state.reset_index(), path)
+
+    def load(self, path):
+        """Loads a state table saved by save."""
+        state = load_table(path).set_index('lote_key')
+        self.state = state[STATE_COLUMNS + DECISION_COLUMNS]
+        return self
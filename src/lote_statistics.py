@@ -0,0 +1,203 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.curve_fitting import fit_polynomials
+from src.lote_state import MOMENT_COLUMNS, feed_to_cents, quadratic_confidence, rounded_to_cents
+from src.utils.schema import to_float64
+
+# Filter thresholds of the pipeline (ETLProcessor.filter_data, filter_by_start_end_consumption and
+# filter_by_confidence_level as main.py runs them); any of them can be swept
+DEFAULT_THRESHOLDS = {
+    'feed_per_bird_min': 15, 'feed_per_bird_max': 250, 'lote_composto_min_count': 15,
+    'initial_min': 0, 'initial_max': 50, 'final_min': 150, 'final_max': 250,
+    'min_confidence': 0.80,
+}
+# Quantiles of total_consumption_per_lote_per_bird reported for every threshold combination
+TOTAL_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+class LoteStatisticsTable:
+    """
+    Per-lote summary of a cleaned frame (ETLProcessor.clean_and_transform_columns)
+    for threshold sweeps of the filter chain, built once.
+
+    The rows of every lote are stored sorted by batchAge (ties keep the row
+    order) in padded lote x day matrices of batchAge, feed_measuredPerBird and
+    its integer cents, with the batchAge powers and cross products of the
+    quadratic fit precomputed. For a feed_measuredPerBird range, the row count,
+    the consumption at the first and last batchAge, the moments of the fit
+    (hence R^2, see src.lote_state.quadratic_confidence) and the total
+    consumption of every lote are masked sums over those matrices; they are
+    cached per range. The lote-level thresholds are then comparisons on one
+    value per lote, so a combination costs well under a millisecond. Lotes
+    whose rows in the range have feed_measuredPerBird values of more than 2
+    decimals (rounded in the cents) are fitted and totalled from their float64
+    values instead.
+
+    The lotes, rows and totals that pass a combination are the ones the
+    pipeline produces with those thresholds (the confidence level and the
+    totals up to float rounding).
+    """
+
+    def __init__(self, df):
+        self.range_cache = {}
+        df = df[df['feed_measuredPerBird'].notna()] if df is not None and not df.empty else pd.DataFrame()
+        if df.empty:
+            self.lotes = pd.Index([], name='loteComposto')
+            self.valid = np.zeros((0, 1), dtype=bool)
+            self.ages = np.zeros((0, 1), dtype=np.int64)
+            self.feed = np.zeros((0, 1))
+            self.rounded = np.zeros((0, 1), dtype=bool)
+            self.moment_terms = np.zeros((len(MOMENT_COLUMNS), 0, 1), dtype=np.int64)
+            return
+
+        lote = df['loteComposto'].astype('category').cat.remove_unused_categories()
+        codes = lote.cat.codes.to_numpy(dtype=np.int64)
+        ages = df['batchAge'].to_numpy(dtype=np.int64)
+        order = np.lexsort((ages, codes)) # by lote, then batchAge; lexsort is stable
+        codes, ages = codes[order], ages[order]
+        feed = to_float64(df['feed_measuredPerBird'])[order]
+        cents = feed_to_cents(feed)
+
+        # Position of every row in its lote's row of the padded matrices
+        counts = np.bincount(codes, minlength=len(lote.cat.categories))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        columns = np.arange(len(codes)) - starts[codes]
+        shape = (len(counts), int(counts.max()))
+
+        self.lotes = pd.Index(lote.cat.categories, name='loteComposto')
+        self.valid = np.zeros(shape, dtype=bool)
+        self.valid[codes, columns] = True
+        self.ages = np.zeros(shape, dtype=np.int64)
+        self.ages[codes, columns] = ages
+        self.feed = np.full(shape, np.nan)
+        self.feed[codes, columns] = feed
+        self.rounded = np.zeros(shape, dtype=bool)
+        self.rounded[codes, columns] = rounded_to_cents(feed)
+        y = np.zeros(shape, dtype=np.int64)
+        y[codes, columns] = cents
+        x = self.ages
+        x2 = x * x
+        # One matrix per MOMENT_COLUMNS entry; the masked row sums give the moments
+        self.moment_terms = np.stack([self.valid.astype(np.int64), x, x2, x2 * x, x2 * x2,
+                                      y, x * y, x2 * y, y * y])
+
+    def __len__(self):
+        return len(self.lotes)
+
+    def range_statistics(self, feed_per_bird_min, feed_per_bird_max):
+        """
+        Returns the per-lote statistics of the rows with feed_measuredPerBird in
+        [feed_per_bird_min, feed_per_bird_max], as a dict of arrays aligned
+        with self.lotes: count, first and last (consumption at the minimum and
+        maximum batchAge, NaN without rows), confidence_level and total.
+        """
+        key = (feed_per_bird_min, feed_per_bird_max)
+        if key in self.range_cache:
+            return self.range_cache[key]
+        # NaN padding fails both comparisons
+        mask = (self.feed >= feed_per_bird_min) & (self.feed <= feed_per_bird_max)
+        moments = pd.DataFrame(np.einsum('kld,ld->lk', self.moment_terms, mask.astype(np.int64)),
+                               columns=MOMENT_COLUMNS)
+        count = moments['n'].to_numpy()
+        has_rows = count > 0
+        rows = np.arange(len(self.lotes))
+
+        # Rows are sorted by batchAge, so the first masked row has the minimum batchAge (earliest row on ties)
+        first = np.where(has_rows, self.feed[rows, mask.argmax(axis=1)], np.nan)
+        # The earliest masked row of the maximum batchAge, like first_last_by_group
+        last_position = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+        at_max_age = mask & (self.ages == self.ages[rows, last_position][:, None])
+        last = np.where(has_rows, self.feed[rows, at_max_age.argmax(axis=1)], np.nan)
+
+        confidence = quadratic_confidence(moments) if len(moments) else np.empty(0)
+        total = moments['sum_y'].to_numpy() / 100
+        rounded = (self.rounded & mask).any(axis=1)
+        if rounded.any():
+            # Same fit as the pipeline, on the float64 rows of those lotes only
+            lote, day = np.nonzero(mask[rounded])
+            ages, feed = self.ages[rounded][lote, day], self.feed[rounded][lote, day]
+            confidence[rounded] = fit_polynomials(lote, ages, feed, degree=2, n_groups=int(rounded.sum()))['r2'].to_numpy()
+            total[rounded] = np.bincount(lote, feed, minlength=int(rounded.sum()))
+
+        statistics = {
+            'count': count,
+            'first': first,
+            'last': last,
+            'confidence_level': confidence,
+            'total': total,
+        }
+        self.range_cache[key] = statistics
+        return statistics
+
+    def lote_frame(self, feed_per_bird_min=15, feed_per_bird_max=250):
+        """Returns range_statistics as a DataFrame with one row per loteComposto."""
+        statistics = self.range_statistics(feed_per_bird_min, feed_per_bird_max)
+        return pd.DataFrame({'loteComposto': self.lotes, **statistics})
+
+    def passing_lotes(self, **thresholds):
+        """Returns the boolean mask (aligned with self.lotes) of the lotes that pass every filter."""
+        return self._evaluate({**DEFAULT_THRESHOLDS, **thresholds})[0]
+
+    def _evaluate(self, t):
+        """Returns (passing mask, summary dict) for a full threshold dict."""
+        statistics = self.range_statistics(t['feed_per_bird_min'], t['feed_per_bird_max'])
+        count, first, last = statistics['count'], statistics['first'], statistics['last']
+        in_range = count > 0
+        enough_rows = in_range & (count >= t['lote_composto_min_count'])
+        start_end_ok = enough_rows & (first >= t['initial_min']) & (first <= t['initial_max']) \
+            & (last >= t['final_min']) & (last <= t['final_max'])
+        passed = start_end_ok & (statistics['confidence_level'] >= t['min_confidence'])
+
+        totals = statistics['total'][passed]
+        summary = {
+            'lotes': int(passed.sum()),
+            'rows': int(count[passed].sum()),
+            'removed_by_count': int(in_range.sum() - enough_rows.sum()),
+            'removed_by_start_end': int(enough_rows.sum() - start_end_ok.sum()),
+            'removed_by_confidence': int(start_end_ok.sum() - passed.sum()),
+            'total_mean': float(totals.mean()) if len(totals) else np.nan,
+        }
+        quantiles = np.quantile(totals, TOTAL_QUANTILES) if len(totals) else np.full(len(TOTAL_QUANTILES), np.nan)
+        for q, value in zip(TOTAL_QUANTILES, quantiles):
+            summary[f'total_p{int(q * 100)}'] = float(value)
+        return passed, summary
+
+    def evaluate(self, **thresholds):
+        """
+        Evaluates one threshold combination (missing thresholds take their
+        DEFAULT_THRESHOLDS value).
+
+        Returns:
+            A dict with the thresholds, the passing lotes and rows, the lotes
+            removed by each filter (in pipeline order) and the mean and
+            TOTAL_QUANTILES of total_consumption_per_lote_per_bird.
+        """
+        unknown = sorted(set(thresholds) - set(DEFAULT_THRESHOLDS))
+        if unknown:
+            raise ValueError(f"Unknown thresholds {unknown}. Use any of {list(DEFAULT_THRESHOLDS)}.")
+        t = {**DEFAULT_THRESHOLDS, **thresholds}
+        return {**t, **self._evaluate(t)[1]}
+
+    def sweep(self, grid):
+        """
+        Evaluates every combination of a threshold grid, e.g.
+        {'feed_per_bird_min': [10, 15, 20], 'min_confidence': [0.7, 0.8, 0.9]};
+        thresholds not in the grid keep their DEFAULT_THRESHOLDS value.
+
+        Returns:
+            A DataFrame with one evaluate() row per combination.
+        """
+        unknown = sorted(set(grid) - set(DEFAULT_THRESHOLDS))
+        if unknown:
+            raise ValueError(f"Unknown thresholds {unknown}. Use any of {list(DEFAULT_THRESHOLDS)}.")
+        names = list(grid)
+        start = time.perf_counter()
+        results = [self.evaluate(**dict(zip(names, values))) for values in itertools.product(*grid.values())]
+        elapsed = time.perf_counter() - start
+        print(f"Evaluated {len(results)} threshold combinations on {len(self)} lotes in {elapsed:.3f}s "
+              f"({len(self.range_cache)} feed ranges).")
+        return pd.DataFrame(results)
@@ -1,27 +1,29 @@
 import pandas as pd
 
-def perform_merge(cluster_file_path, consumo_file_path):
+from src.utils.schema import PROCESSED_SCHEMA, apply_schema
+from src.utils.storage import load_table, save_table
+
+# Cluster attributes joined onto the consumption rows ('Aviario' is the join key)
+CLUSTER_COLUMNS = ['Aviario', 'PontuacaoMax', 'IEPMedian', 'ClassifCluster', 'PerfilDescritivo']
+
+def merge_cluster_attributes(df_consumo, cluster_file_path):
     """
-    Performs a left join from cluster_file_path to consumo_file_path,
-    adding specified columns to the consumo DataFrame.
+    Left-joins the cluster attributes (CLUSTER_COLUMNS) of cluster_file_path
+    onto df_consumo, matching environmentName to Aviario.
 
     Args:
-        cluster_file_path (str): Path to the cluster data CSV.
-        consumo_file_path (str): Path to the consumption data CSV.
+        df_consumo (pd.DataFrame): The consumption rows.
+        cluster_file_path (str): Path or stem of the cluster data artifact (see src.utils.storage).
+
+    Returns:
+        pd.DataFrame: The merged rows, with the PROCESSED_SCHEMA dtypes.
     """
-    # Load the cluster data
-    # Assuming the reclassification script saved with comma and decimal as '.'
-    df_cluster = pd.read_csv(cluster_file_path, sep=',', decimal='.')
-    
-    # Load the consumption data
-    df_consumo = pd.read_csv(consumo_file_path, sep=',')
+    # Only the merged columns are read
+    # Assuming the reclassification script saved with decimal as '.'
+    df_cluster_selected = load_table(cluster_file_path, columns=CLUSTER_COLUMNS)
 
     # Ensure 'Aviario' in df_cluster is integer for merging
-    df_cluster['Aviario'] = df_cluster['Aviario'].astype(int)
-
-    # Select columns to merge from df_cluster
-    columns_to_merge = ['Aviario', 'PontuacaoMax', 'IEPMedian', 'ClassifCluster', 'PerfilDescritivo']
-    df_cluster_selected = df_cluster[columns_to_merge]
+    df_cluster_selected['Aviario'] = df_cluster_selected['Aviario'].astype(int)
 
     # Perform the left merge
     # 'environmentName' in df_consumo corresponds to 'Aviario' in df_cluster
@@ -35,13 +37,30 @@ def perform_merge(cluster_file_path, consumo_file_path):
 
     # Drop the redundant 'Aviario' column from the merged DataFrame
     df_merged.drop(columns=['Aviario'], inplace=True)
+    return apply_schema(df_merged, PROCESSED_SCHEMA)
+
+def perform_merge(cluster_file_path, consumo_file_path):
+    """
+    Performs a left join from cluster_file_path to consumo_file_path,
+    adding the CLUSTER_COLUMNS attributes to the consumo DataFrame.
+
+    Both paths are artifact paths or stems (see src.utils.storage): the
+    Parquet artifact is used when present, the CSV otherwise.
+
+    Args:
+        cluster_file_path (str): Path to the cluster data artifact.
+        consumo_file_path (str): Path to the consumption data artifact.
+    """
+    # Load the consumption data
+    df_consumo = load_table(consumo_file_path, schema=PROCESSED_SCHEMA)
+    df_merged = merge_cluster_attributes(df_consumo, cluster_file_path)
 
-    # Save the updated DataFrame back to the consumption file
-    df_merged.to_csv(consumo_file_path, sep=',', index=False, decimal='.')
-    print(f"Merged data saved to '{consumo_file_path}' successfully.")
+    # Save the updated DataFrame back to the consumption artifact, with its CSV copy
+    written = save_table(df_merged, consumo_file_path, csv_export=True, csv_sep=',')
+    print(f"Merged data saved to {', '.join(repr(str(p)) for p in written)} successfully.")
 
 if __name__ == "__main__":
-    cluster_csv_path = 'data/processed/cluster_aviarios_processado.csv'
-    consumo_csv_path = 'data/processed/dataset_consumo_processed.csv'
-    perform_merge(cluster_csv_path, consumo_csv_path)
+    cluster_path = 'data/processed/cluster_aviarios_processado'
+    consumo_path = 'data/processed/dataset_consumo_processed'
+    perform_merge(cluster_path, consumo_path)
 
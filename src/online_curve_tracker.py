@@ -0,0 +1,215 @@
+import json
+import os
+import warnings
+from math import comb
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.curve_fitting import coefficient_columns, solve_normal_equations
+from src.lote_state import feed_to_cents, rounded_to_cents
+
+
+def _cents(feed_per_bird):
+    """
+    feed_to_cents of feed_measuredPerBird values (a float32 value is widened
+    as its schema column would be), warning about the ones it rounds.
+    """
+    feed_per_bird = np.atleast_1d(np.asarray(feed_per_bird))
+    rounded = rounded_to_cents(feed_per_bird)
+    if rounded.any():
+        warnings.warn(f"{int(rounded.sum())} feed_measuredPerBird values have more than 2 decimals; the tracker "
+                      "rounds them to the cent, so their lotes' fits differ slightly from a refit of the rows.")
+    return feed_to_cents(feed_per_bird)
+
+
+class OnlineCurveTracker:
+    """
+    Online version of the CurveModeler curve (polynomial of feed_measuredPerBird
+    on batchAge, quadratic by default) for lotes still in progress.
+
+    Every lote keeps a constant-size list of exact integer sums (Python ints,
+    with y in cents as in src.lote_state): n, sum x^k for k = 1 .. 2 * degree,
+    sum x^k y for k = 0 .. degree and sum y^2, plus the count and the sum of y
+    of every batchAge it has (bounded by the length of a batch), which guard
+    the removals. Values with more than 2 decimals (which the schema does not
+    expect) are rounded to the cent with a warning. Adding or removing one observation (e.g. to correct a day)
+    updates them in O(degree); the coefficients and R^2 are solved from them
+    on demand, in O(degree^3), in a shifted and scaled basis of batchAge (as
+    curve_fitting.fit_polynomials does) and cached until the lote changes.
+    Since the sums are exact, any sequence of adds and removes gives the same
+    fit as refitting the remaining rows.
+
+    The state is plain JSON (to_dict / save), so a long-running process can
+    resume with OnlineCurveTracker.load after a restart.
+    """
+
+    def __init__(self, degree=2):
+        self.degree = degree
+        self.sums = {} # loteComposto -> [n, sum_x .. sum_x^(2d), sum_y .. sum_x^d y, sum_yy]
+        self.ages = {} # loteComposto -> {batchAge: [count, sum_y]}
+        self.fits = {} # loteComposto -> cached fit, dropped when the lote changes
+
+    def __len__(self):
+        return len(self.sums)
+
+    def __contains__(self, lote):
+        return lote in self.sums
+
+    def _update(self, lote, batch_age, y, sign):
+        """Folds one observation (y in cents) into the sums of a lote, with sign +1 (add) or -1 (remove)."""
+        x = int(batch_age)
+        if x != batch_age:
+            raise ValueError(f"batchAge must be an integer, got {batch_age}.")
+        if sign < 0:
+            if lote not in self.sums:
+                raise KeyError(f"Lote {lote} has no observations to remove.")
+            count, age_sum = self.ages[lote].get(x, (0, 0))
+            if count == 0:
+                raise ValueError(f"Lote {lote} has no observation at batchAge {x} to remove.")
+            if count == 1 and age_sum != y:
+                raise ValueError(f"Lote {lote} has no observation of {y / 100} at batchAge {x} to remove.")
+        sums = self.sums.get(lote)
+        if sums is None:
+            sums = self.sums[lote] = [0] * (3 * self.degree + 3)
+            self.ages[lote] = {}
+        age = self.ages[lote].setdefault(x, [0, 0])
+        age[0] += sign
+        age[1] += sign * y
+        if age[0] == 0:
+            del self.ages[lote][x]
+        power = 1
+        for k in range(2 * self.degree + 1):
+            sums[k] += sign * power
+            if k <= self.degree:
+                sums[2 * self.degree + 1 + k] += sign * power * y
+            power *= x
+        sums[-1] += sign * y * y
+        self.fits.pop(lote, None)
+        if sums[0] == 0:
+            del self.sums[lote]
+            del self.ages[lote]
+
+    def add(self, lote, batch_age, feed_per_bird):
+        """Adds one daily observation (batchAge, feed_measuredPerBird) of a lote."""
+        self._update(lote, batch_age, int(_cents(feed_per_bird)[0]), 1)
+        return self
+
+    def remove(self, lote, batch_age, feed_per_bird):
+        """
+        Removes an observation previously added to a lote (e.g. before adding
+        its corrected value). The lote is dropped when its last observation is
+        removed. feed_per_bird must be the exact value that was added: it is
+        checked when the lote has a single observation at that batchAge, but
+        with several the sums cannot tell which values they hold.
+
+        Raises:
+            KeyError: If the lote has no observations.
+            ValueError: If the lote has no observation at batch_age, or its only one there has another value.
+        """
+        self._update(lote, batch_age, int(_cents(feed_per_bird)[0]), -1)
+        return self
+
+    def add_rows(self, df):
+        """Adds every row (loteComposto, batchAge, feed_measuredPerBird) of a frame, e.g. to bootstrap from history."""
+        cents = _cents(df['feed_measuredPerBird']).tolist()
+        for lote, age, y in zip(df['loteComposto'], df['batchAge'].tolist(), cents):
+            self._update(lote, age, y, 1)
+        return self
+
+    def fit(self, lote):
+        """
+        Returns the current fit of a lote as a dict: n, the coefficient_columns
+        of the curve in feed_measuredPerBird units, confidence_level (R^2; NaN
+        with fewer rows than coefficients, 1.0 for a constant curve) and rmse.
+
+        Raises:
+            KeyError: If the lote has no observations.
+        """
+        if lote in self.fits:
+            return self.fits[lote]
+        sums = self.sums[lote]
+        d = self.degree
+        n = sums[0]
+        x_sums = sums[:2 * d + 1]
+        xy_sums = sums[2 * d + 1:3 * d + 2]
+        sum_y, sum_yy = xy_sums[0], sums[-1]
+        # Shift x by a reference age near its mean (an integer, so the shifted sums stay exact) and scale
+        # it by its spread, the conditioning curve_fitting.fit_polynomials uses
+        reference = (2 * x_sums[1] + n) // (2 * n)
+        shifted_x = [sum(comb(k, j) * (-reference) ** (k - j) * x_sums[j] for j in range(k + 1)) for k in range(2 * d + 1)]
+        shifted_xy = [sum(comb(k, j) * (-reference) ** (k - j) * xy_sums[j] for j in range(k + 1)) for k in range(d + 1)]
+        scale = np.sqrt(shifted_x[2] / n) if shifted_x[2] > 0 else 1.0
+        # Normal equations with y centred and scaled by n, in exact integers before the scaling
+        gram = np.array([[shifted_x[i + j] / scale ** (i + j) for j in range(d + 1)] for i in range(d + 1)])
+        rhs = np.array([(n * shifted_xy[k] - sum_y * shifted_x[k]) / scale ** k for k in range(d + 1)])
+        total = float(n * sum_yy - sum_y * sum_y)
+        beta = solve_normal_equations(gram[None], rhs[None])[0]
+
+        # beta is n times the fit of the centred y, and beta . rhs is n^2 times the explained sum of squares
+        explained = float(beta @ rhs)
+        # sum_k beta_k ((x - r) / s)^k = sum_j c_j x^j, as in curve_fitting.fit_polynomials
+        coefficients = np.zeros(d + 1)
+        for k in range(d + 1):
+            for j in range(k + 1):
+                coefficients[j] += beta[k] / scale ** k * comb(k, j) * (-reference) ** (k - j)
+        coefficients /= n
+        coefficients[0] += sum_y / n
+        if n < d + 1:
+            confidence = np.nan
+        elif total > 0:
+            confidence = explained / (total * n)
+        else:
+            confidence = 1.0
+        rss = max(total / n - explained / n ** 2, 0.0)
+        fit = {'n': n, **dict(zip(coefficient_columns(d), (coefficients / 100).tolist())),
+               'confidence_level': confidence, 'rmse': float(np.sqrt(rss / n)) / 100}
+        self.fits[lote] = fit
+        return fit
+
+    def confidence(self, lote):
+        """Returns the current R^2 of a lote's curve."""
+        return self.fit(lote)['confidence_level']
+
+    def coefficients(self, lote):
+        """Returns the current coefficients of 1, x, ..., x**degree of a lote's curve."""
+        fit = self.fit(lote)
+        return np.array([fit[column] for column in coefficient_columns(self.degree)])
+
+    def fit_table(self):
+        """Returns the current fit of every tracked lote as a DataFrame indexed by loteComposto."""
+        columns = ['n', *coefficient_columns(self.degree), 'confidence_level', 'rmse']
+        rows = [self.fit(lote) for lote in self.sums]
+        return pd.DataFrame(rows, columns=columns, index=pd.Index(list(self.sums), name='loteComposto'))
+
+    def to_dict(self):
+        """Returns the JSON-serializable state of the tracker."""
+        return {'degree': self.degree,
+                'lotes': {str(lote): {'sums': sums, 'ages': {str(age): counts for age, counts in self.ages[lote].items()}}
+                          for lote, sums in self.sums.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuilds a tracker from to_dict output."""
+        tracker = cls(degree=state['degree'])
+        for lote, lote_state in state['lotes'].items():
+            tracker.sums[lote] = [int(value) for value in lote_state['sums']]
+            tracker.ages[lote] = {int(age): [int(count), int(age_sum)] for age, (count, age_sum) in lote_state['ages'].items()}
+        return tracker
+
+    def save(self, path):
+        """Writes the state to a JSON file, atomically (a crash never leaves a partial file)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temporary, path)
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Reads a tracker saved with save."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
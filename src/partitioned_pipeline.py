@@ -0,0 +1,205 @@
+import contextlib
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from src.aggregator import Aggregator
+from src.etl_processor import ETLProcessor, outlier_lotes_by_bounds
+from src.filter_plan import LazyFilterPlan
+from src.utils.lote_key import lote_composto_categorical, lote_keys
+from src.utils.quantile_sketch import KLLSketch
+from src.utils.schema import CURVE_SCHEMA, PROCESSED_SCHEMA, apply_schema
+from src.utils.storage import load_table, save_table
+
+ROW_COLUMN = '_row' # global row number, restores the in-memory row order after the partitions are combined
+CONSUMPTION_COLUMN = 'total_consumption_per_lote_per_bird'
+# Fibonacci hashing constant: spreads packed keys whose low bits (batchName) barely vary
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def partition_ids(keys, n_partitions):
+    """Returns the partition of every packed lote key (see src.utils.lote_key)."""
+    mixed = np.asarray(keys, dtype=np.int64).view(np.uint64) * _HASH_MULTIPLIER
+    return ((mixed >> np.uint64(32)) % np.uint64(n_partitions)).astype(np.int64)
+
+
+def _run_partition(partition_dir, min_confidence, quiet=True):
+    """
+    Runs the per-lote pipeline (filters, R^2 modeling and filter, aggregation)
+    on one partition. Module-level so it can run in pool workers.
+
+    Returns:
+        A tuple (final, aggregated, curves, sketch): three DataFrames (the
+        rows, the per-lote totals and the curve table), any of which may be
+        empty, and a KLLSketch of the partition's aggregated consumption.
+    """
+    sketch = KLLSketch()
+    chunks = [load_table(path) for path in sorted(Path(partition_dir).glob("chunk-*.parquet"))]
+    if not chunks:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), sketch
+    # Chunks with different clientName categories concatenate to strings; the schema restores the categorical
+    df = apply_schema(pd.concat(chunks, ignore_index=True), PROCESSED_SCHEMA)
+    # loteComposto is rebuilt per partition; only its labels have to match across partitions
+    df.insert(2, 'loteComposto', lote_composto_categorical(df['environmentName'], df['batchName']))
+
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        plan = LazyFilterPlan(df).filter_data() \
+                                 .filter_by_start_end_consumption() \
+                                 .add_confidence_level() \
+                                 .filter_by_confidence_level(min_confidence=min_confidence)
+        final = plan.collect()
+        if final.empty:
+            return final, pd.DataFrame(), pd.DataFrame(), sketch
+        aggregated = Aggregator(final).aggregate_consumption_per_bird().get_aggregated_dataframe()
+    return final, aggregated, plan.get_curve_table(), sketch.update(aggregated[CONSUMPTION_COLUMN])
+
+
+def _combine_lote_frames(frames, sort_column=None):
+    """
+    Concatenates per-partition frames, merging their loteComposto categoricals
+    into one with label-sorted categories. Sorts by sort_column if given,
+    otherwise by loteComposto.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    columns = frames[0].columns
+    lote_column = union_categoricals([frame['loteComposto'] for frame in frames], sort_categories=True)
+    combined = pd.concat([frame.drop(columns='loteComposto') for frame in frames], ignore_index=True)
+    combined.insert(columns.get_loc('loteComposto'), 'loteComposto', lote_column)
+    order = combined[sort_column].to_numpy() if sort_column else combined['loteComposto'].cat.codes.to_numpy()
+    return combined.take(np.argsort(order, kind='stable')).reset_index(drop=True)[columns]
+
+
+class PartitionedPipeline:
+    """
+    Out-of-core execution of the per-lote pipeline.
+
+    Extracted rows are cleaned chunk by chunk and hash-partitioned by their
+    packed lote key into on-disk Parquet chunks (work_dir/part-NNNN/), so all
+    rows of a lote end up in the same partition. Every filter, the R^2 fit and
+    the aggregation only look at one lote at a time, so each partition runs
+    through them independently, holding one partition in memory per worker.
+    The results are identical to the in-memory pipeline.
+
+    With iqr_filter, the aggregated consumption IQR outlier filter (see
+    ETLProcessor.filter_by_aggregated_consumption_iqr) runs on the partition
+    results too: every partition returns a quantile sketch of its lote
+    totals, the sketches are merged into the fleet-wide bounds and each
+    partition drops its outlier lotes before the results are combined. The
+    bounds equal the in-memory ones up to the sketch's k (200) lotes; above
+    that they are approximate (rank error about 1.7 / k) and can vary with the
+    partitioning, so a lote near a bound may be kept or dropped differently.
+    """
+
+    def __init__(self, work_dir, n_partitions=16, n_workers=1, min_confidence=0.80, iqr_filter=False):
+        self.work_dir = Path(work_dir)
+        self.n_partitions = n_partitions
+        self.n_workers = n_workers
+        self.min_confidence = min_confidence
+        self.iqr_filter = iqr_filter
+        self.sketch = None
+        self.curves = None
+        self.n_chunks = 0
+        self.n_rows = 0
+        if self.work_dir.exists():
+            shutil.rmtree(self.work_dir) # Partitions of a previous run are never reused
+        self.work_dir.mkdir(parents=True)
+
+    def _partition_dir(self, partition):
+        return self.work_dir / f"part-{partition:04d}"
+
+    def add_frame(self, df):
+        """Cleans an extracted chunk (see ETLProcessor.clean_and_transform_columns) and spills it to the partitions."""
+        if df is None or df.empty:
+            return self
+        df = ETLProcessor(df).clean_and_transform_columns().get_processed_dataframe()
+        df = df.drop(columns='loteComposto')
+        df[ROW_COLUMN] = np.arange(self.n_rows, self.n_rows + len(df), dtype=np.int64)
+        self.n_rows += len(df)
+
+        parts = partition_ids(lote_keys(df), self.n_partitions)
+        order = np.argsort(parts, kind='stable')
+        bounds = np.searchsorted(parts[order], np.arange(self.n_partitions + 1))
+        for partition in range(self.n_partitions):
+            start, stop = bounds[partition], bounds[partition + 1]
+            if start == stop:
+                continue
+            partition_dir = self._partition_dir(partition)
+            partition_dir.mkdir(exist_ok=True)
+            save_table(df.take(order[start:stop]), partition_dir / f"chunk-{self.n_chunks:06d}.parquet")
+        self.n_chunks += 1
+        return self
+
+    def _resolve_workers(self, n_partitions):
+        """Returns the number of worker processes to use for n_partitions partitions."""
+        n_workers = self.n_workers if self.n_workers is not None else (os.cpu_count() or 1)
+        if n_workers <= 0:
+            n_workers = os.cpu_count() or 1
+        return max(1, min(n_workers, n_partitions))
+
+    def iter_partition_results(self):
+        """Yields (final, aggregated, curves, sketch) for every non-empty partition, in partition order."""
+        partition_dirs = sorted(self.work_dir.glob("part-*"))
+        n_workers = self._resolve_workers(len(partition_dirs))
+        print(f"Running the per-lote pipeline on {len(partition_dirs)} partitions with {n_workers} worker(s)...")
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                yield from executor.map(_run_partition, partition_dirs, [self.min_confidence] * len(partition_dirs))
+        else:
+            for partition_dir in partition_dirs:
+                yield _run_partition(partition_dir, self.min_confidence)
+
+    def run(self):
+        """
+        Runs every partition and combines the results.
+
+        Returns:
+            A tuple (final, aggregated) with the same rows, in the same order, as
+            the in-memory LazyFilterPlan + Aggregator (with a fresh RangeIndex).
+            The curve table of those lotes (see LazyFilterPlan.get_curve_table)
+            is kept in self.curves and the merged sketch of their totals in
+            self.sketch.
+        """
+        finals, aggregates, curve_tables = [], [], []
+        self.sketch = KLLSketch()
+        for final, aggregated, curves, sketch in self.iter_partition_results():
+            finals.append(final)
+            aggregates.append(aggregated)
+            curve_tables.append(curves)
+            self.sketch.merge(sketch)
+
+        if self.iqr_filter and len(self.sketch):
+            lower_bound, upper_bound = self.sketch.iqr_bounds()
+            n_lotes = sum(len(aggregated) for aggregated in aggregates)
+            for i, aggregated in enumerate(aggregates):
+                if aggregated.empty:
+                    continue
+                outliers = outlier_lotes_by_bounds(aggregated, lower_bound, upper_bound, CONSUMPTION_COLUMN)
+                finals[i] = finals[i][~finals[i]['loteComposto'].isin(outliers)]
+                aggregates[i] = aggregated[~aggregated['loteComposto'].isin(outliers)]
+                curve_tables[i] = curve_tables[i][~curve_tables[i]['loteComposto'].isin(outliers)]
+            print(f"Aggregated consumption IQR filter: bounds [{lower_bound:.2f}, {upper_bound:.2f}] "
+                  f"({'exact' if self.sketch.is_exact() else f'approximate, more than {self.sketch.k} lotes'}), "
+                  f"{n_lotes - sum(len(aggregated) for aggregated in aggregates)} of {n_lotes} lotes removed.")
+
+        df_final = _combine_lote_frames(finals, sort_column=ROW_COLUMN)
+        if not df_final.empty:
+            df_final = apply_schema(df_final.drop(columns=ROW_COLUMN), PROCESSED_SCHEMA)
+        df_aggregated = _combine_lote_frames(aggregates)
+        self.curves = _combine_lote_frames(curve_tables)
+        if not self.curves.empty:
+            self.curves = apply_schema(self.curves, CURVE_SCHEMA)
+        print(f"Partitioned pipeline: {self.n_rows} rows in {self.n_chunks} chunks -> {len(df_final)} rows, "
+              f"{len(df_aggregated)} lotes.")
+        return df_final, df_aggregated
+
+    def cleanup(self):
+        """Removes the on-disk partitions."""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
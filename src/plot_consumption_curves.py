@@ -1,17 +1,18 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import sys
+from src.utils.schema import PREDICTED_SCHEMA
+from src.utils.storage import load_table
 
 def plot_consumption_curves(input_file, output_dir):
     try:
-        df = pd.read_csv(input_file)
+        df = load_table(input_file, columns=['Aviario', 'batchAge', 'smoothed_feed_measuredPerBird', 'PerfilDescritivo'], schema=PREDICTED_SCHEMA)
     except FileNotFoundError:
         print(f"Error: The input file '{input_file}' was not found.")
         sys.exit(1)
     except Exception as e:
-        print(f"Error loading the CSV file: {e}")
+        print(f"Error loading the input file: {e}")
         sys.exit(1)
 
     # Ensure the output directory exists
@@ -73,7 +74,8 @@ def plot_consumption_curves(input_file, output_dir):
 if __name__ == "__main__":
     current_dir = os.getcwd()
     
-    input_csv_file = os.path.join(current_dir, 'data', 'processed', 'predicted_consumption_per_bird.csv')
+    # Artifact stem: the Parquet file is used when present, the CSV otherwise
+    input_csv_file = os.path.join(current_dir, 'data', 'processed', 'predicted_consumption_per_bird')
     output_plots_dir = os.path.join(current_dir, 'images', 'plots')
     
     plot_consumption_curves(input_csv_file, output_plots_dir)
@@ -1,14 +1,18 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
 from pathlib import Path
+from src.curve_fitting import curve_points, curve_table
+from src.curve_modeler import CurveModeler
 
 class Plotter:
-    def __init__(self, dataframe):
+    def __init__(self, dataframe=None, curves=None):
+        """
+        Plots from a curve table (see src.curve_fitting.curve_table, e.g. the
+        persisted lote_curves); without one the curves of dataframe are fitted once.
+        """
         self.df = dataframe
+        self.curves = curves
         self.output_dir = Path("images/plots")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -16,9 +20,12 @@ class Plotter:
         """
         Generates a plot of consumption curves ('feed_measuredPerBird' vs 'batchAge')
         for each 'loteComposto', color-coded by 'confidence_level'.
-        Curves are smoothed using polynomial regression.
+        Curves are evaluated from the curve table over each lote's batchAge range.
         """
-        if self.df is None or self.df.empty:
+        curves = self.curves
+        if curves is None and self.df is not None and not self.df.empty:
+            curves = curve_table(CurveModeler(self.df).fit_curves())
+        if curves is None or curves.empty:
             print("No data to plot consumption curves.")
             return
 
@@ -49,15 +56,10 @@ class Plotter:
                 added_labels.add(label)
 
 
-        unique_lotes = self.df['loteComposto'].unique()
-        print(f"Plotting curves for {len(unique_lotes)} unique loteComposto groups...")
-
-        for lote in unique_lotes:
-            lote_df = self.df[self.df['loteComposto'] == lote].copy()
-            
-            # Get the confidence level for this lote
-            confidence = lote_df['confidence_level'].iloc[0]
+        print(f"Plotting curves for {len(curves)} unique loteComposto groups...")
+        ages, values = curve_points(curves)
 
+        for i, confidence in enumerate(curves['confidence_level'].to_numpy()):
             # Determine color based on confidence level
             plot_color = 'gray' # Default color
             if confidence < color_map['red']['threshold']:
@@ -70,29 +72,12 @@ class Plotter:
                 plot_color = 'blue'
             elif confidence >= color_map['purple']['threshold'] - 0.005: # For values approximately 1.00 (e.g., 0.9999999999999999)
                 plot_color = 'purple'
-            
-            
-            # Smoothing the curve using polynomial regression
-            X = lote_df[['batchAge']].dropna()
-            y = lote_df['feed_measuredPerBird'].dropna()
 
-            if len(X) >= 2: # Need at least 2 points for a linear fit, 3 for quadratic
-                # Use a quadratic model as used in CurveModeler, but can be adjusted if needed
-                poly = PolynomialFeatures(degree=2)
-                X_poly = poly.fit_transform(X)
-                
-                model = LinearRegression()
-                model.fit(X_poly, y)
-                
-                # Predict over a sorted range for smooth curve
-                x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
-                x_range_poly = poly.transform(x_range)
-                y_pred = model.predict(x_range_poly)
-                
-                ax.plot(x_range, y_pred, color=plot_color, alpha=0.7)
+            if ages[i, 0] < ages[i, -1]:
+                ax.plot(ages[i], values[i], color=plot_color, alpha=0.7)
             else:
-                # If not enough data points for regression, plot points directly or skip
-                ax.plot(X, y, 'o', color=plot_color, alpha=0.5, markersize=3) # Plot individual points if no smoothing possible
+                # A single batchAge: plot the fitted value as a point
+                ax.plot(ages[i, :1], values[i, :1], 'o', color=plot_color, alpha=0.5, markersize=3)
 
 
         ax.set_title("Consumption Curves by LoteComposto")
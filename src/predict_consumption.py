@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
@@ -6,11 +7,13 @@ import sys
 # Add the src directory to the system path to import analyze_silo_data
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from src.analyze_silo_data import analyze_silo_data
+from src.utils.schema import PREDICTED_SCHEMA, apply_schema
+from src.utils.storage import load_table, save_table
 
 def generate_predictions(model, features, cluster_name_mapping, cluster_aviarios_file, output_file):
-    # Load the cluster_aviarios_encoded.csv
+    # Load the cluster_aviarios_encoded artifact
     try:
-        cluster_data = pd.read_csv(cluster_aviarios_file, sep=',')
+        cluster_data = load_table(cluster_aviarios_file)
     except FileNotFoundError:
         print(f"Error: The file '{cluster_aviarios_file}' was not found.")
         sys.exit(1)
@@ -70,20 +73,27 @@ def generate_predictions(model, features, cluster_name_mapping, cluster_aviarios
     ]
 
 
-    prediction_df[output_columns].to_csv(output_file, index=False)
-    print(f"Predictions saved to '{output_file}'")
+    # Save results as Parquet, plus the CSV copy used by the business users
+    prediction_df = apply_schema(prediction_df[output_columns], PREDICTED_SCHEMA)
+    written = save_table(prediction_df, output_file, csv_export=True, csv_sep=',')
+    print(f"Predictions saved to {', '.join(repr(str(p)) for p in written)}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treina o modelo de consumo e gera as previsões por aviário.")
+    parser.add_argument("--n-jobs", type=int, default=-1,
+                        help="Núcleos para o treino e a validação cruzada (padrão: -1, todos; 1 = sequencial).")
+    args = parser.parse_args()
+
     current_dir = os.getcwd()
     
-    # Define file paths
-    main_dataset_file = os.path.join(current_dir, 'data', 'processed', 'dataset_consumo_processed.csv')
-    cluster_aviarios_file = os.path.join(current_dir, 'data', 'processed', 'cluster_aviarios_encoded.csv')
-    output_predictions_file = os.path.join(current_dir, 'data', 'processed', 'predicted_consumption_per_bird.csv')
+    # Define artifact paths (stems; see src.utils.storage)
+    main_dataset_file = os.path.join(current_dir, 'data', 'processed', 'dataset_consumo_processed')
+    cluster_aviarios_file = os.path.join(current_dir, 'data', 'processed', 'cluster_aviarios_encoded')
+    output_predictions_file = os.path.join(current_dir, 'data', 'processed', 'predicted_consumption_per_bird')
 
     # Train the model (from analyze_silo_data.py)
     # We call the function and capture the returned model, features and mapping
-    trained_model, model_features, cluster_map, cv_mae_mean, cv_mae_std = analyze_silo_data(main_dataset_file)
+    trained_model, model_features, cluster_map, cv_mae_mean, cv_mae_std = analyze_silo_data(main_dataset_file, n_jobs=args.n_jobs)
     
     # Print Cross-validation results captured from analyze_silo_data
     print(f"\nModel Cross-validation MAE: {cv_mae_mean:.2f} (+/- {cv_mae_std:.2f})")
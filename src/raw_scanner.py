@@ -0,0 +1,125 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.utils.data_loader import load_silo_projection
+
+
+class ScanConsumer:
+    """
+    Base class for the consumers fed by RawScanner.
+
+    A consumer declares the projection paths it needs (see
+    load_silo_projection), receives each successfully parsed file through
+    consume() and exposes its derived dataset through result(). In parallel
+    scans every worker feeds its own empty copy (spawn()), and the partial
+    consumers are combined in file order with merge().
+    """
+    paths = []
+
+    def spawn(self):
+        """Returns an empty consumer with the same configuration."""
+        return type(self)()
+
+    def consume(self, file_path, record):
+        """Processes one file; record maps each requested path to its value."""
+        raise NotImplementedError
+
+    def merge(self, other):
+        """Appends the state of another consumer that scanned later files."""
+        raise NotImplementedError
+
+    def result(self):
+        """Returns the derived dataset."""
+        raise NotImplementedError
+
+
+def _scan_files(json_files, consumers, paths):
+    """
+    Parses each file once and feeds its projection to every consumer.
+
+    Runs both in the main process and inside pool workers, so it must stay a
+    picklable module-level function.
+
+    Returns:
+        A tuple (consumers, failed) where failed lists (file, error) pairs.
+    """
+    failed = []
+    for json_file in json_files:
+        try:
+            record = load_silo_projection(json_file, paths)
+        except Exception as e:
+            failed.append((json_file, f"{type(e).__name__}: {e}"))
+            continue
+        if record is None:
+            failed.append((json_file, "could not be loaded or validated"))
+            continue
+        for consumer in consumers:
+            consumer.consume(json_file, record)
+    return consumers, failed
+
+
+class RawScanner:
+    """
+    Scans data/raw once and feeds every file to a set of registered consumers,
+    so several derived datasets come out of a single I/O and parse pass.
+
+    Only the union of the consumers' projection paths is parsed from each file.
+    With n_workers > 1 the sorted file list is split into contiguous chunks
+    that are scanned in a process pool; the partial consumers are merged in
+    chunk order, so the results match a serial scan.
+    """
+
+    def __init__(self, raw_data_dir, n_workers=1):
+        self.raw_data_dir = Path(raw_data_dir)
+        self.n_workers = n_workers
+        self.consumers = []
+        self.failed_files = []
+
+    def register(self, consumer):
+        """Registers a consumer and returns it, so results can be read after scan()."""
+        self.consumers.append(consumer)
+        return consumer
+
+    def _resolve_workers(self, n_files):
+        """Returns the number of worker processes to use for n_files files."""
+        n_workers = self.n_workers if self.n_workers is not None else (os.cpu_count() or 1)
+        if n_workers <= 0:
+            n_workers = os.cpu_count() or 1
+        return max(1, min(n_workers, n_files))
+
+    def scan(self):
+        """Runs the scan and returns the list of registered consumers with their results."""
+        if not self.raw_data_dir.is_dir():
+            print(f"Error: Raw data directory not found at {self.raw_data_dir}")
+            return self.consumers
+
+        json_files = sorted(self.raw_data_dir.glob("*.json"))
+        paths = list(dict.fromkeys(path for consumer in self.consumers for path in consumer.paths))
+        print(f"Scanning {len(json_files)} JSON files in {self.raw_data_dir} for {len(self.consumers)} consumers...")
+
+        n_workers = self._resolve_workers(len(json_files))
+        if n_workers > 1:
+            # Several chunks per worker balance the load; contiguous chunks keep file order
+            n_chunks = min(len(json_files), n_workers * 4)
+            bounds = [len(json_files) * i // n_chunks for i in range(n_chunks + 1)]
+            chunks = [json_files[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [
+                    executor.submit(_scan_files, chunk, [consumer.spawn() for consumer in self.consumers], paths)
+                    for chunk in chunks
+                ]
+                partials = [future.result() for future in futures]
+            self.failed_files = []
+            for partial_consumers, failed in partials:
+                for consumer, partial in zip(self.consumers, partial_consumers):
+                    consumer.merge(partial)
+                self.failed_files.extend(failed)
+        else:
+            _, self.failed_files = _scan_files(json_files, self.consumers, paths)
+
+        if self.failed_files:
+            print(f"Failed to scan {len(self.failed_files)} of {len(json_files)} JSON files:")
+            for json_file, error in self.failed_files:
+                print(f"  {json_file.name}: {error}")
+        return self.consumers
@@ -0,0 +1,198 @@
+from typing import Dict, Set
+
+import numpy as np
+import pandas as pd
+
+from src.ambience_store import AmbienceArrayBuilder
+from src.data_model import Ambience, Consumption
+from src.raw_scanner import ScanConsumer
+from src.utils.columnar_builder import CONSUMPTION_COLUMNS, ConsumptionColumnBuilder
+
+
+class ConsumptionDatasetConsumer(ScanConsumer):
+    """
+    Builds dataset_consumo (one row per consumption.result item) with the
+    layout of generate_consumption_dataset_v2: names come from the batch and
+    preBatch_feedDelivery_measured is the file's preBatchInfo delivery total.
+    """
+    paths = ['batch.environmentName', 'batch.name', 'batch.clientName', 'consumption']
+    RELEVANT_COLUMNS = [
+        "feedDelivery_measured", "feed_measured", "feed_manual_measured",
+        "feed_measuredPerBird", "siloEmptyTime", "siloNoConsumptionTime",
+    ]
+
+    def __init__(self):
+        self.builder = ConsumptionColumnBuilder()
+
+    def consume(self, file_path, record):
+        consumption = record['consumption']
+        if not isinstance(consumption, Consumption) or not consumption.result:
+            print(f"Aviso: Nenhum objeto 'consumption' válido ou 'consumption.result' encontrado no arquivo {file_path}. Pulando.")
+            return # Skip files without a valid consumption object or empty result list
+
+        # Calculate preBatch_feedDelivery_measured from consumption.preBatchInfo
+        pre_batch_feed_delivery_total = 0.0
+        if consumption.preBatchInfo:
+            for item in consumption.preBatchInfo:
+                if item.feedDelivery and item.feedDelivery.measured is not None:
+                    pre_batch_feed_delivery_total += item.feedDelivery.measured
+
+        first_row = len(self.builder)
+        self.builder.append_items(record['batch.environmentName'], record['batch.name'], record['batch.clientName'],
+                                  consumption.result, pre_batch_feed_delivery=pre_batch_feed_delivery_total)
+
+        # If any of the main feed/feedDelivery values are present, consider it relevant
+        if not self.builder.any_positive_since(first_row, self.RELEVANT_COLUMNS) and pre_batch_feed_delivery_total == 0:
+            print(f"Aviso: Nenhum dado de consumo de ração relevante encontrado no objeto 'consumption' do arquivo {file_path}. Pulando.")
+
+    def merge(self, other):
+        self.builder.extend(other.builder)
+        return self
+
+    def result(self):
+        """Returns the dataset in dataset_consumo column order (empty if no rows)."""
+        if len(self.builder) == 0:
+            return pd.DataFrame(columns=CONSUMPTION_COLUMNS)
+        return self.builder.to_dataframe()
+
+
+class UniqueValuesConsumer(ScanConsumer):
+    """Collects the unique values of the key batch, reference and ambience fields."""
+    paths = [
+        'batch',
+        'ambience.geolocation.city', 'ambience.geolocation.state', 'ambience.geolocation.country',
+        'ambience.result.item.measure',
+    ]
+    FIELDS = [
+        'batch_types', 'batch_statuses', 'client_names', 'environment_names', 'occurrence_types',
+        'reference_measures', 'reference_types', 'reference_categories', 'reference_modes',
+        'cities', 'states', 'countries', 'ambience_measures',
+    ]
+
+    def __init__(self):
+        self.values: Dict[str, Set[str]] = {field: set() for field in self.FIELDS}
+
+    def consume(self, file_path, record):
+        batch = record['batch']
+        self.values['batch_types'].add(batch.batchType)
+        self.values['batch_statuses'].add(batch.batchStatus)
+        self.values['client_names'].add(batch.clientName)
+        self.values['environment_names'].add(batch.environmentName)
+
+        for occurrence in batch.batchOccurrenceList:
+            self.values['occurrence_types'].add(occurrence.type)
+
+        if batch.batchReferences and 'referenceList' in batch.batchReferences:
+            for ref in batch.batchReferences['referenceList']:
+                self.values['reference_measures'].add(ref['measure'])
+                self.values['reference_types'].add(ref['referenceType'])
+                self.values['reference_categories'].add(ref['referenceCategory'])
+                self.values['reference_modes'].add(ref['referenceMode'])
+
+        # Ambience fields are None/empty when the file has no ambience object
+        for path, field in [('ambience.geolocation.city', 'cities'), ('ambience.geolocation.state', 'states'),
+                            ('ambience.geolocation.country', 'countries')]:
+            if record[path] is not None:
+                self.values[field].add(record[path])
+        self.values['ambience_measures'].update(record['ambience.result.item.measure'])
+
+    def merge(self, other):
+        for field, values in other.values.items():
+            self.values[field].update(values)
+        return self
+
+    def result(self):
+        """Returns a dict mapping each field to its sorted unique values."""
+        return {field: sorted(values) for field, values in self.values.items()}
+
+
+class AmbienceStatsConsumer(ScanConsumer):
+    """
+    Summarizes the ambience measures per (measure, deviceLocation): number of
+    files, days and samples, missing samples, mean of avgMeasured and the
+    extremes of minMeasured/maxMeasured.
+    """
+    paths = ['ambience']
+    STAT_COLUMNS = ['files', 'days', 'samples', 'missing_samples', 'avg_sum', 'min_measured', 'max_measured']
+
+    def __init__(self):
+        self.stats: Dict[tuple, dict] = {}
+
+    def _entry(self, key):
+        if key not in self.stats:
+            self.stats[key] = {'files': 0, 'days': 0, 'samples': 0, 'missing_samples': 0,
+                               'avg_sum': 0.0, 'min_measured': np.inf, 'max_measured': -np.inf}
+        return self.stats[key]
+
+    def consume(self, file_path, record):
+        ambience = record['ambience']
+        if not isinstance(ambience, Ambience):
+            return
+        for measure_result in ambience.result:
+            entry = self._entry((measure_result.measure, measure_result.deviceLocation))
+            entry['files'] += 1
+            for day in measure_result.result:
+                # None samples become NaN
+                avg = np.array(day.avgMeasured, dtype=np.float64)
+                minimum = np.array(day.minMeasured, dtype=np.float64)
+                maximum = np.array(day.maxMeasured, dtype=np.float64)
+                valid = ~np.isnan(avg)
+                entry['days'] += 1
+                entry['samples'] += int(valid.sum())
+                entry['missing_samples'] += int((~valid).sum())
+                entry['avg_sum'] += float(avg[valid].sum())
+                if np.isfinite(minimum).any():
+                    entry['min_measured'] = min(entry['min_measured'], float(np.nanmin(minimum)))
+                if np.isfinite(maximum).any():
+                    entry['max_measured'] = max(entry['max_measured'], float(np.nanmax(maximum)))
+
+    def merge(self, other):
+        for key, other_entry in other.stats.items():
+            entry = self._entry(key)
+            for column in ['files', 'days', 'samples', 'missing_samples', 'avg_sum']:
+                entry[column] += other_entry[column]
+            entry['min_measured'] = min(entry['min_measured'], other_entry['min_measured'])
+            entry['max_measured'] = max(entry['max_measured'], other_entry['max_measured'])
+        return self
+
+    def result(self):
+        """Returns one row per (measure, deviceLocation), sorted by both."""
+        rows = []
+        for (measure, device_location), entry in sorted(self.stats.items()):
+            rows.append({
+                'measure': measure,
+                'deviceLocation': device_location,
+                'files': entry['files'],
+                'days': entry['days'],
+                'samples': entry['samples'],
+                'missing_samples': entry['missing_samples'],
+                'avg_measured_mean': entry['avg_sum'] / entry['samples'] if entry['samples'] else np.nan,
+                'min_measured': entry['min_measured'] if np.isfinite(entry['min_measured']) else np.nan,
+                'max_measured': entry['max_measured'] if np.isfinite(entry['max_measured']) else np.nan,
+            })
+        return pd.DataFrame(rows, columns=['measure', 'deviceLocation', 'files', 'days', 'samples', 'missing_samples',
+                                           'avg_measured_mean', 'min_measured', 'max_measured'])
+
+
+class AmbienceArrayConsumer(ScanConsumer):
+    """
+    Converts every ambience series into the flat NaN-padded arrays of an
+    AmbienceArrayBuilder, keyed by the batch's environment and batch names.
+    """
+    paths = ['batch.environmentName', 'batch.name', 'ambience']
+
+    def __init__(self):
+        self.builder = AmbienceArrayBuilder()
+
+    def consume(self, file_path, record):
+        ambience = record['ambience']
+        if isinstance(ambience, Ambience):
+            self.builder.append_ambience(record['batch.environmentName'], record['batch.name'], ambience)
+
+    def merge(self, other):
+        self.builder.extend(other.builder)
+        return self
+
+    def result(self):
+        """Returns the builder; call its write() to persist an AmbienceStore."""
+        return self.builder
@@ -0,0 +1,47 @@
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+from src.aggregator import AGE_PERCENTILE_METRICS, GROUPINGS, LOTE_METRICS, Aggregator
+from src.merge_data import merge_cluster_attributes
+from src.utils.schema import PROCESSED_SCHEMA
+from src.utils.storage import load_table, save_table
+
+def aggregate_metrics(groupings, csv_export=True):
+    """
+    Builds the analysts' summary tables from dataset_consumo_processed: the
+    LOTE_METRICS per grouping (metrics_by_<grouping>) and the per-age
+    consumption percentiles per cluster (metrics_by_cluster_age).
+
+    main.py saves dataset_consumo_processed without the cluster attributes;
+    they are then joined from cluster_aviarios_processado as merge_data does.
+    """
+    processed_data_dir = Path("data/processed")
+    df = load_table(processed_data_dir / "dataset_consumo_processed", schema=PROCESSED_SCHEMA)
+    if GROUPINGS['cluster'] not in df.columns:
+        cluster_path = processed_data_dir / "cluster_aviarios_processado"
+        try:
+            df = merge_cluster_attributes(df, cluster_path)
+            print(f"Atributos de cluster juntados de {cluster_path}.")
+        except FileNotFoundError as e:
+            print(f"Error: Não foi possível juntar os atributos de cluster: {e}")
+
+    tables = {f"metrics_by_{grouping}": (LOTE_METRICS, grouping) for grouping in groupings}
+    tables["metrics_by_cluster_age"] = (AGE_PERCENTILE_METRICS, ['cluster', 'age'])
+    for name, (metrics, by) in tables.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            df_metrics = Aggregator(df).aggregate(metrics, by=by).get_aggregated_dataframe()
+        if df_metrics is None:
+            print(f"Não foi possível gerar {name} (colunas ausentes em dataset_consumo_processed).")
+            continue
+        written = save_table(df_metrics, processed_data_dir / name, csv_export=csv_export, csv_sep=';')
+        print(f"{name}: {len(df_metrics)} grupos salvos em {', '.join(str(p) for p in written)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera as tabelas de métricas agregadas por lote, aviário, cliente e cluster.")
+    parser.add_argument("--by", nargs="+", default=['lote', 'aviary', 'client', 'cluster'],
+                        help="Agrupamentos (lote, aviary, client, cluster ou nomes de colunas).")
+    parser.add_argument("--no-csv-export", action="store_true", help="Grava apenas os arquivos Parquet.")
+    args = parser.parse_args()
+    aggregate_metrics(args.by, csv_export=not args.no_csv_export)
@@ -0,0 +1,78 @@
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import PolynomialFeatures
+
+from src.curve_fitting import coefficient_columns, fit_lote_curves
+from src.scripts.benchmark_start_end_filter import make_frame
+from src.utils.schema import to_float64
+
+
+def _sklearn_fit(group, degree=2):
+    """The previous per-lote CurveModeler fit (PolynomialFeatures + LinearRegression + r2_score), kept as the reference."""
+    if len(group) < degree + 1:
+        return pd.Series({'r2': np.nan, 'fitted': None})
+    X = group[['batchAge']]
+    y = to_float64(group['feed_measuredPerBird'])
+    poly = PolynomialFeatures(degree=degree)
+    X_poly = poly.fit_transform(X)
+    model = LinearRegression().fit(X_poly, y)
+    y_pred = model.predict(X_poly)
+    return pd.Series({'r2': r2_score(y, y_pred), 'fitted': y_pred})
+
+
+def _sklearn_fits(df, degree=2):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return {lote: _sklearn_fit(group, degree) for lote, group in df.groupby('loteComposto', observed=True)}
+
+
+def _max_differences(df, batched, reference, degree=2):
+    """Returns the largest R^2 and fitted-value differences between the batched and the sklearn fits."""
+    coefficients = batched[coefficient_columns(degree)]
+    r2_difference = fitted_difference = 0.0
+    for lote, group in df.groupby('loteComposto', observed=True):
+        expected = reference[lote]
+        if np.isnan(expected['r2']):
+            assert np.isnan(batched.loc[lote, 'r2'])
+            continue
+        r2_difference = max(r2_difference, abs(batched.loc[lote, 'r2'] - expected['r2']))
+        fitted = np.polynomial.polynomial.polyval(group['batchAge'].to_numpy(dtype=np.float64),
+                                                  coefficients.loc[lote].to_numpy())
+        fitted_difference = max(fitted_difference, np.abs(fitted - expected['fitted']).max())
+    return r2_difference, fitted_difference
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the per-lote sklearn curve fits with the batched fits.")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--max-sklearn-lotes", type=int, default=5000,
+                        help="Skip the (slow) sklearn reference above this many lotes (default: 5000).")
+    args = parser.parse_args()
+
+    results = []
+    for n_lotes in args.lotes:
+        df = make_frame(n_lotes, n_days=args.days)
+        df['loteComposto'] = df['loteComposto'].astype('category')
+        start = time.perf_counter()
+        batched = fit_lote_curves(df)
+        batched_seconds = time.perf_counter() - start
+        row = {'lotes': n_lotes, 'rows': len(df), 'batched_s': round(batched_seconds, 4),
+               'sklearn_s': None, 'speedup': None, 'max_r2_diff': None, 'max_fitted_diff': None}
+        if n_lotes <= args.max_sklearn_lotes:
+            start = time.perf_counter()
+            reference = _sklearn_fits(df)
+            sklearn_seconds = time.perf_counter() - start
+            r2_difference, fitted_difference = _max_differences(df, batched, reference)
+            row.update({'sklearn_s': round(sklearn_seconds, 3), 'speedup': round(sklearn_seconds / batched_seconds),
+                        'max_r2_diff': f"{r2_difference:.1e}", 'max_fitted_diff': f"{fitted_difference:.1e}"})
+        results.append(row)
+        print(f"{n_lotes} lotes done.")
+
+    print(pd.DataFrame(results).fillna('-').to_markdown(index=False, disable_numparse=True))
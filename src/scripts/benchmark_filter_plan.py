@@ -0,0 +1,91 @@
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.curve_modeler import CurveModeler
+from src.etl_processor import ETLProcessor
+from src.filter_plan import LazyFilterPlan
+from src.utils.columnar_builder import CONSUMPTION_COLUMNS
+
+
+def make_extracted_frame(n_lotes, n_days=45, seed=42):
+    """
+    Builds a DataExtractor-like frame: tied batchAges, feed values outside the
+    filter range, short lotes, lotes failing the start/end bounds and noisy
+    lotes that fail the R^2 filter.
+    """
+    rng = np.random.default_rng(seed)
+    lote = np.repeat(np.arange(n_lotes), n_days)
+    batch_age = np.tile(np.arange(n_days), n_lotes)
+    batch_age = np.where(rng.random(len(batch_age)) < 0.05, np.maximum(batch_age - 1, 0), batch_age)
+    noise = np.repeat(rng.choice([2.0, 8.0, 60.0], n_lotes, p=[0.6, 0.3, 0.1]), n_days)
+    feed = 12.0 + 210.0 / (1.0 + np.exp(-(batch_age - 21.0) / 6.5)) + rng.normal(0.0, 1.0, len(lote)) * noise
+    # Truncated lotes fail the count filter
+    keep = ~((lote % 50 == 7) & (batch_age >= 10))
+    zeros = np.zeros(len(lote))
+    df = pd.DataFrame({
+        'environmentName': [f"AVIARIO {1000 + i % 997}" for i in lote],
+        'batchName': [f"Lote {20 + i // 997}" for i in lote],
+        'clientName': 'Integrado',
+        'batchAge': batch_age,
+        'preBatch_feedDelivery_measured': zeros,
+        'feedDelivery_measured': zeros,
+        'feed_measured': zeros,
+        'feed_manual_measured': zeros,
+        'feed_measuredPerBird': feed.round(2),
+        'siloEmptyTime': 0,
+        'siloNoConsumptionTime': 0,
+    })[CONSUMPTION_COLUMNS]
+    return df[keep].reset_index(drop=True)
+
+
+def eager_chain(df):
+    """The previous main.py phases 2-5: three ETLProcessor instances and a CurveModeler."""
+    df = ETLProcessor(df).clean_and_transform_columns().filter_data().get_processed_dataframe()
+    df = ETLProcessor(df).filter_by_start_end_consumption().get_processed_dataframe()
+    df = CurveModeler(df).add_confidence_level().get_modeled_dataframe()
+    return ETLProcessor(df).filter_by_confidence_level(min_confidence=0.80).get_processed_dataframe()
+
+
+def lazy_plan(df):
+    """The fused plan used by main.py."""
+    return LazyFilterPlan(df).clean_and_transform_columns().filter_data().filter_by_start_end_consumption() \
+                             .add_confidence_level().filter_by_confidence_level(min_confidence=0.80).collect()
+
+
+def _measure(function, df):
+    """Returns (seconds, peak traced MiB, result); the source frame is copied outside the measurement."""
+    df = df.copy()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the eager ETL chain with the fused LazyFilterPlan.")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--days", type=int, default=45)
+    args = parser.parse_args()
+
+    results = []
+    for n_lotes in args.lotes:
+        df = make_extracted_frame(n_lotes, n_days=args.days)
+        eager_seconds, eager_peak, eager = _measure(eager_chain, df)
+        lazy_seconds, lazy_peak, lazy = _measure(lazy_plan, df)
+        # The eager chain renumbers rows in CurveModeler's merge; compare the rows themselves
+        pd.testing.assert_frame_equal(eager.reset_index(drop=True), lazy.reset_index(drop=True))
+        results.append({'lotes': n_lotes, 'rows_in': len(df), 'rows_out': len(lazy),
+                        'eager_s': round(eager_seconds, 3), 'lazy_s': round(lazy_seconds, 3),
+                        'eager_peak_mib': round(eager_peak, 1), 'lazy_peak_mib': round(lazy_peak, 1)})
+
+    print(pd.DataFrame(results).to_markdown(index=False))
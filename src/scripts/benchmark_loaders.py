@@ -0,0 +1,75 @@
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.data_loader import load_silo_data, load_silo_projection
+from src.scripts.generate_synthetic_corpus import generate_synthetic_corpus
+
+LOADERS = {
+    "json + SiloData(**data)": lambda path: load_silo_data(path),
+    "bytes + model_validate_json": lambda path: load_silo_data(path, fast=True),
+    "projection (consumption)": lambda path: load_silo_projection(path, ["consumption"]),
+}
+
+
+def benchmark_loaders(json_files, repeat=3):
+    """
+    Times every loader over json_files and measures its peak traced memory on one file.
+
+    Returns:
+        A DataFrame with one row per loader.
+    """
+    rows = []
+    for name, loader in LOADERS.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for path in json_files:
+                loader(path)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+
+        tracemalloc.start()
+        loader(json_files[0])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append({
+            "loader": name,
+            "files": len(json_files),
+            "total_s": round(best, 3),
+            "ms_per_file": round(1000 * best / len(json_files), 2),
+            "peak_mib_per_file": round(peak / 2**20, 2),
+        })
+    report = pd.DataFrame(rows)
+    report["speedup"] = (report["total_s"].iloc[0] / report["total_s"]).round(2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the silo JSON loaders on a synthetic corpus.")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="Directory with JSON files. A synthetic corpus is generated if omitted.")
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--ambience-measures", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus
+        if corpus_dir is None:
+            corpus_dir = Path(tmp_dir)
+            generate_synthetic_corpus(corpus_dir, n_batches=args.batches, n_days=args.days,
+                                      n_ambience_measures=args.ambience_measures)
+        json_files = sorted(corpus_dir.glob("*.json"))
+        if not json_files:
+            print(f"No JSON files found in {corpus_dir}")
+        else:
+            size_mib = sum(p.stat().st_size for p in json_files) / 2**20
+            print(f"Benchmarking {len(json_files)} files ({size_mib:.1f} MiB) from {corpus_dir}")
+            print(benchmark_loaders(json_files, repeat=args.repeat).to_markdown(index=False))
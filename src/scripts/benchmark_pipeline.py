@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from src.aggregator import Aggregator
+from src.data_extractor import DataExtractor
+from src.filter_plan import LazyFilterPlan
+from src.plotter import Plotter
+from src.scripts.generate_synthetic_corpus import generate_synthetic_corpus
+
+# Synthetic batches have no merged aviary attributes, so the model is fit on the columns they do have
+RF_FEATURES = ['batchAge', 'environmentName', 'batchName']
+
+
+class PhaseTimer:
+    """Times each pipeline phase and records its peak traced memory and output rows."""
+
+    def __init__(self, trace_memory=True, quiet=True):
+        self.trace_memory = trace_memory
+        self.quiet = quiet
+        self.records = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measures the enclosed block; set record['rows'] inside it to report its output size."""
+        record = {'phase': name, 'rows': None}
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    # Keep the pipeline's progress prints and per-lote warnings out of the report
+                    stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+                    stack.enter_context(warnings.catch_warnings())
+                    warnings.simplefilter("ignore")
+                yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                record['peak_mib'] = round(peak / 2**20, 2)
+            else:
+                record['peak_mib'] = None
+            self.records.append(record)
+
+
+def run_pipeline(raw_data_dir, work_dir, timer, n_workers=1):
+    """
+    Runs the in-memory main.py phases on raw_data_dir (extraction, the fused
+    LazyFilterPlan, aggregation, plotting from the curve table) plus the
+    predict_consumption model fit, measuring each one with timer. Stops early
+    (like main.py) when a phase leaves no data.
+    """
+    with timer.phase('extraction') as record:
+        extractor = DataExtractor(raw_data_dir, n_workers=n_workers)
+        extractor.extract_from_json()
+        df = extractor.get_extracted_dataframe()
+        record['rows'] = 0 if df is None else len(df)
+    if df is None or df.empty:
+        return
+
+    with timer.phase('etl_filter_plan') as record:
+        filter_plan = LazyFilterPlan(df)
+        filter_plan.clean_and_transform_columns() \
+                   .filter_data() \
+                   .filter_by_start_end_consumption() \
+                   .add_confidence_level() \
+                   .filter_by_confidence_level(min_confidence=0.80)
+        df = filter_plan.collect()
+        curves = filter_plan.get_curve_table()
+        record['rows'] = len(df)
+    if df is None or df.empty:
+        return
+
+    with timer.phase('aggregation') as record:
+        aggregated = Aggregator(df).aggregate_consumption_per_bird().get_aggregated_dataframe()
+        record['rows'] = len(aggregated)
+
+    with timer.phase('plotting') as record:
+        plotter = Plotter(curves=curves)
+        plotter.output_dir = Path(work_dir)
+        plotter.plot_consumption_curves(output_filename="benchmark_curves.png")
+        record['rows'] = len(curves)
+
+    with timer.phase('rf_training') as record:
+        # Same model configuration as analyze_silo_data
+        X = df[RF_FEATURES].astype(float)
+        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model.fit(X, df['feed_measuredPerBird'], sample_weight=df['confidence_level'])
+        record['rows'] = len(X)
+
+
+def benchmark_sizes(sizes, n_days=45, n_ambience_measures=4, samples_per_day=24, no_collectors_ratio=0.05,
+                    n_workers=1, trace_memory=True, seed=42):
+    """
+    Generates a synthetic corpus for every size (number of batch files) and
+    runs the pipeline on it.
+
+    Returns:
+        A DataFrame with one row per (batches, phase).
+    """
+    rows = []
+    for n_batches in sizes:
+        with tempfile.TemporaryDirectory(prefix="silo_benchmark_") as tmp:
+            raw_data_dir = Path(tmp) / "raw"
+            generate_synthetic_corpus(raw_data_dir, n_batches=n_batches, n_days=n_days,
+                                      n_ambience_measures=n_ambience_measures, samples_per_day=samples_per_day,
+                                      seed=seed, no_collectors_ratio=no_collectors_ratio, pre_batch_ratio=0.2)
+            corpus_mib = sum(p.stat().st_size for p in raw_data_dir.glob("*.json")) / 2**20
+            print(f"Benchmarking {n_batches} batches ({corpus_mib:.1f} MiB of JSON)...")
+
+            timer = PhaseTimer(trace_memory=trace_memory)
+            run_pipeline(raw_data_dir, tmp, timer, n_workers=n_workers)
+            for record in timer.records:
+                rows.append({'batches': n_batches, 'corpus_mib': round(corpus_mib, 2), **record})
+    return pd.DataFrame(rows, columns=['batches', 'corpus_mib', 'phase', 'rows', 'seconds', 'peak_mib'])
+
+
+def compare_with_baseline(results, baseline):
+    """Adds the baseline seconds/peak of the same (batches, phase) and the current/baseline ratios."""
+    baseline = baseline[['batches', 'phase', 'seconds', 'peak_mib']].rename(
+        columns={'seconds': 'baseline_seconds', 'peak_mib': 'baseline_peak_mib'})
+    merged = results.merge(baseline, on=['batches', 'phase'], how='left')
+    merged['time_ratio'] = (merged['seconds'] / merged['baseline_seconds']).round(2)
+    merged['peak_ratio'] = (merged['peak_mib'] / merged['baseline_peak_mib']).round(2)
+    return merged
+
+
+def write_report(results, output_path, settings):
+    """Writes the results as JSON (for later --baseline runs) and as a Markdown table next to it."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'settings': settings,
+        'results': json.loads(results.to_json(orient='records')),
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    markdown_path = output_path.with_suffix('.md')
+    with open(markdown_path, 'w', encoding='utf-8') as f:
+        f.write("# Pipeline Benchmark\n\n")
+        f.write(f"Created {report['created']} (Python {report['python']}, pandas {report['pandas']}).\n\n")
+        f.write(f"Settings: `{json.dumps(settings)}`\n\n")
+        f.write(results.to_markdown(index=False))
+        f.write("\n")
+    return output_path, markdown_path
+
+
+def load_baseline(path, settings):
+    """Loads the results of a previous JSON report, warning if its corpus settings differ."""
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    ignored = ('sizes', 'trace_memory')
+    differing = sorted(key for key in set(settings) | set(report['settings'])
+                       if key not in ignored and settings.get(key) != report['settings'].get(key))
+    if differing:
+        print(f"Warning: baseline {path} was run with different settings ({', '.join(differing)}); "
+              f"the ratios compare different corpora.")
+    return pd.DataFrame(report['results'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times and memory-profiles the main.py phases on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000],
+                        help="Corpus sizes in batch files (default: 50 200 1000).")
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--ambience-measures", type=int, default=4)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--no-collectors-ratio", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=1, help="Extraction worker processes (default: 1).")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc; it slows the Python-heavy phases down noticeably.")
+    parser.add_argument("--output", type=Path, default=Path("reports/benchmarks/pipeline_benchmark.json"),
+                        help="JSON report path; a .md table is written next to it.")
+    parser.add_argument("--baseline", type=Path, help="Previous JSON report to compare against.")
+    args = parser.parse_args()
+
+    settings = {
+        'sizes': args.sizes, 'days': args.days, 'ambience_measures': args.ambience_measures,
+        'samples_per_day': args.samples_per_day, 'no_collectors_ratio': args.no_collectors_ratio,
+        'workers': args.workers, 'trace_memory': not args.no_memory,
+    }
+    results = benchmark_sizes(args.sizes, n_days=args.days, n_ambience_measures=args.ambience_measures,
+                              samples_per_day=args.samples_per_day, no_collectors_ratio=args.no_collectors_ratio,
+                              n_workers=args.workers, trace_memory=not args.no_memory)
+    if args.baseline:
+        results = compare_with_baseline(results, load_baseline(args.baseline, settings))
+
+    json_path, markdown_path = write_report(results, args.output, settings)
+    print(results.to_markdown(index=False))
+    print(f"\nReport saved to {json_path} and {markdown_path}")
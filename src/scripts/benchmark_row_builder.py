@@ -0,0 +1,70 @@
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src.data_model import ConsumptionItem
+from src.utils.columnar_builder import CONSUMPTION_COLUMNS, ConsumptionColumnBuilder
+from src.scripts.generate_synthetic_corpus import generate_silo_document
+
+
+def _dict_rows(batches):
+    """The previous extractor: one dict per ConsumptionItem, then pd.DataFrame(all_records)."""
+    all_records = []
+    for names, items in batches:
+        for item in items:
+            all_records.append({
+                'environmentName': names[0],
+                'batchName': names[1],
+                'clientName': names[2],
+                'batchAge': item.batchAge,
+                'preBatch_feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0,
+                'feedDelivery_measured': item.feedDelivery.measured if item.feedDelivery and item.feedDelivery.measured is not None else 0.0,
+                'feed_measured': item.feed.measured if item.feed and item.feed.measured is not None else 0.0,
+                'feed_manual_measured': item.feed.manual if item.feed and item.feed.manual is not None else 0.0,
+                'feed_measuredPerBird': item.feed.measuredPerBird if item.feed and item.feed.measuredPerBird is not None else 0.0,
+                'siloEmptyTime': item.siloEmptyTime if item.siloEmptyTime is not None else 0,
+                'siloNoConsumptionTime': item.siloNoConsumptionTime if item.siloNoConsumptionTime is not None else 0,
+            })
+    return pd.DataFrame(all_records)[CONSUMPTION_COLUMNS]
+
+
+def _columnar_rows(batches):
+    """The columnar builder shared by DataExtractor and generate_consumption_dataset_v2."""
+    builder = ConsumptionColumnBuilder()
+    for names, items in batches:
+        builder.append_items(*names, items)
+    return builder.to_dataframe()
+
+
+def _measure(build, batches):
+    """Returns (seconds, peak traced MiB, DataFrame) of one build."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = build(batches)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares list-of-dicts and columnar row building.")
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=45)
+    args = parser.parse_args()
+
+    # Validate one synthetic batch and reuse its items, so only row building is measured
+    document = generate_silo_document(0, n_days=args.days, n_ambience_measures=0)
+    items = [ConsumptionItem.model_validate(item) for item in document['consumption']['result']]
+    batches = [((f"AVIARIO {i}", f"Lote {i % 50}", "Integrado"), items) for i in range(args.batches)]
+
+    results = []
+    frames = {}
+    for name, build in [("list of dicts", _dict_rows), ("columnar builder", _columnar_rows)]:
+        elapsed, peak, frames[name] = _measure(build, batches)
+        results.append({"builder": name, "rows": len(frames[name]), "seconds": round(elapsed, 3), "peak_mib": round(peak, 1)})
+
+    pd.testing.assert_frame_equal(frames["list of dicts"], frames["columnar builder"])
+    print(pd.DataFrame(results).to_markdown(index=False))
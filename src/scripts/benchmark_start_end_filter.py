@@ -0,0 +1,87 @@
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.etl_processor import ETLProcessor
+
+
+def _loop_filter(df, initial_min=0, initial_max=50, final_min=150, final_max=250):
+    """The previous per-lote loop of filter_by_start_end_consumption, kept as the reference."""
+    lotes_to_keep = []
+    for lote_name, group in df.groupby('loteComposto'):
+        min_batch_age_row = group.loc[group['batchAge'].idxmin()]
+        initial_consumption = min_batch_age_row['feed_measuredPerBird']
+        max_batch_age_row = group.loc[group['batchAge'].idxmax()]
+        final_consumption = max_batch_age_row['feed_measuredPerBird']
+        initial_ok = (initial_consumption >= initial_min) and (initial_consumption <= initial_max)
+        final_ok = (final_consumption >= final_min) and (final_consumption <= final_max)
+        if initial_ok and final_ok:
+            lotes_to_keep.append(lote_name)
+    return df[df['loteComposto'].isin(lotes_to_keep)].copy()
+
+
+def _vectorized_filter(df):
+    """The current ETLProcessor implementation, with its progress prints silenced."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ETLProcessor(df).filter_by_start_end_consumption().get_processed_dataframe()
+
+
+def make_frame(n_lotes, n_days=45, seed=42):
+    """
+    Builds a post-filter_data-like frame: shuffled rows, gaps in the index,
+    duplicated batchAges (ties) and lotes that fail either bound.
+    """
+    rng = np.random.default_rng(seed)
+    lote = np.repeat(np.arange(n_lotes), n_days)
+    batch_age = np.tile(np.arange(n_days), n_lotes)
+    # Duplicate some ages so the min/max is tied within a lote
+    batch_age = np.where(rng.random(len(batch_age)) < 0.05, np.maximum(batch_age - 1, 0), batch_age)
+    feed = 12.0 + 210.0 / (1.0 + np.exp(-(batch_age - 21.0) / 6.5)) + rng.normal(0.0, 25.0, len(batch_age))
+    df = pd.DataFrame({
+        'environmentName': (lote % 997 + 1000).astype(np.int64),
+        'batchName': (lote // 997 + 20).astype(np.int64),
+        'loteComposto': pd.Series(lote % 997 + 1000).astype(str) + '-' + pd.Series(lote // 997 + 20).astype(str),
+        'batchAge': batch_age,
+        'feed_measuredPerBird': feed.round(2),
+    })
+    df = df.sample(frac=1.0, random_state=seed)
+    return df[rng.random(len(df)) > 0.02] # Index gaps, like after the earlier filters
+
+
+def _time(function, df, repeat):
+    """Returns (best seconds of repeat runs, last result)."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the per-lote loop and the vectorized start/end filter.")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--max-loop-lotes", type=int, default=20000,
+                        help="Skip the (slow) loop reference above this many lotes (default: 20000).")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for n_lotes in args.lotes:
+        df = make_frame(n_lotes, n_days=args.days)
+        vectorized_seconds, vectorized = _time(_vectorized_filter, df, args.repeat)
+        row = {'lotes': n_lotes, 'rows': len(df), 'kept_lotes': vectorized['loteComposto'].nunique(),
+               'vectorized_s': round(vectorized_seconds, 4), 'loop_s': None, 'speedup': None}
+        if n_lotes <= args.max_loop_lotes:
+            loop_seconds, loop = _time(_loop_filter, df, 1)
+            pd.testing.assert_frame_equal(loop, vectorized)
+            row.update({'loop_s': round(loop_seconds, 4), 'speedup': round(loop_seconds / vectorized_seconds, 1)})
+        results.append(row)
+        print(f"{n_lotes} lotes done.")
+
+    print(pd.DataFrame(results).fillna('-').to_markdown(index=False, disable_numparse=True))
@@ -0,0 +1,37 @@
+import argparse
+from pathlib import Path
+
+from src.curve_modeler import CurveModeler
+from src.growth_models import DEFAULT_GROWTH_MODELS
+from src.utils.storage import load_table, save_table
+
+def fit_growth_models(models, n_workers=1, csv_export=True):
+    """
+    Fits the growth models to every lote of the processed dataset
+    (data/processed/dataset_consumo_processed) and saves the goodness-of-fit
+    and model selection table as growth_model_fits in data/processed.
+    """
+    df = load_table(Path("data/processed") / "dataset_consumo_processed")
+    if df is None or df.empty:
+        print("Nenhum dado processado em data/processed. Execute o main.py primeiro.")
+        return None
+
+    df_fits = CurveModeler(df).fit_growth_models(models=models, n_workers=n_workers).get_growth_model_table()
+    written = save_table(df_fits, Path("data/processed") / "growth_model_fits", csv_export=csv_export, csv_sep=';')
+    print(f"{len(df_fits)} ajustes salvos em {', '.join(str(p) for p in written)}")
+    summary = df_fits.groupby('model', observed=True).agg(r2_mediano=('r2', 'median'), aic_mediano=('aic', 'median'),
+                                                         lotes_escolhidos=('selected', 'sum'))
+    print(summary.to_string())
+    return df_fits
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajusta modelos de crescimento à curva de consumo de cada lote "
+                                                 "e escolhe o melhor por AIC.")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_GROWTH_MODELS),
+                        help="Modelos candidatos: poly<grau>, gompertz, logistic, piecewise "
+                             f"(padrão: {' '.join(DEFAULT_GROWTH_MODELS)}).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos para os ajustes não lineares (padrão: um por CPU).")
+    parser.add_argument("--no-csv-export", action="store_true", help="Grava apenas o arquivo Parquet.")
+    args = parser.parse_args()
+    fit_growth_models(args.models, n_workers=args.workers, csv_export=not args.no_csv_export)
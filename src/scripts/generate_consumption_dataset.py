@@ -25,7 +25,7 @@ def generate_consumption_dataset():
     print(f"Processando {len(json_files)} arquivos JSON para dados de consumo de ração...")
 
     for file_path in json_files:
-        silo_data: Optional[SiloData] = load_silo_data(file_path)
+        silo_data: Optional[SiloData] = load_silo_data(file_path, fast=True)
         if not silo_data:
             continue # Skip files that failed to load or validate
 
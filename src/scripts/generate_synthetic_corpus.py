@@ -0,0 +1,220 @@
+import argparse
+import json
+import math
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+AMBIENCE_MEASURES = ["temperature", "humidity", "co2", "ammonia", "windSpeed", "luminosity", "pressure", "noise"]
+DEVICE_LOCATIONS = ["center", "entrance", "exit"]
+CLIENT_NAMES = ["Integrado Alfa", "Integrado Beta", "Integrado Gama", "Integrado Delta", "Integrado Epsilon"]
+DAY_SECONDS = 86400
+BASE_TIMESTAMP = 1700000000
+# Sent by the API instead of the object when an aviary has no data collectors installed
+NO_COLLECTORS_MESSAGE = "Error: no collectors found for environment {environment_id}"
+
+
+def _feed_per_bird(batch_age: int, scale: float) -> float:
+    """Daily feed intake per bird (g) following a logistic broiler intake curve."""
+    return scale * (12.0 + 210.0 / (1.0 + math.exp(-(batch_age - 21.0) / 6.5)))
+
+
+def _ambience_day(rnd: random.Random, batch_day: int, start: int, samples: int, base: float,
+                  gap_ratio: float = 0.05) -> Dict[str, Any]:
+    """Builds one AmbienceResultDetail day with evenly spaced samples and occasional gaps."""
+    def series(offset: float) -> List[Optional[float]]:
+        return [None if rnd.random() < gap_ratio else round(base + offset + rnd.gauss(0.0, 1.5), 2) for _ in range(samples)]
+
+    in_between = [None if rnd.random() < gap_ratio else round(rnd.uniform(60.0, 100.0), 1) for _ in range(samples)]
+    return {
+        "batchDay": batch_day,
+        "start": start,
+        "stop": start + DAY_SECONDS,
+        "time": [start + i * (DAY_SECONDS // samples) for i in range(samples)],
+        "percentageInBetween": in_between,
+        "percentageAboveLimit": [None if v is None else round((100.0 - v) / 2, 1) for v in in_between],
+        "percentageUnderLimit": [None if v is None else round((100.0 - v) / 2, 1) for v in in_between],
+        "minMeasured": series(-2.0),
+        "maxMeasured": series(2.0),
+        "avgMeasured": series(0.0),
+        "minReference": round(base - 3.0, 1),
+        "maxReference": round(base + 3.0, 1),
+    }
+
+
+def _pre_batch_items(rnd: random.Random, start: int) -> List[Dict[str, Any]]:
+    """Builds the feed deliveries made before housing (negative batchAge)."""
+    items = []
+    for batch_age in range(-rnd.randint(1, 3), 0):
+        day_start = start + batch_age * DAY_SECONDS
+        items.append({
+            "batchAge": batch_age,
+            "start": day_start,
+            "stop": day_start + DAY_SECONDS,
+            "feedDelivery": {"measured": round(rnd.uniform(8000.0, 16000.0), 1), "numberOfDeliveriesMeasured": 1},
+        })
+    return items
+
+
+def generate_silo_document(index: int, n_days: int = 45, n_ambience_measures: int = 4,
+                           samples_per_day: int = 24, seed: int = 42, no_collectors_ratio: float = 0.0,
+                           pre_batch_ratio: float = 0.0, missing_feed_ratio: float = 0.02,
+                           ambience_gap_ratio: float = 0.05) -> Dict[str, Any]:
+    """
+    Generates one synthetic silo JSON document that validates against SiloData.
+
+    Args:
+        index: Batch index; it determines the aviary, batch number and client.
+        n_days: Number of consumption days (batchAge 0 .. n_days - 1).
+        n_ambience_measures: Number of ambience measures, each with one result per day.
+        samples_per_day: Number of samples in each ambience day.
+        seed: Base random seed; the same (index, seed) always yields the same document.
+        no_collectors_ratio: Probability that the ambience and, independently, the
+            consumption object is replaced by the "no collectors" error string.
+        pre_batch_ratio: Probability that the consumption has preBatchInfo deliveries.
+        missing_feed_ratio: Probability that a consumption day has no feed object.
+        ambience_gap_ratio: Probability that an ambience sample is missing (None).
+    """
+    rnd = random.Random(seed * 1_000_003 + index)
+    environment_name = f"AVIARIO {1000 + index % 997}"
+    batch_name = f"Lote {20 + index // 997}"
+    client_name = CLIENT_NAMES[index % len(CLIENT_NAMES)]
+    client_id = f"client-{index % len(CLIENT_NAMES)}"
+    environment_id = f"env-{index % 997}"
+    batch_id = f"batch-{index:06d}"
+    start = BASE_TIMESTAMP + index * 3600
+    stop = start + n_days * DAY_SECONDS
+    birds = rnd.randint(15000, 35000)
+    scale = rnd.uniform(0.85, 1.15)
+    noise = rnd.choice([2.0, 4.0, 8.0, 25.0])
+
+    geolocation = {
+        "autoRefresh": True, "cityCode": 4127700, "city": "Toledo", "state": "PR", "region": "Sul",
+        "country": "Brasil", "latitude": -24.72, "longitude": -53.74, "elevation": 547.0,
+        "utcOffset": -3, "ianaTimeZone": "America/Sao_Paulo", "lastModified": start,
+    }
+
+    result = []
+    for batch_age in range(n_days):
+        day_start = start + batch_age * DAY_SECONDS
+        per_bird = max(0.0, _feed_per_bird(batch_age, scale) + rnd.gauss(0.0, noise))
+        missing_feed = rnd.random() < missing_feed_ratio
+        result.append({
+            "batchAge": batch_age,
+            "start": day_start,
+            "stop": day_start + DAY_SECONDS,
+            "feed": None if missing_feed else {
+                "reference": round(_feed_per_bird(batch_age, 1.0) * birds / 1000.0, 2),
+                "referencePerBird": round(_feed_per_bird(batch_age, 1.0), 2),
+                "measured": round(per_bird * birds / 1000.0, 2),
+                "measuredPerBird": round(per_bird, 2),
+            },
+            "feedDelivery": {
+                "measured": round(rnd.uniform(8000.0, 16000.0), 1) if rnd.random() < 0.2 else None,
+                "numberOfDeliveriesMeasured": 0,
+            },
+            "siloEmptyTime": rnd.choice([0, 0, 0, 0, 1800, 3600, None]),
+            "siloNoConsumptionTime": rnd.randint(0, 86400),
+        })
+
+    measures = AMBIENCE_MEASURES[:n_ambience_measures]
+    ambience = {
+        "batchId": batch_id, "batchName": batch_name, "batchType": "broiler", "clientId": client_id,
+        "clientName": client_name, "environmentId": environment_id, "environmentName": environment_name,
+        "geolocation": geolocation, "city": "Toledo", "latitude": -24.72, "longitude": -53.74,
+        "lastModified": stop, "start": start, "stop": stop,
+        "result": [
+            {
+                "measure": measure,
+                "deviceLocation": DEVICE_LOCATIONS[m % len(DEVICE_LOCATIONS)],
+                "result": [
+                    _ambience_day(rnd, day, start + day * DAY_SECONDS, samples_per_day, 20.0 + 5.0 * m,
+                                  gap_ratio=ambience_gap_ratio)
+                    for day in range(n_days)
+                ],
+            }
+            for m, measure in enumerate(measures)
+        ],
+    }
+
+    batch = {
+        "environmentId": environment_id, "name": batch_name, "initialDate": start, "finalDate": stop,
+        "batchDayCount": n_days, "batchType": "broiler", "batchStatus": "finished",
+        "batchReferences": {"referenceList": [
+            {"measure": "temperature", "referenceType": "ambience", "referenceCategory": "default", "referenceMode": "auto"},
+        ]},
+        "batchParam": {},
+        "batchOccurrenceList": [{
+            "time": start, "type": "housing",
+            "value": {"chickenBreed": "Cobb", "gender": "mixed", "averageWeight": 42.0, "amount": birds},
+            "batchOccurrenceId": f"occ-{index:06d}", "creation": start, "modified": start,
+        }],
+        "batchTargetWeight": 3000, "batchId": batch_id, "creation": start, "modified": stop,
+        "clientId": client_id, "clientName": client_name, "environmentName": environment_name,
+    }
+
+    consumption = {
+        "batchId": batch_id, "batchName": batch_name, "batchType": "broiler", "clientId": client_id,
+        "clientName": client_name, "environmentId": environment_id, "environmentName": environment_name,
+        "geolocation": geolocation, "city": "Toledo", "latitude": -24.72, "longitude": -53.74,
+        "lastModified": stop, "start": start, "stop": stop, "result": result,
+    }
+    if rnd.random() < pre_batch_ratio:
+        # The API really sends preBatchInfo under the ", " key (see Consumption.preBatchInfo)
+        consumption[", "] = _pre_batch_items(rnd, start)
+
+    no_collectors = NO_COLLECTORS_MESSAGE.format(environment_id=environment_id)
+    if rnd.random() < no_collectors_ratio:
+        ambience = no_collectors
+    if rnd.random() < no_collectors_ratio:
+        consumption = no_collectors
+
+    return {"batch": batch, "ambience": ambience, "consumption": consumption}
+
+
+def generate_synthetic_corpus(output_dir: Path, n_batches: int = 100, n_days: int = 45,
+                              n_ambience_measures: int = 4, samples_per_day: int = 24, seed: int = 42,
+                              **document_options) -> List[Path]:
+    """
+    Writes n_batches synthetic silo JSON files to output_dir and returns their paths.
+
+    document_options (no_collectors_ratio, pre_batch_ratio, missing_feed_ratio,
+    ambience_gap_ratio) are passed on to generate_silo_document.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(n_batches):
+        document = generate_silo_document(index, n_days=n_days, n_ambience_measures=n_ambience_measures,
+                                          samples_per_day=samples_per_day, seed=seed, **document_options)
+        path = output_dir / f"synthetic_{index:06d}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic corpus of silo JSON files.")
+    parser.add_argument("output_dir", type=Path, help="Directory to write the JSON files to.")
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--days", type=int, default=45)
+    parser.add_argument("--ambience-measures", type=int, default=4)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-collectors-ratio", type=float, default=0.0,
+                        help="Probability of a 'no collectors' ambience/consumption object (default: 0).")
+    parser.add_argument("--pre-batch-ratio", type=float, default=0.0,
+                        help="Probability of preBatchInfo deliveries in a consumption object (default: 0).")
+    parser.add_argument("--missing-feed-ratio", type=float, default=0.02)
+    parser.add_argument("--ambience-gap-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    written = generate_synthetic_corpus(args.output_dir, n_batches=args.batches, n_days=args.days,
+                                        n_ambience_measures=args.ambience_measures,
+                                        samples_per_day=args.samples_per_day, seed=args.seed,
+                                        no_collectors_ratio=args.no_collectors_ratio,
+                                        pre_batch_ratio=args.pre_batch_ratio,
+                                        missing_feed_ratio=args.missing_feed_ratio,
+                                        ambience_gap_ratio=args.ambience_gap_ratio)
+    print(f"Generated {len(written)} synthetic JSON files in {args.output_dir}")
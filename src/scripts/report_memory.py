@@ -0,0 +1,60 @@
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.schema import CONSUMPTION_SCHEMA, PREDICTED_SCHEMA, PROCESSED_SCHEMA, apply_schema, memory_report
+from src.utils.storage import load_table
+
+# Artifact stem (in the processed dir) -> compact schema
+DATASETS = {
+    'dataset_consumo': CONSUMPTION_SCHEMA,
+    'dataset_consumo_processed': PROCESSED_SCHEMA,
+    'predicted_consumption_per_bird': PREDICTED_SCHEMA,
+}
+
+
+def _default_dtypes(df):
+    """Returns df with the dtypes the datasets had before the compact schema (float64/int64/str)."""
+    wide = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            wide[column] = series.astype(series.cat.categories.dtype)
+        elif pd.api.types.is_float_dtype(series):
+            wide[column] = series.astype('float64')
+        elif pd.api.types.is_integer_dtype(series):
+            wide[column] = series.astype('float64' if series.isna().any() else 'int64')
+        else:
+            wide[column] = series
+    return pd.DataFrame(wide)
+
+
+def report_dataset(stem, schema):
+    """Loads an artifact, rebuilds it with default and compact dtypes and returns the memory_report."""
+    df = load_table(stem)
+    return memory_report(_default_dtypes(df), apply_schema(df, schema))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports the memory saved by the compact dtype schema.")
+    parser.add_argument("--processed-dir", type=Path, default=Path("data/processed"))
+    parser.add_argument("--columns", action="store_true", help="Also print the per-column breakdown.")
+    args = parser.parse_args()
+
+    totals = []
+    for name, schema in DATASETS.items():
+        try:
+            report = report_dataset(args.processed_dir / name, schema)
+        except FileNotFoundError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        if args.columns:
+            print(f"\n{name}:")
+            print(report.round(3).to_markdown())
+        total = report.loc['total']
+        totals.append({'dataset': name, 'mib_default': round(total['mib_before'], 2),
+                       'mib_compact': round(total['mib_after'], 2), 'ratio': round(total['ratio'], 2)})
+
+    print()
+    print(pd.DataFrame(totals).to_markdown(index=False))
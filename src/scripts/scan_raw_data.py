@@ -0,0 +1,57 @@
+import argparse
+from pathlib import Path
+
+from src.raw_scanner import RawScanner
+from src.scan_consumers import AmbienceArrayConsumer, AmbienceStatsConsumer, ConsumptionDatasetConsumer, UniqueValuesConsumer
+from src.scripts.extract_unique_values import print_unique_values
+from src.utils.storage import save_table
+
+def scan_raw_data(n_workers=1):
+    """
+    Builds every dataset derived from data/raw in a single parse of each file:
+    dataset_consumo (same rows as generate_consumption_dataset_v2), the
+    ambience statistics per measure and device location, the memory-mapped
+    ambience array store (see src/ambience_store.py) and the unique values
+    report of extract_unique_values.
+    """
+    raw_data_dir = Path("data/raw")
+    processed_data_dir = Path("data/processed")
+
+    if not any(raw_data_dir.glob("*.json")):
+        print(f"Nenhum arquivo JSON encontrado em {raw_data_dir}. Saindo.")
+        return
+
+    scanner = RawScanner(raw_data_dir, n_workers=n_workers)
+    consumption = scanner.register(ConsumptionDatasetConsumer())
+    ambience_stats = scanner.register(AmbienceStatsConsumer())
+    ambience_arrays = scanner.register(AmbienceArrayConsumer())
+    unique_values = scanner.register(UniqueValuesConsumer())
+    scanner.scan()
+
+    df_consumption = consumption.result()
+    if not df_consumption.empty:
+        written = save_table(df_consumption, processed_data_dir / "dataset_consumo", csv_export=True, csv_sep=';')
+        print(f"Dataset de consumo de ração gerado com sucesso em: {', '.join(str(p) for p in written)}")
+    else:
+        print("Nenhum dado de consumo de ração processado para gerar o dataset.")
+
+    df_ambience = ambience_stats.result()
+    if not df_ambience.empty:
+        written = save_table(df_ambience, processed_data_dir / "ambience_statistics", csv_export=True, csv_sep=';')
+        print(f"Estatísticas de ambiência geradas com sucesso em: {', '.join(str(p) for p in written)}")
+    else:
+        print("Nenhum dado de ambiência encontrado.")
+
+    ambience_builder = ambience_arrays.result()
+    if len(ambience_builder) > 0:
+        store_dir = ambience_builder.write(processed_data_dir / "ambience_store")
+        print(f"Séries de ambiência ({len(ambience_builder)} amostras) gravadas em: {store_dir}")
+
+    print_unique_values(unique_values.result())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds all datasets derived from data/raw in one pass.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for the scan (0 = one per CPU, default: 1).")
+    args = parser.parse_args()
+    scan_raw_data(n_workers=args.workers)
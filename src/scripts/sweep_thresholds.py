@@ -0,0 +1,44 @@
+import argparse
+import contextlib
+import io
+from pathlib import Path
+
+import pandas as pd
+
+from src.data_extractor import DataExtractor
+from src.etl_processor import ETLProcessor
+from src.lote_statistics import DEFAULT_THRESHOLDS, LoteStatisticsTable
+from src.utils.storage import save_table
+
+def sweep_thresholds(grid, csv_export=True):
+    """
+    Extracts the raw data (reusing the extraction cache), builds the
+    LoteStatisticsTable once and evaluates every threshold combination of the
+    grid, saving the result as threshold_sweep in data/processed.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = DataExtractor(Path("data/raw"), cache_dir=Path("data/cache/extraction")).extract_from_json() \
+                                                                                  .get_extracted_dataframe()
+        if df is not None and not df.empty:
+            df = ETLProcessor(df).clean_and_transform_columns().get_processed_dataframe()
+    if df is None or df.empty:
+        print("Nenhum dado extraído de data/raw.")
+        return None
+
+    table = LoteStatisticsTable(df)
+    df_sweep = table.sweep(grid)
+    written = save_table(df_sweep, Path("data/processed") / "threshold_sweep", csv_export=csv_export, csv_sep=';')
+    print(f"{len(df_sweep)} combinações salvas em {', '.join(str(p) for p in written)}")
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(df_sweep.sort_values('lotes', ascending=False).head(10).to_string(index=False))
+    return df_sweep
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Avalia combinações dos limiares dos filtros do pipeline "
+                                                 "(lotes e linhas aprovados e distribuição do consumo total).")
+    for name, default in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=type(default), nargs="+", default=[default],
+                            help=f"Valores de {name} a avaliar (padrão: {default}).")
+    parser.add_argument("--no-csv-export", action="store_true", help="Grava apenas o arquivo Parquet.")
+    args = parser.parse_args()
+    sweep_thresholds({name: getattr(args, name) for name in DEFAULT_THRESHOLDS}, csv_export=not args.no_csv_export)
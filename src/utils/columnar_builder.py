@@ -0,0 +1,155 @@
+from array import array
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.data_model import ConsumptionItem
+
+# Output columns in dataset_consumo.csv order, grouped by storage type
+STRING_COLUMNS = ['environmentName', 'batchName', 'clientName']
+FLOAT_COLUMNS = [
+    'preBatch_feedDelivery_measured', 'feedDelivery_measured', 'feed_measured',
+    'feed_manual_measured', 'feed_measuredPerBird',
+]
+INT_COLUMNS = ['batchAge', 'siloEmptyTime', 'siloNoConsumptionTime']
+CONSUMPTION_COLUMNS = [
+    'environmentName', 'batchName', 'clientName', 'batchAge',
+    'preBatch_feedDelivery_measured', 'feedDelivery_measured', 'feed_measured',
+    'feed_manual_measured', 'feed_measuredPerBird', 'siloEmptyTime', 'siloNoConsumptionTime',
+]
+
+
+class ConsumptionColumnBuilder:
+    """
+    Builds the consumption dataset column by column.
+
+    Numeric values are appended straight into typed growable arrays (one
+    array.array per column) and wrapped as NumPy views by to_dataframe, so no
+    per-row dict is ever allocated. The name columns are constant within a
+    batch, so they are kept as (value, count) runs and expanded only once.
+
+    Builders are picklable (arrays pickle as raw bytes), which makes them a
+    compact per-file block to return from worker processes.
+    """
+
+    def __init__(self):
+        self.floats = {column: array('d') for column in FLOAT_COLUMNS}
+        self.ints = {column: array('q') for column in INT_COLUMNS}
+        self.name_runs: List[tuple] = [] # (environmentName, batchName, clientName, count)
+
+    def __len__(self):
+        return len(self.ints['batchAge'])
+
+    def _add_name_run(self, names: tuple, count: int):
+        """Extends the last run if it has the same names, otherwise starts a new one."""
+        if count == 0:
+            return
+        if self.name_runs and self.name_runs[-1][:3] == names:
+            last = self.name_runs[-1]
+            self.name_runs[-1] = (*names, last[3] + count)
+        else:
+            self.name_runs.append((*names, count))
+
+    def append_items(self, environment_name: str, batch_name: str, client_name: str,
+                     items: Iterable[ConsumptionItem], pre_batch_feed_delivery: Optional[float] = None) -> int:
+        """
+        Appends one row per ConsumptionItem. Missing values become 0.
+
+        Args:
+            environment_name, batch_name, client_name: Names shared by all items.
+            items: The ConsumptionItems to append.
+            pre_batch_feed_delivery: Value of preBatch_feedDelivery_measured for every
+                row. If None, each row uses its own feedDelivery.measured.
+
+        Returns:
+            The number of rows appended.
+        """
+        batch_age = self.ints['batchAge'].append
+        silo_empty = self.ints['siloEmptyTime'].append
+        silo_no_consumption = self.ints['siloNoConsumptionTime'].append
+        pre_batch_delivery = self.floats['preBatch_feedDelivery_measured'].append
+        delivery = self.floats['feedDelivery_measured'].append
+        measured = self.floats['feed_measured'].append
+        manual = self.floats['feed_manual_measured'].append
+        per_bird = self.floats['feed_measuredPerBird'].append
+
+        count = 0
+        for item in items:
+            feed_delivery = item.feedDelivery
+            delivery_measured = feed_delivery.measured if feed_delivery and feed_delivery.measured is not None else 0.0
+            feed = item.feed
+            if feed is None:
+                feed_measured = feed_manual = feed_per_bird = 0.0
+            else:
+                feed_measured = feed.measured if feed.measured is not None else 0.0
+                feed_manual = feed.manual if feed.manual is not None else 0.0
+                feed_per_bird = feed.measuredPerBird if feed.measuredPerBird is not None else 0.0
+
+            batch_age(item.batchAge)
+            pre_batch_delivery(delivery_measured if pre_batch_feed_delivery is None else pre_batch_feed_delivery)
+            delivery(delivery_measured)
+            measured(feed_measured)
+            manual(feed_manual)
+            per_bird(feed_per_bird)
+            silo_empty(item.siloEmptyTime if item.siloEmptyTime is not None else 0)
+            silo_no_consumption(item.siloNoConsumptionTime if item.siloNoConsumptionTime is not None else 0)
+            count += 1
+
+        self._add_name_run((environment_name, batch_name, client_name), count)
+        return count
+
+    def any_positive_since(self, start: int, columns: Iterable[str]) -> bool:
+        """Returns True if any row appended at or after position start has a value > 0 in columns."""
+        for column in columns:
+            values = self.floats[column] if column in self.floats else self.ints[column]
+            if any(v > 0 for v in values[start:]):
+                return True
+        return False
+
+    def extend(self, other: 'ConsumptionColumnBuilder'):
+        """Appends all rows of another builder (e.g. a per-file block from a worker)."""
+        for column, values in other.floats.items():
+            self.floats[column].extend(values)
+        for column, values in other.ints.items():
+            self.ints[column].extend(values)
+        for run in other.name_runs:
+            self._add_name_run(run[:3], run[3])
+        return self
+
+    def extend_frame(self, df: pd.DataFrame):
+        """Appends the rows of a DataFrame with the CONSUMPTION_COLUMNS (e.g. a cached shard)."""
+        if df.empty:
+            return self
+        for column, values in self.floats.items():
+            values.frombytes(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64)).tobytes())
+        for column, values in self.ints.items():
+            values.frombytes(np.ascontiguousarray(df[column].to_numpy(dtype=np.int64)).tobytes())
+
+        names = df[STRING_COLUMNS].to_numpy(dtype=object)
+        run_starts = np.flatnonzero((names[1:] != names[:-1]).any(axis=1)) + 1
+        bounds = np.concatenate(([0], run_starts, [len(names)]))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            self._add_name_run(tuple(names[start]), int(stop - start))
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Wraps the columns into a DataFrame in CONSUMPTION_COLUMNS order.
+
+        The numeric columns are zero-copy views of the builder's arrays, so the
+        builder must not be appended to afterwards.
+        """
+        if len(self) == 0:
+            return pd.DataFrame(columns=CONSUMPTION_COLUMNS)
+
+        counts = np.fromiter((run[3] for run in self.name_runs), dtype=np.int64, count=len(self.name_runs))
+        columns = {}
+        for i, column in enumerate(STRING_COLUMNS):
+            run_values = np.array([run[i] for run in self.name_runs], dtype=object)
+            columns[column] = np.repeat(run_values, counts)
+        for column, values in self.floats.items():
+            columns[column] = np.frombuffer(values, dtype=np.float64)
+        for column, values in self.ints.items():
+            columns[column] = np.frombuffer(values, dtype=np.int64)
+        return pd.DataFrame({column: columns[column] for column in CONSUMPTION_COLUMNS}, copy=False)
@@ -1,17 +1,35 @@
 import json
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Iterable, Optional
 
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
-from src.data_model import SiloData # Ambience import removed as it's not needed directly here
+from src.data_model import SiloData, no_collectors_to_none # Ambience import removed as it's not needed directly here
 
-def load_silo_data(file_path: Path) -> Optional[SiloData]:
+try:
+    import ijson
+except ImportError: # ijson is optional; projections fall back to json.load
+    ijson = None
+
+_DECODE_ERRORS = (json.JSONDecodeError, ijson.JSONError) if ijson is not None else (json.JSONDecodeError,)
+
+# Validators for the top-level SiloData fields, used when a projection asks for a whole field
+_FIELD_ADAPTERS = {name: TypeAdapter(field.annotation) for name, field in SiloData.model_fields.items()}
+
+
+def load_silo_data(file_path: Path, fast: bool = False) -> Optional[SiloData]:
     """
     Loads and parses a JSON file containing silo data into a SiloData Pydantic model.
 
+    The "no collectors" strings sent instead of the ambience/consumption objects
+    are mapped to None by the SiloData validators.
+
     Args:
         file_path: The path to the JSON file.
+        fast: If True, the file is read with a single bulk read and validated
+            straight from the bytes with SiloData.model_validate_json, so no
+            intermediate dict is built. If False, the file is decoded with the
+            json module first.
 
     Returns:
         A SiloData object if successful, None otherwise.
@@ -21,26 +39,160 @@ def load_silo_data(file_path: Path) -> Optional[SiloData]:
         return None
 
     try:
+        if fast:
+            return SiloData.model_validate_json(file_path.read_bytes())
+
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-
-        # Explicitly handle the "no collectors" string for ambience
-        if isinstance(data.get('ambience'), str) and \
-           "no collectors" in data['ambience']:
-            data['ambience'] = None # Set to None if it's the error string
-
-        # Explicitly handle the "no collectors" string for consumption
-        if isinstance(data.get('consumption'), str) and \
-           "no collectors" in data['consumption']:
-            data['consumption'] = None # Set to None if it's the error string
-
         return SiloData(**data)
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from {file_path}: {e}")
         return None
+    except ValidationError as e:
+        if any(error['type'] == 'json_invalid' for error in e.errors()):
+            print(f"Error decoding JSON from {file_path}: {e}")
+        else:
+            print(f"Error validating data from {file_path} against schema: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while reading {file_path}: {e}")
+        return None
+
+
+def _normalize_paths(paths: Iterable[str]) -> list:
+    """Drops duplicate paths and paths already covered by a requested ancestor."""
+    unique_paths = sorted(set(paths))
+    return [p for p in unique_paths if not any(p.startswith(other + '.') for other in unique_paths if other != p)]
+
+
+def _is_multi_path(path: str) -> bool:
+    """Paths that go through an array ('item' segment, as in ijson) match several values."""
+    return 'item' in path.split('.')
+
+
+def _stream_projection(f, paths: list) -> Dict[str, Any]:
+    """
+    Builds only the requested subtrees of f with ijson's prefix filtering.
+
+    The prefix matching runs inside the ijson backend (C with yajl2_c), so
+    events outside a requested path are discarded without building Python
+    objects. Each path is a separate scan that stops at its first match,
+    which keeps paths near the start of the document (batch.*) cheap; paths
+    through arrays collect every match instead.
+    """
+    found: Dict[str, Any] = {}
+    for path in paths:
+        f.seek(0)
+        if _is_multi_path(path):
+            found[path] = list(ijson.items(f, path, use_float=True))
+            continue
+        for value in ijson.items(f, path, use_float=True):
+            found[path] = value
+            break
+    return found
+
+
+_MISSING = object()
+
+
+def _get_path(node: Any, keys: list) -> Any:
+    """
+    Walks nested dicts along keys, returning _MISSING if a key is absent.
+    An 'item' key walks every element of a list and returns the flat list of matches.
+    """
+    for i, key in enumerate(keys):
+        if key == 'item' and isinstance(node, list):
+            rest = keys[i + 1:]
+            matches = [match for match in (_get_path(element, rest) for element in node) if match is not _MISSING]
+            # Nested arrays are flattened, like ijson's prefix matching does
+            return [value for match in matches for value in match] if 'item' in rest else matches
+        if not isinstance(node, dict) or key not in node:
+            return _MISSING
+        node = node[key]
+    return node
+
+
+def _dict_projection(data: Dict[str, Any], paths: list) -> Dict[str, Any]:
+    """Picks the requested paths out of an already decoded document."""
+    found: Dict[str, Any] = {}
+    for path in paths:
+        value = _get_path(data, path.split('.'))
+        if value is not _MISSING:
+            found[path] = value
+        elif _is_multi_path(path):
+            found[path] = []
+    return found
+
+
+def load_silo_projection(file_path: Path, paths: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    Loads only the requested parts of a silo data JSON file.
+
+    Paths use dotted notation ('consumption', 'batch.name', ...); an 'item'
+    segment walks every element of an array ('ambience.result.item.measure')
+    and the path then maps to the list of all matches (empty if none). When
+    the paths fall under a single top-level field, the file is parsed
+    incrementally with ijson, so subtrees that are not requested (such as the
+    large ambience arrays or batchReferences) are skipped without being
+    materialized. Paths under several top-level fields would need one ijson
+    scan each, so the file is then decoded once with json.loads instead, which
+    is faster than the scans; the same happens without ijson installed.
+
+    Top-level paths ('batch', 'ambience', 'consumption') are validated against
+    the corresponding SiloData field, including the "no collectors" handling of
+    load_silo_data. Nested paths are returned as plain JSON values. Paths that
+    are not present in the file map to None.
+
+    Only the requested parts are validated: a file whose other fields do not
+    match SiloData is accepted. The projection saves memory rather than time
+    (on the synthetic corpus of benchmark_loaders it is about as fast as
+    load_silo_data and slower than load_silo_data(fast=True)), so use
+    load_silo_data when the whole file must be valid.
+
+    Args:
+        file_path: The path to the JSON file.
+        paths: The dotted paths to load.
+
+    Returns:
+        A dict mapping each requested path to its value if successful, None otherwise.
+    """
+    if not file_path.is_file():
+        print(f"Error: File not found at {file_path}")
+        return None
+
+    requested = list(dict.fromkeys(paths))
+    normalized = _normalize_paths(requested)
+    try:
+        if ijson is not None and len({path.split('.')[0] for path in normalized}) == 1:
+            with open(file_path, 'rb') as f:
+                found = _stream_projection(f, normalized)
+        else:
+            found = _dict_projection(json.loads(file_path.read_bytes()), normalized)
+
+        projection: Dict[str, Any] = {}
+        for path in normalized:
+            value = found.get(path)
+            if path in _FIELD_ADAPTERS:
+                value = no_collectors_to_none(value)
+                if value is not None or SiloData.model_fields[path].is_required():
+                    value = _FIELD_ADAPTERS[path].validate_python(value)
+            projection[path] = value
+
+        # Paths nested under another requested path are read from the (raw) ancestor
+        for path in requested:
+            if path not in projection:
+                ancestor = next(p for p in normalized if path.startswith(p + '.'))
+                value = _get_path(found.get(ancestor), path[len(ancestor) + 1:].split('.'))
+                if value is _MISSING:
+                    value = [] if _is_multi_path(path) else None
+                projection[path] = value
+        return {path: projection[path] for path in requested}
     except ValidationError as e:
         print(f"Error validating data from {file_path} against schema: {e}")
         return None
+    except _DECODE_ERRORS as e:
+        print(f"Error decoding JSON from {file_path}: {e}")
+        return None
     except Exception as e:
         print(f"An unexpected error occurred while reading {file_path}: {e}")
         return None
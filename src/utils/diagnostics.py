@@ -0,0 +1,94 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Environment variables that set the diagnostics level and output when main.py gets no options
+DIAGNOSTICS_LEVEL_ENV = "SILO_DIAGNOSTICS_LEVEL"
+DIAGNOSTICS_FILE_ENV = "SILO_DIAGNOSTICS_FILE"
+LEVELS = {'debug': 10, 'info': 20}
+DEFAULT_LEVEL = 'info'
+
+
+def _to_json(value):
+    """Converts a record field (frame, series, numpy or pandas scalar) to plain JSON types."""
+    if isinstance(value, pd.DataFrame):
+        return [{str(k): _to_json(v) for k, v in row.items()} for row in value.to_dict(orient='records')]
+    if isinstance(value, pd.Series):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index, pd.api.extensions.ExtensionArray)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+class Diagnostics:
+    """
+    Leveled, structured diagnostics of the pipeline steps.
+
+    Summaries that only exist to be looked at (value counts, first rows of a
+    frame, distinct counts) are logged with debug(event, **fields), where a
+    field may be a zero-argument callable. Below the debug level the call
+    returns after one comparison, so the callables are never evaluated and
+    the summaries cost nothing in production. At debug level every call
+    becomes a JSON record (time, level, event and fields), written as one
+    line to output_path, or printed when it is None; nothing is kept in memory.
+    """
+
+    def __init__(self, level: str = DEFAULT_LEVEL, output_path=None):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown diagnostics level '{level}'. Use one of {list(LEVELS)}.")
+        self.level = level
+        self.threshold = LEVELS[level]
+        self.output_path = Path(output_path) if output_path is not None else None
+        if self.output_path is not None and self.enabled_for('debug'):
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.output_path.write_text('', encoding='utf-8')
+
+    def enabled_for(self, level: str) -> bool:
+        """True if records of this level are emitted."""
+        return LEVELS[level] >= self.threshold
+
+    def debug(self, event: str, **fields):
+        """Emits a debug record; callable fields are only evaluated when it is emitted."""
+        if LEVELS['debug'] < self.threshold:
+            return
+        record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'level': 'debug', 'event': event}
+        for name, value in fields.items():
+            record[name] = _to_json(value() if callable(value) else value)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        if self.output_path is None:
+            print(f"[debug] {line}")
+        else:
+            with open(self.output_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+# Diagnostics used by the pipeline classes; at the production level until set_diagnostics() installs others
+_diagnostics = Diagnostics()
+
+
+def get_diagnostics() -> Diagnostics:
+    """Returns the active diagnostics."""
+    return _diagnostics
+
+
+def set_diagnostics(diagnostics: Diagnostics) -> Diagnostics:
+    """Installs diagnostics as the active diagnostics and returns it."""
+    global _diagnostics
+    _diagnostics = diagnostics
+    return diagnostics
+
+
+def debug(event: str, **fields):
+    """Emits a debug record with the active diagnostics (see Diagnostics.debug)."""
+    _diagnostics.debug(event, **fields)
@@ -0,0 +1,206 @@
+import contextlib
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+# Environment variable that enables the run report when main.py gets no --run-report
+RUN_REPORT_ENV = "SILO_RUN_REPORT"
+REPORT_VERSION = 1
+
+
+def _peak_rss_mib() -> Optional[float]:
+    """Returns the process peak resident set size in MiB, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def _frame_stats(df) -> Dict[str, Optional[int]]:
+    """Returns the row count and distinct loteComposto count of a DataFrame (None if unknown)."""
+    if df is None:
+        return {'rows': None, 'lotes': None}
+    lotes = int(df['loteComposto'].nunique()) if 'loteComposto' in df.columns else None
+    return {'rows': len(df), 'lotes': lotes}
+
+
+class PhaseRecord:
+    """Measurements of one instrumented block, filled in by RunRecorder.phase."""
+
+    def __init__(self, name: str, kind: str, parent: Optional[str]):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.rows_in = self.rows_out = None
+        self.lotes_in = self.lotes_out = None
+        self.extra: Dict[str, Any] = {}
+
+    def input(self, df):
+        """Records the rows and lotes entering the block."""
+        stats = _frame_stats(df)
+        return self.input_counts(stats['rows'], stats['lotes'])
+
+    def output(self, df):
+        """Records the rows and lotes leaving the block."""
+        stats = _frame_stats(df)
+        return self.output_counts(stats['rows'], stats['lotes'])
+
+    def input_counts(self, rows: Optional[int], lotes: Optional[int]):
+        """Records the rows and lotes entering the block when there is no frame to count them from."""
+        self.rows_in, self.lotes_in = rows, lotes
+        return self
+
+    def output_counts(self, rows: Optional[int], lotes: Optional[int]):
+        """Records the rows and lotes leaving the block when there is no frame to count them from."""
+        self.rows_out, self.lotes_out = rows, lotes
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'kind': self.kind, 'parent': self.parent,
+                'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'lotes_in': self.lotes_in, 'lotes_out': self.lotes_out, **self.extra}
+
+
+class _NullRecord:
+    """Stand-in yielded while instrumentation is disabled; every call is a no-op."""
+
+    def input(self, df):
+        return self
+
+    def output(self, df):
+        return self
+
+    def input_counts(self, rows, lotes):
+        return self
+
+    def output_counts(self, rows, lotes):
+        return self
+
+
+_NULL_RECORD = _NullRecord()
+
+
+class RunRecorder:
+    """
+    Collects per-phase measurements of a pipeline run: wall time, CPU time,
+    process peak RSS (and how much a block raised it), rows and distinct
+    loteComposto in and out.
+
+    A disabled recorder does nothing beyond one attribute check per block, so
+    the pipeline can always be instrumented and only pay when a report is
+    requested.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.records: List[Dict[str, Any]] = []
+        self._stack: List[str] = []
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, kind: str = 'phase', **extra):
+        """
+        Measures the enclosed block. The yielded record takes input(df) and
+        output(df) calls (or input_counts / output_counts) for the row and
+        lote counts. extra is added to the block's report entry as is.
+        """
+        if not self.enabled:
+            yield _NULL_RECORD
+            return
+
+        record = PhaseRecord(name, kind, self._stack[-1] if self._stack else None)
+        record.extra.update(extra)
+        self._stack.append(name)
+        rss_before = _peak_rss_mib()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            rss_after = _peak_rss_mib()
+            self._stack.pop()
+            record.extra.update({
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'peak_rss_mib': round(rss_after, 1) if rss_after is not None else None,
+                'peak_rss_growth_mib': round(rss_after - rss_before, 1) if rss_after is not None else None,
+            })
+            self.records.append(record.to_dict())
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the run report as a JSON-serializable dict."""
+        peak = _peak_rss_mib()
+        return {
+            'version': REPORT_VERSION,
+            'started': self.started,
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_wall_seconds': round(time.perf_counter() - self._start_wall, 4),
+            'total_cpu_seconds': round(time.process_time() - self._start_cpu, 4),
+            'peak_rss_mib': round(peak, 1) if peak is not None else None,
+            'phases': self.records,
+        }
+
+    def write(self, output_path) -> Path:
+        """Writes the run report as JSON and returns its path."""
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return output_path
+
+
+# Recorder used by the instrumented() methods; disabled until set_recorder() installs one
+_recorder = RunRecorder(enabled=False)
+
+
+def get_recorder() -> RunRecorder:
+    """Returns the active recorder."""
+    return _recorder
+
+
+def set_recorder(recorder: RunRecorder) -> RunRecorder:
+    """Installs recorder as the active recorder and returns it."""
+    global _recorder
+    _recorder = recorder
+    return recorder
+
+
+def instrumented(method):
+    """
+    Records a pipeline method (ETLProcessor, CurveModeler, ...) with the
+    active recorder, using self.df before and after the call as its input and
+    output. The method name is qualified with its class in the report.
+    """
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        recorder = _recorder
+        if not recorder.enabled:
+            return method(self, *args, **kwargs)
+        with recorder.phase(name, kind='method') as record:
+            record.input(getattr(self, 'df', None))
+            result = method(self, *args, **kwargs)
+            record.output(getattr(self, 'df', None))
+        return result
+
+    return wrapper
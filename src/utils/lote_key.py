@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# Packed key layout: environmentName in the high 32 bits, batchName in the low 32 bits
+BATCH_BITS = 32
+BATCH_MASK = (1 << BATCH_BITS) - 1
+MAX_ENVIRONMENT = (1 << 31) - 1 # keeps the packed key a positive int64
+
+
+def lote_key_in_range(environment, batch) -> np.ndarray:
+    """Returns the row mask of the environmentName/batchName numbers that fit the packed key."""
+    environment = np.asarray(environment, dtype=np.int64)
+    batch = np.asarray(batch, dtype=np.int64)
+    return (environment >= 0) & (environment <= MAX_ENVIRONMENT) & (batch >= 0) & (batch <= BATCH_MASK)
+
+
+def pack_lote_key(environment, batch) -> np.ndarray:
+    """
+    Packs numeric environmentName and batchName values into one int64 key per
+    row: (environment << 32) | batch. Rows outside lote_key_in_range must be
+    dropped first, as ETLProcessor.clean_and_transform_columns does.
+
+    Raises:
+        ValueError: If a value is negative or does not fit its 32/31 bits.
+    """
+    environment = np.asarray(environment, dtype=np.int64)
+    batch = np.asarray(batch, dtype=np.int64)
+    if len(environment) and (environment.min() < 0 or environment.max() > MAX_ENVIRONMENT):
+        raise ValueError(f"environmentName values must be in [0, {MAX_ENVIRONMENT}] to build the lote key.")
+    if len(batch) and (batch.min() < 0 or batch.max() > BATCH_MASK):
+        raise ValueError(f"batchName values must be in [0, {BATCH_MASK}] to build the lote key.")
+    return (environment << BATCH_BITS) | batch
+
+
+def unpack_lote_key(keys):
+    """Returns the (environment, batch) int64 arrays of packed lote keys."""
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> BATCH_BITS, keys & BATCH_MASK
+
+
+def lote_key_labels(keys) -> np.ndarray:
+    """Returns the 'environment-batch' display strings of packed lote keys."""
+    environment, batch = unpack_lote_key(keys)
+    return np.array([f"{e}-{b}" for e, b in zip(environment.tolist(), batch.tolist())], dtype=object)
+
+
+def lote_composto_categorical(environment, batch) -> pd.Categorical:
+    """
+    Builds the loteComposto column as a Categorical of 'environment-batch'
+    labels without formatting a string per row.
+
+    Rows are grouped by their packed int64 key and only one label per distinct
+    lote is formatted. Categories are sorted by label, so grouping by the
+    column keeps the order the string column had.
+    """
+    unique_keys, codes = np.unique(pack_lote_key(environment, batch), return_inverse=True)
+    labels = lote_key_labels(unique_keys)
+    label_order = np.argsort(labels, kind='stable')
+    # Remap the key-ordered codes to the label-ordered categories
+    code_map = np.empty(len(label_order), dtype=np.int64)
+    code_map[label_order] = np.arange(len(label_order))
+    return pd.Categorical.from_codes(code_map[codes], categories=pd.Index(labels[label_order]))
+
+
+def lote_keys(df: pd.DataFrame) -> np.ndarray:
+    """Returns the packed lote key of every row of a frame with numeric environmentName/batchName."""
+    return pack_lote_key(df['environmentName'].to_numpy(dtype=np.int64), df['batchName'].to_numpy(dtype=np.int64))
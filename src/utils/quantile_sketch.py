@@ -0,0 +1,114 @@
+import math
+from typing import Iterable, List
+
+import numpy as np
+
+
+class KLLSketch:
+    """
+    Mergeable streaming quantile sketch (KLL, Karnin-Lang-Liberty).
+
+    Values are kept in a hierarchy of compactors: level h holds items that
+    each stand for 2**h input values. When a level overflows its capacity it
+    is sorted and every other item is promoted to the next level, so memory
+    stays O(k log(n/k)) while the rank error of a quantile is about 1.7/k.
+    Compaction alternates between the odd and even items of each level
+    instead of flipping a coin, so a sketch is reproducible.
+
+    Sketches built on different partitions or workers are combined with
+    merge() and give the same accuracy as one sketch over all values. Until
+    the first compaction (fewer than k values) every value is kept and
+    quantile() is exact, with the same linear interpolation as
+    pandas.Series.quantile.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3):
+        if k < 8:
+            raise ValueError("k must be at least 8.")
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.offsets: List[int] = [0] # Alternating compaction offset of every level
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        """Capacity of a level: k at the top, shrinking by c per level below it (at least 2)."""
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * self.c ** depth)))
+
+    def _compress(self):
+        """Compacts every level over its capacity, adding levels as needed."""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                    self.offsets.append(0)
+                items = np.sort(items)
+                # An odd item out stays at this level
+                kept = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(kept)]
+                promoted = paired[self.offsets[level]::2]
+                self.offsets[level] ^= 1
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values: Iterable[float]):
+        """Adds values (NaN values are ignored)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        # Feed level 0 in slices of its capacity so it never grows far beyond it
+        for start in range(0, len(values), self.k):
+            self.levels[0] = np.concatenate([self.levels[0], values[start:start + self.k]])
+            self._compress()
+        return self
+
+    def merge(self, other: 'KLLSketch'):
+        """Adds the values summarized by another sketch (e.g. from another worker)."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with different k ({self.k} and {other.k}).")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+            self.offsets.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def is_exact(self) -> bool:
+        """True while no compaction happened, i.e. every value is still kept."""
+        return all(len(items) == 0 for items in self.levels[1:])
+
+    def quantile(self, q: float) -> float:
+        """Returns the approximate q-quantile (exact while is_exact()); NaN if the sketch is empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1.")
+        if self.n == 0:
+            return float('nan')
+        if self.is_exact():
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2**level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        rank = q * (cumulative[-1] - 1)
+        return float(values[order][np.searchsorted(cumulative, rank, side='right')])
+
+    def iqr_bounds(self, lower_q: float = 0.25, upper_q: float = 0.75, multiplier: float = 1.5):
+        """
+        Returns the outlier bounds (Q_lower - m * IQR, Q_upper + m * IQR).
+        With multiplier=0 they are plain percentile bounds, e.g. (p1, p99).
+        """
+        lower, upper = self.quantile(lower_q), self.quantile(upper_q)
+        spread = upper - lower
+        return lower - multiplier * spread, upper + multiplier * spread
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# float32 columns must round-trip losslessly at this many decimals (the raw data has 2)
+FLOAT32_DECIMALS = 2
+
+# Extracted rows (DataExtractor). The totals stay float64: raw feed_measured and
+# feedDelivery_measured values reach millions (and junk values ~1e18), beyond
+# float32 at 2 decimals.
+CONSUMPTION_SCHEMA = {
+    'environmentName': 'category',
+    'batchName': 'category',
+    'clientName': 'category',
+    'batchAge': 'int16',
+    'feed_measuredPerBird': 'float32',
+    'siloEmptyTime': 'int32',
+    'siloNoConsumptionTime': 'int32',
+}
+
+# Cleaned/processed rows (ETLProcessor, dataset_consumo_processed). The cluster
+# attributes are nullable: merge_data leaves them missing for unclustered aviaries.
+PROCESSED_SCHEMA = {
+    'environmentName': 'int32',
+    'batchName': 'int32',
+    'loteComposto': 'category',
+    'clientName': 'category',
+    'batchAge': 'int16',
+    'feed_measuredPerBird': 'float32',
+    'siloEmptyTime': 'int32',
+    'siloNoConsumptionTime': 'int32',
+    'PontuacaoMax': 'Int16',
+    'IEPMedian': 'Int16',
+    'ClassifCluster': 'Int8',
+    'PerfilDescritivo': 'category',
+    'AreaAlojamento': 'category',
+}
+
+# predicted_consumption_per_bird (predict_consumption). Predictions are whole grams.
+PREDICTED_SCHEMA = {
+    'Aviario': 'int32',
+    'batchAge': 'int16',
+    'predicted_feed_measuredPerBird': 'float32',
+    'smoothed_feed_measuredPerBird': 'float32',
+    'PontuacaoMax': 'Int16',
+    'IEPMedian': 'Int16',
+    'ClassifCluster': 'Int8',
+    'PerfilDescritivo': 'category',
+    'AreaAlojamento': 'category',
+}
+
+# Per-lote consumption curves (lote_curves, see src.curve_fitting.curve_table). The
+# coefficients, confidence_level and rmse stay float64: the curves are evaluated from them.
+CURVE_SCHEMA = {
+    'loteComposto': 'category',
+    'n': 'int32',
+    'age_min': 'int16',
+    'age_max': 'int16',
+}
+
+
+def _integer_problem(series, dtype):
+    """Returns why series cannot be cast to the integer dtype, or None."""
+    if not pd.api.types.is_numeric_dtype(series):
+        return "is not numeric"
+    missing = series.isna().to_numpy()
+    nullable = dtype[0].isupper() # 'Int16' is pandas' nullable integer, 'int16' is NumPy's
+    if missing.any() and not nullable:
+        return f"has {int(missing.sum())} missing values"
+    values = series.dropna().to_numpy()
+    if len(values) == 0:
+        return None
+    info = np.iinfo(dtype.lower())
+    low, high = values.min(), values.max()
+    if low < info.min or high > info.max:
+        return f"overflows {dtype} (values {low}..{high})"
+    if values.dtype.kind == 'f' and not np.array_equal(values, np.trunc(values)):
+        return "has non-integer values"
+    return None
+
+
+def _float32_problem(series, decimals):
+    """Returns why series cannot be cast to float32 without losing precision at decimals, or None."""
+    if not pd.api.types.is_numeric_dtype(series):
+        return "is not numeric"
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(over='ignore'):
+        narrow = values.astype(np.float32)
+    if np.isinf(narrow).sum() > np.isinf(values).sum():
+        return "overflows float32"
+    lossless = (np.round(narrow.astype(np.float64), decimals) == values) | np.isnan(values)
+    if not lossless.all():
+        return f"loses precision at {decimals} decimals (e.g. {values[~lossless][0]!r})"
+    return None
+
+
+def apply_schema(df, schema, errors='warn', decimals=FLOAT32_DECIMALS):
+    """
+    Casts the columns of df named in schema to their compact dtypes.
+
+    Every downcast is checked first: integer columns must be integral, free of
+    missing values (unless the dtype is nullable) and within range; float32
+    columns must give back every value when rounded to decimals (see
+    to_float64). Columns missing from df are skipped.
+
+    Args:
+        df: The DataFrame to cast. It is not modified.
+        schema: Mapping of column name to dtype.
+        errors: 'warn' keeps a column that fails its check in its current dtype
+            and prints why; 'raise' raises a ValueError instead.
+        decimals: Decimals a float32 column must preserve.
+
+    Returns:
+        A DataFrame with the compact dtypes.
+    """
+    if errors not in ('warn', 'raise'):
+        raise ValueError(f"errors must be 'warn' or 'raise', not '{errors}'.")
+    if df is None or df.empty:
+        return df
+
+    df = df.copy(deep=False)
+    for column, dtype in schema.items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+        series = df[column]
+        if dtype == 'category':
+            problem = None
+        elif dtype == 'float32':
+            problem = _float32_problem(series, decimals)
+        else:
+            problem = _integer_problem(series, dtype)
+
+        if problem is not None:
+            message = f"Column '{column}' {problem}; cannot store it as {dtype}."
+            if errors == 'raise':
+                raise ValueError(message)
+            print(f"Warning: {message} Keeping {series.dtype}.")
+            continue
+        df[column] = series.astype(dtype)
+    return df
+
+
+def to_float64(values, decimals=FLOAT32_DECIMALS):
+    """
+    Widens a float32 schema column back to the float64 values it was built
+    from (exact, see apply_schema), for sums and fits. Other dtypes are
+    converted to float64 as is.
+    """
+    widened = np.asarray(values, dtype=np.float64)
+    if np.asarray(values).dtype == np.float32:
+        widened = np.round(widened, decimals)
+    return widened
+
+
+def memory_report(before, after):
+    """
+    Compares the deep memory usage of two versions of a frame column by column.
+
+    Returns:
+        A DataFrame indexed by column (plus a 'total' row) with the dtypes and
+        MiB before and after, and the after/before ratio.
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'mib_before': before.memory_usage(deep=True, index=False) / 2**20,
+        'mib_after': after.memory_usage(deep=True, index=False) / 2**20,
+    })
+    report.loc['total'] = ['', '', report['mib_before'].sum(), report['mib_after'].sum()]
+    report['ratio'] = report['mib_after'] / report['mib_before']
+    return report
@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import List, Mapping, Optional, Sequence
+
+import pandas as pd
+
+from src.utils.schema import apply_schema
+
+# Columnar formats come first, so a converted artifact wins over its legacy CSV
+TABLE_SUFFIXES = ('.parquet', '.feather', '.csv')
+DEFAULT_FORMAT = 'parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+
+def _with_suffix(path: Path, suffix: str) -> Path:
+    """Appends suffix to an artifact path, replacing a known table suffix if present."""
+    if path.suffix.lower() in TABLE_SUFFIXES:
+        return path.with_suffix(suffix)
+    return path.with_name(path.name + suffix)
+
+
+def resolve_table_path(path) -> Path:
+    """
+    Returns the file that backs an artifact path.
+
+    A path with a table suffix (.parquet, .feather, .csv) that exists is used
+    as is. Otherwise the path is treated as an artifact stem and the first of
+    stem.parquet, stem.feather and stem.csv that exists is returned.
+
+    Raises:
+        FileNotFoundError: If no backing file exists.
+    """
+    path = Path(path)
+    if path.suffix.lower() in TABLE_SUFFIXES and path.is_file():
+        return path
+    for suffix in TABLE_SUFFIXES:
+        candidate = _with_suffix(path, suffix)
+        if candidate.is_file():
+            return candidate
+    raise FileNotFoundError(f"No table found for '{path}' (tried {', '.join(TABLE_SUFFIXES)})")
+
+
+def _sniff_csv_separator(path: Path) -> str:
+    """Picks ';' or ',' from the header line; the processed CSVs use both."""
+    with open(path, 'r', encoding='utf-8') as f:
+        header = f.readline()
+    return ';' if header.count(';') > header.count(',') else ','
+
+
+def load_table(path, columns: Optional[Sequence[str]] = None, csv_sep: Optional[str] = None,
+               csv_decimal: str = '.', schema: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+    """
+    Loads a processed artifact, reading only the requested columns.
+
+    Parquet and Feather files keep their stored dtypes (including categoricals),
+    so nothing is re-inferred. CSV files are still supported for the artifacts
+    that only exist as CSV; their separator is detected from the header unless
+    csv_sep is given.
+
+    Args:
+        path: Artifact path or stem (see resolve_table_path).
+        columns: Columns to read. All columns are read if None.
+        csv_sep: Separator of a CSV file, detected if None.
+        csv_decimal: Decimal mark of a CSV file.
+        schema: Compact dtypes to enforce on the loaded columns (see
+            src.utils.schema.apply_schema). Columnar files written with the
+            schema already match it; CSV files are downcast after parsing.
+
+    Returns:
+        The loaded DataFrame.
+    """
+    table_path = resolve_table_path(path)
+    columns = list(columns) if columns is not None else None
+    suffix = table_path.suffix.lower()
+    if suffix == '.parquet':
+        df = pd.read_parquet(table_path, columns=columns)
+    elif suffix == '.feather':
+        df = pd.read_feather(table_path, columns=columns)
+    else:
+        sep = csv_sep if csv_sep is not None else _sniff_csv_separator(table_path)
+        df = pd.read_csv(table_path, sep=sep, decimal=csv_decimal, usecols=columns)
+    if schema is not None:
+        df = apply_schema(df, schema)
+    return df
+
+
+def export_csv(df: pd.DataFrame, path, sep: str = ';', decimal: str = '.') -> Path:
+    """Writes df as a CSV next to the artifact, for the business users' spreadsheets."""
+    csv_path = _with_suffix(Path(path), '.csv')
+    df.to_csv(csv_path, sep=sep, decimal=decimal, index=False)
+    return csv_path
+
+
+def save_table(df: pd.DataFrame, path, fmt: Optional[str] = None, csv_export: bool = False,
+               csv_sep: str = ';', csv_decimal: str = '.') -> List[Path]:
+    """
+    Saves a processed artifact in a typed, compressed columnar format.
+
+    Args:
+        df: The DataFrame to save.
+        path: Artifact path or stem. A .parquet or .feather suffix selects the format.
+        fmt: 'parquet' or 'feather'; overrides the suffix. Defaults to Parquet.
+        csv_export: Also write a CSV copy next to the columnar file.
+        csv_sep, csv_decimal: Separator and decimal mark of the CSV copy.
+
+    Returns:
+        The paths written.
+    """
+    path = Path(path)
+    if fmt is None:
+        fmt = path.suffix.lower().lstrip('.') if path.suffix.lower() in ('.parquet', '.feather') else DEFAULT_FORMAT
+    if fmt not in ('parquet', 'feather'):
+        raise ValueError(f"Unsupported table format '{fmt}'. Use 'parquet' or 'feather'.")
+
+    table_path = _with_suffix(path, f'.{fmt}')
+    table_path.parent.mkdir(parents=True, exist_ok=True)
+    # Parquet/Feather need a default index; the artifacts never carry a meaningful one
+    df = df.reset_index(drop=True)
+    if fmt == 'parquet':
+        df.to_parquet(table_path, index=False, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_feather(table_path, compression=PARQUET_COMPRESSION)
+
+    written = [table_path]
+    if csv_export:
+        written.append(export_csv(df, path, sep=csv_sep, decimal=csv_decimal))
+    return written